@@ -0,0 +1,301 @@
+"""
+LearnMatrix: Event-Driven Achievement Engine
+Request handlers publish small events (activity logged, result stored, doubt
+cleared, login) onto a local work queue. A background worker keeps the
+per-student counters in AchievementProgress up to date and evaluates only the
+rules that subscribe to the event, so awarding never runs on the request path
+and never re-scans a student's history.
+
+Usage: python achievements.py --backfill   (create the table, seed counters and award from existing data)
+"""
+
+import argparse
+import atexit
+import queue
+import threading
+from collections import OrderedDict
+
+from mysql.connector import Error
+
+from db_pool import DatabaseUnavailable
+from resource_versions import achievements_resource, bump
+
+PROGRESS_DDL = """
+CREATE TABLE IF NOT EXISTS AchievementProgress (
+    StudentID INT PRIMARY KEY,
+    LoginStreak INT NOT NULL DEFAULT 0 COMMENT 'Consecutive days with a login, ending at LastLoginDate',
+    LastLoginDate DATE,
+    DoubtsCleared INT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (StudentID) REFERENCES Users(UserID) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+FOCUSED_LEARNER_SECONDS = 18000  # 5 hours in the last 7 days
+HIGH_SCORE_PERCENTAGE = 90
+CONSISTENT_STREAK_DAYS = 7
+PROBLEM_SOLVER_DOUBTS = 5
+
+
+# ============================================================================
+# RULES
+# ============================================================================
+class AchievementRule:
+    """
+    A trophy plus the events it listens to. `check(cursor, event, progress)`
+    returns True when the event qualifies the student; it must only look at
+    the event, the student's counters or a bounded number of rollup rows.
+    """
+
+    def __init__(self, trophy, description, badge, points, events, check):
+        self.trophy = trophy
+        self.description = description
+        self.badge = badge
+        self.points = points
+        self.events = frozenset(events)
+        self.check = check
+
+
+def _focused_learner(cursor, event, progress):
+    if event['activity_type'] != 'FocusSession':
+        return False
+    cursor.execute("""
+        SELECT SUM(TotalSeconds) FROM DailyActivityRollup
+        WHERE UserID = %s AND ActivityType = 'FocusSession'
+        AND ActivityDate > DATE_SUB(CURDATE(), INTERVAL 7 DAY)
+    """, (event['student_id'],))
+    return (cursor.fetchone()[0] or 0) >= FOCUSED_LEARNER_SECONDS
+
+
+def _high_scorer(cursor, event, progress):
+    return float(event['percentage'] or 0) >= HIGH_SCORE_PERCENTAGE
+
+
+def _consistent(cursor, event, progress):
+    return progress['LoginStreak'] >= CONSISTENT_STREAK_DAYS
+
+
+def _problem_solver(cursor, event, progress):
+    return progress['DoubtsCleared'] >= PROBLEM_SOLVER_DOUBTS
+
+
+RULES = [
+    AchievementRule('Focused Learner', 'Completed 5+ hours of focused study sessions', 'focus-badge', 50,
+                    ('activity',), _focused_learner),
+    AchievementRule('High Scorer', 'Scored 90% or higher on a test', 'star-badge', 100,
+                    ('result',), _high_scorer),
+    AchievementRule('Consistent', '7 consecutive days of login', 'streak-badge', 75,
+                    ('login',), _consistent),
+    AchievementRule('Problem Solver', 'Cleared 5+ doubts', 'solver-badge', 80,
+                    ('doubt_cleared',), _problem_solver),
+]
+
+
+# ============================================================================
+# COUNTERS
+# ============================================================================
+def _update_progress(cursor, event):
+    """Apply the event to the student's counters and return them as a dict."""
+    student_id = event['student_id']
+    if event['type'] == 'login':
+        # LoginStreak is assigned first, so it still sees the previous LastLoginDate
+        cursor.execute("""
+            INSERT INTO AchievementProgress (StudentID, LoginStreak, LastLoginDate)
+            VALUES (%s, 1, %s)
+            ON DUPLICATE KEY UPDATE
+                LoginStreak = CASE
+                    WHEN LastLoginDate = VALUES(LastLoginDate) THEN LoginStreak
+                    WHEN LastLoginDate = DATE_SUB(VALUES(LastLoginDate), INTERVAL 1 DAY) THEN LoginStreak + 1
+                    ELSE 1
+                END,
+                LastLoginDate = GREATEST(COALESCE(LastLoginDate, VALUES(LastLoginDate)), VALUES(LastLoginDate))
+        """, (student_id, event['day']))
+    elif event['type'] == 'doubt_cleared':
+        cursor.execute("""
+            INSERT INTO AchievementProgress (StudentID, DoubtsCleared)
+            VALUES (%s, 1)
+            ON DUPLICATE KEY UPDATE DoubtsCleared = DoubtsCleared + 1
+        """, (student_id,))
+    else:
+        return None
+
+    cursor.execute("""
+        SELECT LoginStreak, DoubtsCleared FROM AchievementProgress WHERE StudentID = %s
+    """, (student_id,))
+    row = cursor.fetchone()
+    return {'LoginStreak': row[0], 'DoubtsCleared': row[1]}
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+class AchievementEngine:
+    """
+    Bounded work queue plus one worker thread that applies events.
+
+    publish() never blocks the request: when the queue is full the event is
+    dropped and counted. Trophies a student already holds are remembered in
+    a small LRU so their rules are skipped without touching the database.
+    `on_awarded(student_id, trophies)` is called after new trophies commit.
+    """
+
+    def __init__(self, cursor_factory, rules=RULES, max_queue=10000, awarded_cache_size=10000, on_awarded=None):
+        self.cursor_factory = cursor_factory
+        self.on_awarded = on_awarded
+        self.rules = list(rules)
+        self.awarded_cache_size = awarded_cache_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._awarded = OrderedDict()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'published': 0, 'processed': 0, 'dropped': 0, 'failed': 0, 'awarded': 0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    def publish(self, event_type, student_id, **data):
+        """Queue an event for the worker. Returns False if it had to be dropped."""
+        self._ensure_worker()
+        event = dict(data, type=event_type, student_id=student_id)
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('published')
+        return True
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                worker = threading.Thread(target=self._run, name='achievement-worker', daemon=True)
+                worker.start()
+                atexit.register(self.stop)
+                self._worker = worker
+
+    def _run(self):
+        while True:
+            event = self._queue.get()
+            try:
+                if event is None:
+                    return
+                self.process(event)
+                self._count('processed')
+            except (Error, DatabaseUnavailable) as err:
+                self._count('failed')
+                print(f"[achievements] failed to process {event.get('type')} event: {err}")
+            except Exception as err:
+                self._count('failed')
+                print(f"[achievements] unexpected error on {event.get('type')} event: {err}")
+            finally:
+                self._queue.task_done()
+
+    def stop(self, timeout=5.0):
+        """Process what is already queued, then stop the worker."""
+        worker = self._worker
+        if worker is None or not worker.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        worker.join(timeout)
+
+    def _held_trophies(self, cursor, student_id):
+        held = self._awarded.get(student_id)
+        if held is None:
+            cursor.execute("SELECT TrophyName FROM Achievements WHERE StudentID = %s", (student_id,))
+            held = {row[0] for row in cursor.fetchall()}
+            self._awarded[student_id] = held
+            if len(self._awarded) > self.awarded_cache_size:
+                self._awarded.popitem(last=False)
+        else:
+            self._awarded.move_to_end(student_id)
+        return held
+
+    def process(self, event):
+        """Apply one event synchronously (the worker calls this; scripts may too)."""
+        earned = []
+        new_trophies = []
+        with self.cursor_factory(transaction=True) as cursor:
+            progress = _update_progress(cursor, event)
+            rules = [rule for rule in self.rules if event['type'] in rule.events]
+            if not rules:
+                return
+            held = self._held_trophies(cursor, event['student_id'])
+            for rule in rules:
+                if rule.trophy in held or not rule.check(cursor, event, progress):
+                    continue
+                cursor.execute("""
+                    INSERT IGNORE INTO Achievements (StudentID, TrophyName, Description, Badge, Points)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (event['student_id'], rule.trophy, rule.description, rule.badge, rule.points))
+                earned.append(rule.trophy)
+                if cursor.rowcount:
+                    self._count('awarded')
+                    new_trophies.append(rule.trophy)
+            if new_trophies:
+                bump(cursor, achievements_resource(event['student_id']))
+        # Only remember trophies once the transaction has committed
+        held.update(earned)
+        if new_trophies and self.on_awarded:
+            self.on_awarded(event['student_id'], new_trophies)
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot['queued'] = self._queue.qsize()
+        return snapshot
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+def backfill(cursor):
+    """
+    Create AchievementProgress, seed the cleared-doubt counters and award the
+    result- and doubt-based trophies students already qualify for. Login
+    streaks start from the next login.
+    """
+    cursor.execute(PROGRESS_DDL)
+    cursor.execute("""
+        INSERT INTO AchievementProgress (StudentID, DoubtsCleared)
+        SELECT StudentID, COUNT(*) FROM Doubts WHERE Status = 'Cleared' GROUP BY StudentID
+        ON DUPLICATE KEY UPDATE DoubtsCleared = VALUES(DoubtsCleared)
+    """)
+    by_name = {rule.trophy: rule for rule in RULES}
+    high_scorer = by_name['High Scorer']
+    cursor.execute("""
+        INSERT IGNORE INTO Achievements (StudentID, TrophyName, Description, Badge, Points)
+        SELECT DISTINCT StudentID, %s, %s, %s, %s FROM Results WHERE Percentage >= %s
+    """, (high_scorer.trophy, high_scorer.description, high_scorer.badge, high_scorer.points,
+          HIGH_SCORE_PERCENTAGE))
+    awarded = cursor.rowcount
+    problem_solver = by_name['Problem Solver']
+    cursor.execute("""
+        INSERT IGNORE INTO Achievements (StudentID, TrophyName, Description, Badge, Points)
+        SELECT StudentID, %s, %s, %s, %s FROM AchievementProgress WHERE DoubtsCleared >= %s
+    """, (problem_solver.trophy, problem_solver.description, problem_solver.badge, problem_solver.points,
+          PROBLEM_SOLVER_DOUBTS))
+    awarded += cursor.rowcount
+    if awarded:
+        bump(cursor, achievements_resource())
+    return awarded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Maintain achievement progress counters')
+    parser.add_argument('--backfill', action='store_true', help='create the table, seed counters and award trophies')
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+    else:
+        from app import db_cursor
+        with db_cursor(transaction=True) as cursor:
+            awarded = backfill(cursor)
+        print(f"✓ Achievement progress seeded; {awarded} trophies awarded")
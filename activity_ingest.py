@@ -0,0 +1,283 @@
+"""
+LearnMatrix: Buffered Activity Ingestion
+Write-behind buffer for /api/log-activity. Events are accepted into a bounded
+in-process queue and written by a background thread in multi-row batches
+(ActivityLog insert plus DailyActivityRollup upsert in one transaction) once
+`batch_size` events are waiting or `flush_interval` seconds have passed.
+
+Durability: batches that cannot be written because the database is down, and
+whatever is still queued at shutdown, are appended to a local JSON-lines spill
+file and replayed once the database is reachable again (at-least-once).
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from mysql.connector import Error
+from mysql.connector.errors import DataError, IntegrityError
+
+from db_pool import DatabaseUnavailable
+from rollups import record_activity_batch
+
+# Must match the ActivityLog.ActivityType ENUM; anything else would fail a whole batch
+ACTIVITY_TYPES = ('Login', 'Logout', 'TestStart', 'TestSubmit', 'FocusSession', 'DoubtsSubmitted', 'ViewedResources')
+
+INSERT_ACTIVITY_SQL = """
+    INSERT INTO ActivityLog (UserID, ActivityType, Duration, ExamID, AssignmentID, Details, Timestamp)
+    VALUES (%s, %s, %s, %s, %s, %s, DATE_SUB(NOW(), INTERVAL %s SECOND))
+"""
+
+
+class ActivityIngester:
+    """
+    Bounded write-behind queue for ActivityLog events.
+
+    submit() never blocks: when the queue is full it returns False and the
+    caller should ask the client to retry (backpressure). `on_flushed` is
+    called with the list of events after each committed batch. With
+    synchronous=True every event is written on the caller's thread instead
+    and database errors propagate.
+    """
+
+    def __init__(self, cursor_factory, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 spill_path=None, on_flushed=None, replay_interval=30.0, synchronous=False):
+        self.cursor_factory = cursor_factory
+        self.synchronous = synchronous
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.on_flushed = on_flushed
+        self.replay_interval = replay_interval
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._worker = None
+        self._stopping = threading.Event()
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._last_replay = 0.0
+        self._stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'written': 0,
+            'batches': 0,
+            'invalidRows': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'lost': 0,
+            'writeErrors': 0,
+            'highWatermark': 0,
+            'lastFlushMs': 0.0,
+            'lastError': None,
+        }
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def submit(self, user_id, activity_type, duration=None, exam_id=None, assignment_id=None, details=None):
+        """Queue one event. Returns False when the buffer is full."""
+        event = {
+            'user_id': user_id,
+            'activity_type': activity_type,
+            'duration': duration,
+            'exam_id': exam_id,
+            'assignment_id': assignment_id,
+            'details': json.dumps(details or {}),
+            'at': time.time(),
+        }
+        if self.synchronous:
+            self._write([event])
+            self._count('written')
+            self._notify([event])
+            return True
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._count('rejected')
+            return False
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats['accepted'] += 1
+            if depth > self._stats['highWatermark']:
+                self._stats['highWatermark'] = depth
+        return True
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                worker = threading.Thread(target=self._run, name='activity-ingester', daemon=True)
+                worker.start()
+                atexit.register(self.stop)
+                self._worker = worker
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                batch = self._collect()
+                written = self._flush(batch) if batch else True
+                # Checked on every pass, not only when idle, so steady traffic cannot starve the replay;
+                # skipped right after a failed flush since the database is still unreachable
+                if written and self.spill_path and time.monotonic() - self._last_replay >= self.replay_interval:
+                    self._replay_spill()
+            except Exception as err:
+                print(f"[activity_ingest] worker error: {err}")
+
+    def _collect(self):
+        """Block for the first event, then gather until the batch is full or the interval elapses."""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, events):
+        now = time.time()
+        rows = [(e['user_id'], e['activity_type'], e['duration'], e['exam_id'], e['assignment_id'],
+                 e['details'], max(0, int(now - e['at']))) for e in events]
+        with self.cursor_factory(transaction=True) as cursor:
+            cursor.executemany(INSERT_ACTIVITY_SQL, rows)
+            record_activity_batch(cursor, [(r[0], r[6], r[1], r[2]) for r in rows])
+
+    def _flush(self, events, spill_on_failure=True):
+        """Write a batch; returns True when it was committed (or could not ever be)."""
+        started = time.perf_counter()
+        try:
+            self._write(events)
+        except (IntegrityError, DataError) as err:
+            # A bad row (e.g. unknown ExamID) would poison the whole batch; isolate it
+            self._record_error(err)
+            self._write_individually(events)
+            return True
+        except (Error, DatabaseUnavailable) as err:
+            self._record_error(err)
+            if spill_on_failure:
+                self._spill(events)
+            return False
+
+        with self._stats_lock:
+            self._stats['written'] += len(events)
+            self._stats['batches'] += 1
+            self._stats['lastFlushMs'] = round((time.perf_counter() - started) * 1000, 2)
+        self._notify(events)
+        return True
+
+    def _write_individually(self, events):
+        written = []
+        for event in events:
+            try:
+                self._write([event])
+                written.append(event)
+            except (IntegrityError, DataError) as err:
+                self._count('invalidRows')
+                print(f"[activity_ingest] dropped invalid activity for user {event['user_id']}: {err}")
+            except (Error, DatabaseUnavailable) as err:
+                self._record_error(err)
+                self._spill([event])
+        self._count('written', len(written))
+        self._notify(written)
+
+    def _notify(self, events):
+        if self.on_flushed and events:
+            try:
+                self.on_flushed(events)
+            except Exception as err:
+                print(f"[activity_ingest] on_flushed callback failed: {err}")
+
+    def _record_error(self, err):
+        with self._stats_lock:
+            self._stats['writeErrors'] += 1
+            self._stats['lastError'] = str(err)
+        print(f"[activity_ingest] batch write failed: {err}")
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    # ------------------------------------------------------------------
+    # Spill file
+    # ------------------------------------------------------------------
+    def _spill(self, events, count=True):
+        if not events:
+            return
+        if not self.spill_path:
+            self._count('lost', len(events))
+            return
+        directory = os.path.dirname(self.spill_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as spill:
+                for event in events:
+                    spill.write(json.dumps(event) + '\n')
+                spill.flush()
+                os.fsync(spill.fileno())
+        if count:
+            self._count('spilled', len(events))
+
+    def _replay_spill(self):
+        """Move the spill file aside and write its events back in batches."""
+        self._last_replay = time.monotonic()
+        replay_path = self.spill_path + '.replay'
+        with self._spill_lock:
+            # A .replay file left by a crash mid-replay is picked up before new spills
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return
+                os.replace(self.spill_path, replay_path)
+
+        with open(replay_path, encoding='utf-8') as replay:
+            events = [json.loads(line) for line in replay if line.strip()]
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start:start + self.batch_size]
+            if not self._flush(batch, spill_on_failure=False):
+                # Still unreachable: put everything not yet written back
+                self._spill(events[start:], count=False)
+                break
+            self._count('replayed', len(batch))
+        os.remove(replay_path)
+
+    def stop(self, timeout=10.0):
+        """Flush what is queued; spill it if the database is unavailable."""
+        if self._worker is None:
+            return
+        self._stopping.set()
+        self._worker.join(timeout)
+        pending = []
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(pending), self.batch_size):
+            self._flush(pending[start:start + self.batch_size])
+
+    def stats(self):
+        """Counters plus current queue depth, for health checks and backpressure monitoring."""
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        snapshot['queued'] = self._queue.qsize()
+        snapshot['capacity'] = self._queue.maxsize
+        snapshot['spillPending'] = bool(self.spill_path) and (
+            os.path.exists(self.spill_path) or os.path.exists(self.spill_path + '.replay'))
+        return snapshot
@@ -0,0 +1,253 @@
+"""
+LearnMatrix: ActivityLog Partition Management
+Keeps ActivityLog as monthly RANGE partitions so time-bounded reads prune to
+the months they touch and expired raw data can be dropped in O(1):
+
+- partitions are created ahead of time (ACTIVITY_PARTITIONS_AHEAD months)
+- partitions older than ACTIVITY_RETENTION_MONTHS are first rolled into
+  DailyActivityRollup, then the ActivityRetention watermark is moved past
+  them, then they are dropped
+- readers that need a time window combine rollup days before the watermark
+  with raw rows after it (see windowed_activity_sql)
+
+MySQL only partitions tables whose unique keys all contain the partitioning
+column and that have no foreign keys, so --convert replaces the primary key
+with (LogID, Timestamp) and drops ActivityLog's foreign keys.
+
+Usage:
+    python activity_partitions.py --convert    (one-time: partition the existing table)
+    python activity_partitions.py --maintain   (daily: add future partitions, expire old ones)
+"""
+
+import argparse
+from datetime import date
+
+from mysql.connector import errorcode
+from mysql.connector.errors import ProgrammingError
+
+RETENTION_DDL = """
+CREATE TABLE IF NOT EXISTS ActivityRetention (
+    Id TINYINT PRIMARY KEY DEFAULT 1,
+    RawSince DATE NOT NULL COMMENT 'ActivityLog holds raw rows from this day on; earlier days live in DailyActivityRollup',
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+CATCH_ALL_PARTITION = 'pmax'
+
+
+def _add_months(month_start, months):
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_name(month_start):
+    return month_start.strftime('p%Y%m')
+
+
+def _partition_month(name):
+    return date(int(name[1:5]), int(name[5:7]), 1)
+
+
+def _partition_clause(month_start):
+    upper = _add_months(month_start, 1)
+    return (f"PARTITION {_partition_name(month_start)} VALUES LESS THAN "
+            f"(UNIX_TIMESTAMP('{upper.isoformat()} 00:00:00'))")
+
+
+# ============================================================================
+# READ HELPERS
+# ============================================================================
+def raw_since(cursor):
+    """Return the first day still held as raw ActivityLog rows (None when nothing has expired)."""
+    try:
+        cursor.execute("SELECT RawSince FROM ActivityRetention WHERE Id = 1")
+    except ProgrammingError as err:
+        # Databases that have never been partitioned have no watermark table yet
+        if err.errno == errorcode.ER_NO_SUCH_TABLE:
+            return None
+        raise
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def windowed_activity_sql(cursor, days, activity_type, user_filter_sql='', user_params=()):
+    """
+    Build (sql, params) for per-user seconds of `activity_type` over the last
+    `days` days, as rows of (UserID, TotalSeconds); usable as a derived table.
+
+    Days before the retention watermark come from DailyActivityRollup (whole
+    days), the rest from raw ActivityLog rows so the window edge stays exact
+    while it lies inside the retained range. `user_filter_sql` is appended to
+    both branches, e.g. "AND UserID IN (SELECT ...)".
+    """
+    since_day = raw_since(cursor)
+    window = f"DATE_SUB(NOW(), INTERVAL {int(days)} DAY)"
+    if since_day is None:
+        return (f"""
+            SELECT UserID, SUM(Duration) AS TotalSeconds
+            FROM ActivityLog
+            WHERE ActivityType = %s
+            AND Timestamp >= {window}
+            {user_filter_sql}
+            GROUP BY UserID
+        """, (activity_type,) + tuple(user_params))
+
+    return (f"""
+        SELECT UserID, SUM(Seconds) AS TotalSeconds
+        FROM (
+            SELECT UserID, TotalSeconds AS Seconds
+            FROM DailyActivityRollup
+            WHERE ActivityType = %s
+            AND ActivityDate >= DATE({window}) AND ActivityDate < %s
+            {user_filter_sql}
+            UNION ALL
+            SELECT UserID, Duration AS Seconds
+            FROM ActivityLog
+            WHERE ActivityType = %s
+            AND Timestamp >= GREATEST({window}, %s)
+            {user_filter_sql}
+        ) windowed
+        GROUP BY UserID
+    """, (activity_type, since_day) + tuple(user_params)
+         + (activity_type, since_day) + tuple(user_params))
+
+
+# ============================================================================
+# PARTITION MANAGEMENT
+# ============================================================================
+def list_partitions(cursor):
+    """Return ActivityLog's monthly partition names, oldest first ([] when not partitioned)."""
+    cursor.execute("""
+        SELECT PARTITION_NAME FROM INFORMATION_SCHEMA.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'ActivityLog' AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """)
+    return [row[0] for row in cursor.fetchall() if row[0] != CATCH_ALL_PARTITION]
+
+
+def convert_table(cursor, months_ahead=3):
+    """Partition an existing ActivityLog by month. Returns the number of partitions created."""
+    if list_partitions(cursor):
+        return 0
+    cursor.execute(RETENTION_DDL)
+
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME FROM INFORMATION_SCHEMA.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'ActivityLog'
+    """)
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE ActivityLog DROP FOREIGN KEY `{constraint}`")
+    cursor.execute("ALTER TABLE ActivityLog DROP PRIMARY KEY, ADD PRIMARY KEY (LogID, Timestamp)")
+
+    cursor.execute("SELECT MIN(Timestamp) FROM ActivityLog")
+    oldest = cursor.fetchone()[0]
+    today = date.today()
+    first = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+    last = _add_months(date(today.year, today.month, 1), months_ahead)
+
+    clauses = []
+    month = first
+    while month <= last:
+        clauses.append(_partition_clause(month))
+        month = _add_months(month, 1)
+    clauses.append(f"PARTITION {CATCH_ALL_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    cursor.execute("ALTER TABLE ActivityLog PARTITION BY RANGE (UNIX_TIMESTAMP(Timestamp)) (\n    "
+                   + ",\n    ".join(clauses) + "\n)")
+    return len(clauses) - 1
+
+
+def ensure_future_partitions(cursor, months_ahead=3):
+    """Split the catch-all partition so every month up to `months_ahead` has its own. Returns names added."""
+    existing = list_partitions(cursor)
+    if not existing:
+        raise RuntimeError('ActivityLog is not partitioned; run: python activity_partitions.py --convert')
+    today = date.today()
+    target = _add_months(date(today.year, today.month, 1), months_ahead)
+    month = _add_months(_partition_month(existing[-1]), 1)
+
+    clauses = []
+    added = []
+    while month <= target:
+        clauses.append(_partition_clause(month))
+        added.append(_partition_name(month))
+        month = _add_months(month, 1)
+    if clauses:
+        clauses.append(f"PARTITION {CATCH_ALL_PARTITION} VALUES LESS THAN (MAXVALUE)")
+        cursor.execute(f"ALTER TABLE ActivityLog REORGANIZE PARTITION {CATCH_ALL_PARTITION} INTO (\n    "
+                       + ",\n    ".join(clauses) + "\n)")
+    return added
+
+
+def rollup_partition(cursor, partition):
+    """
+    Rebuild DailyActivityRollup for the partition's month from its raw rows
+    and move the retention watermark past it. Run inside a transaction.
+    """
+    month = _partition_month(partition)
+    upper = _add_months(month, 1)
+    cursor.execute("""
+        DELETE FROM DailyActivityRollup WHERE ActivityDate >= %s AND ActivityDate < %s
+    """, (month, upper))
+    cursor.execute(f"""
+        INSERT INTO DailyActivityRollup (UserID, ActivityDate, ActivityType, ActivityCount, TotalSeconds)
+        SELECT UserID, DATE(Timestamp), ActivityType, COUNT(*), COALESCE(SUM(Duration), 0)
+        FROM ActivityLog PARTITION ({partition})
+        GROUP BY UserID, DATE(Timestamp), ActivityType
+    """)
+    rows = cursor.rowcount
+    cursor.execute("""
+        INSERT INTO ActivityRetention (Id, RawSince) VALUES (1, %s)
+        ON DUPLICATE KEY UPDATE RawSince = GREATEST(RawSince, VALUES(RawSince))
+    """, (upper,))
+    return rows
+
+
+def expired_partitions(cursor, retention_months):
+    """Partitions whose whole month lies before the retention cutoff, oldest first."""
+    today = date.today()
+    cutoff = _add_months(date(today.year, today.month, 1), -retention_months)
+    return [name for name in list_partitions(cursor) if _add_months(_partition_month(name), 1) <= cutoff]
+
+
+def maintain(cursor_factory, retention_months=12, months_ahead=3):
+    """Add future partitions, then roll up and drop expired ones. Returns a summary dict."""
+    with cursor_factory() as cursor:
+        cursor.execute(RETENTION_DDL)
+        added = ensure_future_partitions(cursor, months_ahead)
+        expired = expired_partitions(cursor, retention_months)
+
+    dropped = []
+    for partition in expired:
+        # Rollup and watermark commit together before the raw rows disappear
+        with cursor_factory(transaction=True) as cursor:
+            rows = rollup_partition(cursor, partition)
+        with cursor_factory() as cursor:
+            cursor.execute(f"ALTER TABLE ActivityLog DROP PARTITION {partition}")
+        dropped.append((partition, rows))
+    return {'added': added, 'dropped': dropped}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage monthly ActivityLog partitions')
+    parser.add_argument('--convert', action='store_true', help='partition the existing ActivityLog table (one-time)')
+    parser.add_argument('--maintain', action='store_true', help='create future partitions and expire old ones')
+    args = parser.parse_args()
+    if not (args.convert or args.maintain):
+        parser.print_help()
+    else:
+        from app import db_cursor
+        from config import config
+        if args.convert:
+            with db_cursor() as cursor:
+                created = convert_table(cursor, config.ACTIVITY_PARTITIONS_AHEAD)
+            print(f"✓ ActivityLog partitioned ({created} monthly partitions)" if created
+                  else "✓ ActivityLog is already partitioned")
+        if args.maintain:
+            summary = maintain(db_cursor, config.ACTIVITY_RETENTION_MONTHS, config.ACTIVITY_PARTITIONS_AHEAD)
+            for name in summary['added']:
+                print(f"✓ Added partition {name}")
+            for name, rows in summary['dropped']:
+                print(f"✓ Rolled up {name} into {rows} daily rows and dropped it")
+            if not summary['added'] and not summary['dropped']:
+                print("✓ Partitions are up to date")
@@ -0,0 +1,430 @@
+"""
+LearnMatrix: Cohort Analytics Engines
+Set-based aggregations that compute per-student metrics for a whole cohort
+in a fixed number of grouped queries instead of a query loop per student
+"""
+
+from activity_partitions import windowed_activity_sql
+
+# Bayesian smoothing prior for completion rates: a weak prior of 40% worth
+# two pseudo-observations keeps tiny samples away from extreme 0%/100% values.
+COMPLETION_PRIOR_MEAN = 0.40
+COMPLETION_PRIOR_WEIGHT = 2
+
+# Teachers with fewer assigned students than this see the whole student body
+# on their roster (useful in small test data setups).
+ROSTER_MIN_ASSIGNED = 5
+
+
+def smoothed_completion_rate(completed, total):
+    """Return the Bayesian-smoothed completion percentage for completed/total assignments."""
+    completed = int(completed or 0)
+    total = int(total or 0)
+    if (total + COMPLETION_PRIOR_WEIGHT) > 0:
+        return float((completed + COMPLETION_PRIOR_MEAN * COMPLETION_PRIOR_WEIGHT)
+                     / (total + COMPLETION_PRIOR_WEIGHT) * 100)
+    return 0.0
+
+
+def engagement_score(study_hours, completion_rate, trophy_count):
+    """Weighted engagement score shown on the teacher roster."""
+    return (study_hours * 0.3) + (completion_rate * 0.004) + (trophy_count * 10)
+
+
+def engagement_level(score):
+    return 'High' if score >= 70 else 'Medium' if score >= 40 else 'Low'
+
+
+def iter_rows(cursor, batch_size=500):
+    """Yield the current result set in fetchmany() batches (rows stay on the server until read)."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+# ============================================================================
+# STUDENT ROSTER (ENGAGEMENT)
+# ============================================================================
+def _load_roster_cohort(cursor, teacher_id, min_assigned):
+    """
+    Return (students, assigned_mode, cohort_sql, cohort_params).
+
+    cohort_sql is a subquery selecting the cohort's student IDs so that the
+    grouped metric queries can filter on it without shipping an IN list whose
+    size grows with the cohort.
+    """
+    cursor.execute("""
+        SELECT DISTINCT a.StudentID, u.FirstName, u.LastName, u.Username
+        FROM Assignments a
+        JOIN Users u ON a.StudentID = u.UserID
+        WHERE a.TeacherID = %s
+    """, (teacher_id,))
+    students = cursor.fetchall()
+    if students and len(students) >= min_assigned:
+        return (students, True,
+                "SELECT StudentID FROM Assignments WHERE TeacherID = %s", (teacher_id,))
+
+    cursor.execute("""
+        SELECT UserID, FirstName, LastName, Username
+        FROM Users
+        WHERE Role = 'Student'
+        ORDER BY FirstName, LastName
+    """)
+    return (cursor.fetchall(), False,
+            "SELECT UserID FROM Users WHERE Role = 'Student'", ())
+
+
+def build_student_roster(cursor, teacher_id, min_assigned=ROSTER_MIN_ASSIGNED):
+    """
+    Compute engagement metrics for every student on a teacher's roster.
+
+    Issues at most six queries no matter how many students are on the roster:
+    one or two to resolve the cohort, the retention watermark, then one
+    grouped scan each for focus time (last 30 days, rollup days before the
+    watermark plus raw rows after it), assignment completion and trophy counts.
+    Returns roster entries sorted by engagement score, highest first.
+    """
+    students, assigned_mode, cohort_sql, cohort_params = _load_roster_cohort(cursor, teacher_id, min_assigned)
+    if not students:
+        return []
+
+    # Study seconds in the last 30 days, per student
+    cursor.execute(*windowed_activity_sql(cursor, 30, 'FocusSession',
+                                          f"AND UserID IN ({cohort_sql})", cohort_params))
+    study_seconds = {row[0]: row[1] or 0 for row in cursor.fetchall()}
+
+    # Completion counts; in assigned mode only this teacher's assignments count
+    if assigned_mode:
+        cursor.execute("""
+            SELECT StudentID,
+                   COUNT(CASE WHEN Status = 'Completed' THEN 1 END) as Completed,
+                   COUNT(*) as Total
+            FROM Assignments
+            WHERE TeacherID = %s
+            GROUP BY StudentID
+        """, (teacher_id,))
+    else:
+        cursor.execute(f"""
+            SELECT StudentID,
+                   COUNT(CASE WHEN Status = 'Completed' THEN 1 END) as Completed,
+                   COUNT(*) as Total
+            FROM Assignments
+            WHERE StudentID IN ({cohort_sql})
+            GROUP BY StudentID
+        """, cohort_params)
+    completion = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    # Trophy counts
+    cursor.execute(f"""
+        SELECT StudentID, COUNT(*)
+        FROM Achievements
+        WHERE StudentID IN ({cohort_sql})
+        GROUP BY StudentID
+    """, cohort_params)
+    trophies = {row[0]: row[1] for row in cursor.fetchall()}
+
+    roster = []
+    for student_id, first_name, last_name, username in students:
+        completed, total = completion.get(student_id, (0, 0))
+        roster.append(_roster_entry(student_id, first_name, last_name, username,
+                                    study_seconds.get(student_id, 0), completed, total,
+                                    trophies.get(student_id, 0)))
+
+    # Sort by engagement score descending
+    roster.sort(key=lambda x: x['engagementScore'], reverse=True)
+    return roster
+
+
+def _roster_entry(student_id, first_name, last_name, username, study_seconds, completed, total, trophies):
+    study_hours = float((study_seconds or 0) / 3600)
+    completion_rate = smoothed_completion_rate(completed, total)
+    trophy_count = int(trophies or 0)
+    score = engagement_score(study_hours, completion_rate, trophy_count)
+    return {
+        'studentId': student_id,
+        'name': f"{first_name} {last_name}",
+        'username': username,
+        'engagementScore': round(score, 2),
+        'studyHours': round(study_hours, 1),
+        'completionRate': round(completion_rate, 1),
+        'trophyCount': trophy_count,
+        'scoreLevel': engagement_level(score)
+    }
+
+
+def stream_student_roster(cursor, teacher_id, min_assigned=ROSTER_MIN_ASSIGNED):
+    """
+    Yield the same roster entries as build_student_roster() while reading
+    one joined query row by row, so memory does not grow with the cohort.
+    Entries come in name order; a score-ordered stream would need every
+    row before the first could be sent.
+    """
+    cursor.execute("""
+        SELECT COUNT(DISTINCT StudentID) FROM Assignments WHERE TeacherID = %s
+    """, (teacher_id,))
+    assigned_mode = (cursor.fetchone()[0] or 0) >= max(min_assigned, 1)
+    if assigned_mode:
+        cohort_sql = "SELECT StudentID FROM Assignments WHERE TeacherID = %s"
+        cohort_params = (teacher_id,)
+        completion_filter = "WHERE TeacherID = %s"
+        completion_params = (teacher_id,)
+    else:
+        cohort_sql = "SELECT UserID FROM Users WHERE Role = 'Student'"
+        cohort_params = ()
+        completion_filter = f"WHERE StudentID IN ({cohort_sql})"
+        completion_params = cohort_params
+
+    focus_sql, focus_params = windowed_activity_sql(cursor, 30, 'FocusSession',
+                                                    f"AND UserID IN ({cohort_sql})", cohort_params)
+    cursor.execute(f"""
+        SELECT u.UserID, u.FirstName, u.LastName, u.Username,
+               fs.TotalSeconds, ac.Completed, ac.Total, tr.Trophies
+        FROM Users u
+        LEFT JOIN ({focus_sql}) fs ON fs.UserID = u.UserID
+        LEFT JOIN (
+            SELECT StudentID,
+                   COUNT(CASE WHEN Status = 'Completed' THEN 1 END) as Completed,
+                   COUNT(*) as Total
+            FROM Assignments
+            {completion_filter}
+            GROUP BY StudentID
+        ) ac ON ac.StudentID = u.UserID
+        LEFT JOIN (
+            SELECT StudentID, COUNT(*) AS Trophies
+            FROM Achievements
+            WHERE StudentID IN ({cohort_sql})
+            GROUP BY StudentID
+        ) tr ON tr.StudentID = u.UserID
+        WHERE u.UserID IN ({cohort_sql})
+        ORDER BY u.FirstName, u.LastName, u.UserID
+    """, tuple(focus_params) + tuple(completion_params) + tuple(cohort_params) + tuple(cohort_params))
+
+    for row in iter_rows(cursor):
+        yield _roster_entry(*row)
+
+
+# ============================================================================
+# ALL-STUDENTS PERFORMANCE SNAPSHOT
+# ============================================================================
+# Sortable snapshot columns mapped to their sort key (studentId breaks ties)
+SNAPSHOT_SORT_KEYS = {
+    'avgScore': lambda s: (s['avgScore'], s['studentId']),
+    'studyHours': lambda s: (s['studyHours'], s['studentId']),
+    'totalTime': lambda s: (s['totalTime'], s['studentId']),
+    'completedAssignments': lambda s: (s['completedAssignments'], s['studentId']),
+    'achievements': lambda s: (s['achievements'], s['studentId']),
+    'name': lambda s: (s['name'].lower(), s['studentId']),
+}
+
+
+def performance_level(avg_score):
+    return 'High' if avg_score >= 80 else 'Good' if avg_score >= 70 else 'Average' if avg_score >= 60 else 'Below Average'
+
+
+def build_performance_snapshot(cursor):
+    """
+    Build performance metrics for every student in the system.
+
+    One grouped scan per source table (Users, DailyActivityRollup, Results,
+    Assignments, Achievements) is joined in memory on the student ID, so the
+    query count is five regardless of how many students exist.
+    """
+    cursor.execute("""
+        SELECT UserID, FirstName, LastName, Username, CreatedAt
+        FROM Users
+        WHERE Role = 'Student'
+        ORDER BY FirstName, LastName
+    """)
+    students = cursor.fetchall()
+    if not students:
+        return []
+
+    # Focus-session and all-activity seconds from the daily rollup, which
+    # still covers months whose raw ActivityLog partitions have been dropped
+    cursor.execute("""
+        SELECT r.UserID,
+               SUM(CASE WHEN r.ActivityType = 'FocusSession' THEN r.TotalSeconds ELSE 0 END),
+               SUM(r.TotalSeconds)
+        FROM DailyActivityRollup r
+        JOIN Users u ON r.UserID = u.UserID
+        WHERE u.Role = 'Student'
+        GROUP BY r.UserID
+    """)
+    activity = {row[0]: (row[1] or 0, row[2] or 0) for row in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT StudentID, AVG(Percentage)
+        FROM Results
+        GROUP BY StudentID
+    """)
+    avg_scores = {row[0]: row[1] for row in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT StudentID, COUNT(*)
+        FROM Assignments
+        WHERE Status = 'Completed'
+        GROUP BY StudentID
+    """)
+    completed = {row[0]: row[1] for row in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT StudentID, COUNT(*)
+        FROM Achievements
+        GROUP BY StudentID
+    """)
+    achievements = {row[0]: row[1] for row in cursor.fetchall()}
+
+    snapshot = []
+    for student_id, first_name, last_name, username, created_at in students:
+        focus_seconds, total_seconds = activity.get(student_id, (0, 0))
+        snapshot.append(_snapshot_entry(student_id, first_name, last_name, username, created_at,
+                                        focus_seconds, total_seconds, avg_scores.get(student_id),
+                                        completed.get(student_id, 0), achievements.get(student_id, 0)))
+    return snapshot
+
+
+def _snapshot_entry(student_id, first_name, last_name, username, created_at,
+                    focus_seconds, total_seconds, avg_score_raw, completed, achievements):
+    avg_score = float(round(avg_score_raw, 2) if avg_score_raw else 0)
+    return {
+        'studentId': student_id,
+        'name': f"{first_name or ''} {last_name or ''}".strip() or 'Unknown',
+        'username': username or 'unknown',
+        'studyHours': round(float((focus_seconds or 0) / 3600), 2),
+        'totalTime': round(float((total_seconds or 0) / 3600), 2),
+        'avgScore': avg_score,
+        'completedAssignments': int(completed or 0),
+        'achievements': int(achievements or 0),
+        'joinDate': created_at.strftime('%Y-%m-%d') if created_at else '',
+        'performanceLevel': performance_level(avg_score)
+    }
+
+
+# SQL equivalents of SNAPSHOT_SORT_KEYS for the streamed snapshot
+SNAPSHOT_SORT_COLUMNS = {
+    'avgScore': ['COALESCE(sc.AvgScore, 0)'],
+    'studyHours': ['COALESCE(act.FocusSeconds, 0)'],
+    'totalTime': ['COALESCE(act.TotalSeconds, 0)'],
+    'completedAssignments': ['COALESCE(done.Completed, 0)'],
+    'achievements': ['COALESCE(tr.Trophies, 0)'],
+    'name': ['u.FirstName', 'u.LastName'],
+}
+
+
+def stream_performance_snapshot(cursor, sort='name', descending=False):
+    """
+    Yield build_performance_snapshot() entries from a single joined query,
+    ordered in SQL and read row by row, so memory stays flat however many
+    students exist.
+    """
+    direction = 'DESC' if descending else 'ASC'
+    order_by = ', '.join(f"{column} {direction}" for column in SNAPSHOT_SORT_COLUMNS[sort] + ['u.UserID'])
+    cursor.execute(f"""
+        SELECT u.UserID, u.FirstName, u.LastName, u.Username, u.CreatedAt,
+               act.FocusSeconds, act.TotalSeconds, sc.AvgScore, done.Completed, tr.Trophies
+        FROM Users u
+        LEFT JOIN (
+            SELECT UserID,
+                   SUM(CASE WHEN ActivityType = 'FocusSession' THEN TotalSeconds ELSE 0 END) AS FocusSeconds,
+                   SUM(TotalSeconds) AS TotalSeconds
+            FROM DailyActivityRollup
+            GROUP BY UserID
+        ) act ON act.UserID = u.UserID
+        LEFT JOIN (
+            SELECT StudentID, AVG(Percentage) AS AvgScore FROM Results GROUP BY StudentID
+        ) sc ON sc.StudentID = u.UserID
+        LEFT JOIN (
+            SELECT StudentID, COUNT(*) AS Completed FROM Assignments WHERE Status = 'Completed' GROUP BY StudentID
+        ) done ON done.StudentID = u.UserID
+        LEFT JOIN (
+            SELECT StudentID, COUNT(*) AS Trophies FROM Achievements GROUP BY StudentID
+        ) tr ON tr.StudentID = u.UserID
+        WHERE u.Role = 'Student'
+        ORDER BY {order_by}
+    """)
+    for row in iter_rows(cursor):
+        yield _snapshot_entry(*row)
+
+
+# ============================================================================
+# TEACHER LEADERBOARD
+# ============================================================================
+# Per-student result totals joined to distinct (teacher, student) links.
+# Joining Results straight onto Assignments repeats every result once per
+# assignment the student has with that teacher, which skews AVG() towards
+# heavily-assigned students and multiplies the rows scanned.
+TEACHER_SCORE_TOTALS_SQL = """
+    SELECT ts.TeacherID, SUM(rs.ScoreSum) AS ScoreSum, SUM(rs.ScoreCount) AS ScoreCount
+    FROM (SELECT DISTINCT TeacherID, StudentID FROM Assignments) ts
+    JOIN (
+        SELECT StudentID, SUM(Percentage) AS ScoreSum, COUNT(*) AS ScoreCount
+        FROM Results
+        GROUP BY StudentID
+    ) rs ON rs.StudentID = ts.StudentID
+"""
+
+
+def performance_rating(avg_score):
+    return 'Excellent' if avg_score >= 85 else 'Good' if avg_score >= 70 else 'Average'
+
+
+def build_teacher_leaderboard(cursor):
+    """
+    Compute roster metrics for every teacher with four grouped queries.
+
+    Student and assignment counts come from one pass over Assignments, doubt
+    counts from one pass over Doubts, and the average student score from
+    per-student result totals so each result is counted once per teacher.
+    """
+    cursor.execute("""
+        SELECT UserID, FirstName, LastName, Username, CreatedAt
+        FROM Users
+        WHERE Role = 'Teacher'
+        ORDER BY FirstName, LastName
+    """)
+    teachers = cursor.fetchall()
+    if not teachers:
+        return []
+
+    cursor.execute("""
+        SELECT TeacherID, COUNT(DISTINCT StudentID), COUNT(*)
+        FROM Assignments
+        GROUP BY TeacherID
+    """)
+    assignment_counts = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    cursor.execute(TEACHER_SCORE_TOTALS_SQL + " GROUP BY ts.TeacherID")
+    score_totals = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    cursor.execute("""
+        SELECT TeacherID,
+               SUM(CASE WHEN Status = 'Cleared' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN Status = 'Pending' THEN 1 ELSE 0 END)
+        FROM Doubts
+        WHERE TeacherID IS NOT NULL
+        GROUP BY TeacherID
+    """)
+    doubt_counts = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    result = []
+    for teacher_id, first_name, last_name, username, created_at in teachers:
+        total_students, total_assignments = assignment_counts.get(teacher_id, (0, 0))
+        score_sum, score_count = score_totals.get(teacher_id, (0, 0))
+        avg_score = round(float(score_sum / score_count), 2) if score_count else 0.0
+        doubts_resolved, doubts_pending = doubt_counts.get(teacher_id, (0, 0))
+
+        result.append({
+            'teacherId': teacher_id,
+            'name': f"{first_name} {last_name}",
+            'username': username,
+            'joinDate': created_at.strftime('%Y-%m-%d') if created_at else '',
+            'totalStudents': int(total_students or 0),
+            'avgStudentScore': avg_score,
+            'totalAssignments': int(total_assignments or 0),
+            'doubtsResolved': int(doubts_resolved or 0),
+            'pendingDoubts': int(doubts_pending or 0),
+            'performanceRating': performance_rating(avg_score)
+        })
+    return result
@@ -0,0 +1,88 @@
+"""
+LearnMatrix: Answer-Key Cache and Batched Grader
+Keeps each exam's answer key in process memory so grading a submission does
+not cost one Questions lookup per answer
+"""
+
+import threading
+import time
+
+
+class AnswerKeyCache:
+    """
+    Per-exam {QuestionID: CorrectOption} maps, loaded with one bulk query.
+
+    Call invalidate(exam_id) whenever an exam's questions change. Entries also
+    expire after `ttl` seconds so edits made by other worker processes (or
+    directly in the database) are picked up without a restart.
+    """
+
+    def __init__(self, ttl=300, max_exams=256):
+        self.ttl = ttl
+        self.max_exams = max_exams
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def get(self, cursor, exam_id):
+        """Return the answer key for an exam, loading it with one query on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._keys.get(exam_id)
+            if entry and (not self.ttl or now - entry[0] < self.ttl):
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+
+        cursor.execute("""
+            SELECT QuestionID, CorrectOption FROM Questions WHERE ExamID = %s
+        """, (exam_id,))
+        key = {row[0]: row[1] for row in cursor.fetchall()}
+
+        with self._lock:
+            if exam_id not in self._keys and len(self._keys) >= self.max_exams:
+                # Drop the entry loaded longest ago
+                oldest = min(self._keys, key=lambda k: self._keys[k][0])
+                del self._keys[oldest]
+            self._keys[exam_id] = (now, key)
+        return key
+
+    def invalidate(self, exam_id=None):
+        """Forget one exam's key, or every key when exam_id is None."""
+        with self._lock:
+            if exam_id is None:
+                self._keys.clear()
+            else:
+                self._keys.pop(exam_id, None)
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['exams'] = len(self._keys)
+        return snapshot
+
+
+def grade_answers(cursor, cache, exam_id, answers):
+    """
+    Score a whole {questionId: answer} map against the exam's answer key.
+
+    Costs no query when the key is cached and one otherwise. Questions that
+    are not part of the exam are resolved with a single extra lookup.
+    Returns the number of correct answers.
+    """
+    submitted = {int(qid): answer for qid, answer in answers.items()}
+    if not submitted:
+        return 0
+
+    key = cache.get(cursor, int(exam_id))
+    strays = [qid for qid in submitted if qid not in key]
+    if strays:
+        placeholders = ','.join(['%s'] * len(strays))
+        cursor.execute(f"""
+            SELECT QuestionID, CorrectOption FROM Questions WHERE QuestionID IN ({placeholders})
+        """, strays)
+        key = dict(key)
+        key.update({row[0]: row[1] for row in cursor.fetchall()})
+
+    return sum(1 for qid, answer in submitted.items() if qid in key and key[qid] == answer)
@@ -5,7 +5,7 @@ Author: AI Code Generation System
 Date: November 18, 2025
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, session, redirect, url_for, send_from_directory
 try:
     from flask_session import Session  # type: ignore
     _HAS_FLASK_SESSION = True
@@ -16,33 +16,73 @@ except Exception:
     Session = None
     _HAS_FLASK_SESSION = False
 from functools import wraps
-import mysql.connector
 from mysql.connector import Error
-import bcrypt
+import io
 import json
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
-import time
+import posixpath
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
 
+from config import config
+from db_pool import ConnectionPool, DatabaseUnavailable
+from analytics import (build_student_roster, build_performance_snapshot, build_teacher_leaderboard,
+                       smoothed_completion_rate, stream_performance_snapshot, stream_student_roster,
+                       SNAPSHOT_SORT_KEYS)
+from pagination import (InvalidCursor, KeysetSort, decode_cursor, clamp_page_size, keyset_page,
+                        fetch_keyset_page, parse_page_request)
+from class_stats import (get_class_stats_for_student, on_assignments_created, on_assignment_completed,
+                         on_result_recorded, on_doubt_changed)
+from rollups import record_result, topic_label, weakest_topics
+from answer_keys import AnswerKeyCache, grade_answers
+from question_sampler import QuestionSampler
+from achievements import AchievementEngine
+from activity_ingest import ActivityIngester, ACTIVITY_TYPES
+from response_cache import create_response_cache, student_tag, teacher_tag
+from streaming import STREAM_FORMATS, stream_response
+from exports import EXPORT_SOURCES, csv_lines, iter_chunks, parse_date
+from question_import import detect_format, import_questions, read_records
+from bulk_assignments import bulk_assign
+from bulk_grading import GradingError, apply_grades, parse_grades, read_grade_csv
+from password_hasher import HasherBusy, PasswordHasher
+from session_store import SessionStore, SQLiteSessionInterface
+from identity import IdentityProvider
+from uploads import UploadPolicy, UploadRejected, UploadRequest, accepts_upload, format_size, received_upload
+from blob_store import BlobStore, remove_replaced_file
+from resource_versions import (bump, bump_assignment_teacher, conditional_get, achievements_resource,
+                               assignments_resource, doubts_resource, exams_resource)
+
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+# File parts of @accepts_upload routes stream to disk with size/type checks (see uploads.py)
+app.request_class = UploadRequest
 
 # Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['SESSION_TYPE'] = 'filesystem'
+app.config['SESSION_TYPE'] = config.SESSION_TYPE
 app.config['SESSION_PERMANENT'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 
 # Initialize session management
-if _HAS_FLASK_SESSION and Session is not None:
+if config.SESSION_TYPE == 'sqlite':
+    # One SQLite WAL file instead of a file per session (see session_store.py)
+    session_store = SessionStore(config.SESSION_DB_PATH, sweep_interval=config.SESSION_SWEEP_INTERVAL)
+    app.session_interface = SQLiteSessionInterface(
+        session_store,
+        permanent=app.config['SESSION_PERMANENT'],
+        refresh_interval=config.SESSION_REFRESH_INTERVAL,
+        legacy_dir=config.SESSION_LEGACY_DIR
+    )
+elif _HAS_FLASK_SESSION and Session is not None:
+    session_store = None
     Session(app)
 else:
     # Fall back to Flask's signed cookie sessions when flask-session is unavailable.
+    session_store = None
     print('Warning: flask-session not available; using default cookie sessions.')
 
 # Database connection configuration
@@ -57,60 +97,140 @@ DB_CONFIG = {
 # ============================================================================
 # DATABASE CONNECTION UTILITY
 # ============================================================================
-def get_db_connection():
-    """Establish and return a MySQL database connection."""
-    try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as err:
-        if err.errno == 2003:
-            print("Error: Unable to connect to MySQL Server.")
-        elif err.errno == 1045:
-            print("Error: Invalid username or password.")
-        else:
-            print(f"Error: {err}")
-        return None
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    min_size=config.DB_POOL_MIN_SIZE,
+    max_size=config.DB_POOL_MAX_SIZE,
+    timeout=config.DB_POOL_TIMEOUT,
+    recycle=config.DB_POOL_RECYCLE,
+    idle_timeout=config.DB_POOL_IDLE_TIMEOUT,
+    pre_ping_after=config.DB_POOL_PRE_PING_AFTER
+)
+
+def db_cursor(transaction=False, **cursor_kwargs):
+    """
+    Context manager yielding a cursor on a pooled connection.
+    With transaction=True the block is committed on success and rolled back on error.
+    Raises DatabaseUnavailable when no connection can be checked out.
+    """
+    return db_pool.cursor(transaction=transaction, **cursor_kwargs)
+
+# Exam answer keys for grading (invalidate when an exam's questions change)
+answer_keys = AnswerKeyCache(ttl=config.ANSWER_KEY_TTL)
+
+# In-memory (ExamID, Topic) question index used for drills instead of ORDER BY RAND()
+question_sampler = QuestionSampler(ttl=config.QUESTION_INDEX_TTL)
+
+# Dashboard JSON responses, invalidated by tag when the underlying rows change
+response_cache = create_response_cache(config)
+
+# Upload policies: accepted extensions and their per-file size caps
+IMAGE_EXTENSIONS = ('jpg', 'jpeg', 'png', 'gif', 'webp')
+SUBMISSION_UPLOADS = UploadPolicy(
+    {**dict.fromkeys(('pdf', 'doc', 'docx', 'txt', 'xls', 'xlsx', 'ppt', 'pptx'), config.UPLOAD_DOCUMENT_MAX_BYTES),
+     **dict.fromkeys(('jpg', 'jpeg', 'png'), config.UPLOAD_IMAGE_MAX_BYTES)},
+    config.UPLOAD_INCOMING_DIR, label='PDF, DOC, DOCX, TXT, JPG, PNG, XLS, XLSX, PPT, PPTX',
+    max_body_bytes=config.MAX_CONTENT_LENGTH
+)
+DOUBT_IMAGE_UPLOADS = UploadPolicy(dict.fromkeys(IMAGE_EXTENSIONS, config.UPLOAD_IMAGE_MAX_BYTES),
+                                   config.UPLOAD_INCOMING_DIR, max_body_bytes=config.MAX_CONTENT_LENGTH)
+
+# Submission files and doubt images, stored once per distinct content (see blob_store.py)
+blob_store = BlobStore(config.BLOB_STORE_DIR, config.UPLOAD_INCOMING_DIR)
+
+# Per-request caller identity, with teacher/student links cached for a short TTL
+identity_provider = IdentityProvider(db_cursor, ttl=config.IDENTITY_CACHE_TTL)
+current_identity = identity_provider.current
+
+# bcrypt runs in a bounded process pool so login storms cannot starve request threads
+password_hasher = PasswordHasher(
+    rounds=config.BCRYPT_LOG_ROUNDS,
+    workers=config.PASSWORD_HASH_WORKERS,
+    max_pending=config.PASSWORD_HASH_QUEUE_SIZE,
+    timeout=config.PASSWORD_HASH_TIMEOUT
+)
+
+
+def own_dashboard_tags(cursor=None):
+    """Cache tags for the current student's dashboard and their teachers', from the identity context."""
+    identity = current_identity()
+    return [student_tag(identity.user_id)] + [teacher_tag(t) for t in identity.teacher_ids(cursor)]
+
+
+def dashboard_tags(cursor, student_ids):
+    """Cache tags for the students' dashboards and those of every teacher assigned to them."""
+    student_ids = sorted(set(student_ids))
+    if not student_ids:
+        return []
+    placeholders = ','.join(['%s'] * len(student_ids))
+    cursor.execute(f"""
+        SELECT DISTINCT TeacherID FROM Assignments WHERE StudentID IN ({placeholders})
+    """, student_ids)
+    return ([student_tag(s) for s in student_ids]
+            + [teacher_tag(row[0]) for row in cursor.fetchall()])
+
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(error):
+    return jsonify({'error': 'Database connection failed'}), 500
+
+@app.errorhandler(Error)
+def database_error(error):
+    return jsonify({'error': f'Database error: {error}'}), 500
+
+@app.errorhandler(HasherBusy)
+def password_hasher_busy(error):
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.errorhandler(UploadRejected)
+def upload_rejected(error):
+    return jsonify({'error': str(error)}), error.status
+
+@app.errorhandler(413)
+def request_too_large(error):
+    limit = request.max_content_length
+    return jsonify({'error': f'Request too large (max {format_size(limit)})' if limit else 'Request too large'}), 413
 
 # Health check endpoint for quick DB/service verification
 @app.route('/api/db-health')
 def db_health():
-    """Simple health check that verifies DB connectivity."""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'status': 'error', 'db': 'unreachable'}), 500
+    """Health check that verifies DB connectivity and reports connection pool statistics."""
     try:
-        cursor = conn.cursor()
-        cursor.execute('SELECT 1')
-        cursor.fetchone()
-        return jsonify({'status': 'ok', 'db': 'reachable'}), 200
+        with db_cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+        return jsonify({
+            'status': 'ok',
+            'db': 'reachable',
+            'pool': db_pool.stats(),
+            'activityQueue': activity_ingester.stats(),
+            'achievementQueue': achievement_engine.stats(),
+            'responseCache': response_cache.stats(),
+            'passwordHasher': password_hasher.stats(),
+            'identityCache': identity_provider.stats(),
+            'sessions': session_store.stats() if session_store else {'backend': config.SESSION_TYPE}
+        }), 200
+    except DatabaseUnavailable as e:
+        return jsonify({'status': 'error', 'db': 'unreachable', 'db_error': str(e), 'pool': db_pool.stats()}), 500
     except Exception as e:
-        return jsonify({'status': 'error', 'db_error': str(e)}), 500
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
+        return jsonify({'status': 'error', 'db_error': str(e), 'pool': db_pool.stats()}), 500
 
 # ============================================================================
 # AUTHENTICATION DECORATORS & UTILITIES
 # ============================================================================
+def authentication_required_response():
+    """JSON 401 for API/XHR requests, a redirect to the login page otherwise."""
+    if current_identity().is_api:
+        return jsonify({'error': 'Authentication required'}), 401
+    return redirect(url_for('login'))
+
 def login_required(f):
     """Decorator to check if user is logged in."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if 'user_id' not in session:
-            # If this is an API/XHR request, return JSON 401 instead of HTML redirect
-            try:
-                is_api = request.path.startswith('/api/') or request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
-            except Exception:
-                is_api = False
-            if is_api:
-                return jsonify({'error': 'Authentication required'}), 401
-            return redirect(url_for('login'))
+        if not current_identity().authenticated:
+            return authentication_required_response()
         return f(*args, **kwargs)
     return decorated_function
 
@@ -119,28 +239,22 @@ def role_required(role):
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
-                try:
-                    is_api = request.path.startswith('/api/') or request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
-                except Exception:
-                    is_api = False
-                if is_api:
-                    return jsonify({'error': 'Authentication required'}), 401
-                return redirect(url_for('login'))
-            if session.get('role') != role:
+            identity = current_identity()
+            if not identity.authenticated:
+                return authentication_required_response()
+            if identity.role != role:
                 return jsonify({'error': 'Unauthorized access'}), 403
             return f(*args, **kwargs)
         return decorated_function
     return decorator
 
 def hash_password(password):
-    """Hash password using bcrypt."""
-    salt = bcrypt.gensalt(rounds=12)
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    """Hash password using bcrypt at BCRYPT_LOG_ROUNDS (raises HasherBusy when saturated)."""
+    return password_hasher.hash(password)
 
 def verify_password(password, password_hash):
-    """Verify password against hash."""
-    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    """Verify password against hash; returns (matches, upgraded hash or None)."""
+    return password_hasher.verify(password, password_hash)
 
 # ============================================================================
 # AUTHENTICATION ROUTES
@@ -155,9 +269,18 @@ def index():
             return redirect(url_for('teacher_dashboard'))
     return redirect(url_for('login'))
 
+# The only upload directory served without an authorization check (legacy doubt images);
+# blobs, submissions and in-flight uploads go through their own routes or are never served
+PUBLIC_UPLOAD_DIRS = {'doubts'}
+
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
     """Serve uploaded files."""
+    # Normalise first so /uploads/doubts/../blobs/... cannot pass; compared lowercased because
+    # case-insensitive filesystems (Windows, macOS) would serve /uploads/Blobs/... from blobs/
+    parts = posixpath.normpath(filename).split('/', 1)
+    if len(parts) != 2 or parts[0].lower() not in PUBLIC_UPLOAD_DIRS:
+        return jsonify({'error': 'File not found'}), 404
     return send_from_directory(os.path.join(os.getcwd(), 'uploads'), filename)
 
 @app.route('/register', methods=['GET', 'POST'])
@@ -179,35 +302,23 @@ def register():
         if len(password) < 8:
             return jsonify({'error': 'Password must be at least 8 characters'}), 400
 
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'error': 'Database connection failed'}), 500
-
-        try:
-            cursor = conn.cursor()
-            
+        with db_cursor() as cursor:
             # Check if username or email already exists
             cursor.execute("SELECT UserID FROM Users WHERE Username = %s OR Email = %s", (username, email))
             if cursor.fetchone():
                 return jsonify({'error': 'Username or email already exists'}), 400
 
-            # Hash password and insert user
-            password_hash = hash_password(password)
+        # Hash without holding a pooled connection; the unique keys still catch a racing duplicate
+        password_hash = hash_password(password)
+        with db_cursor() as cursor:
             cursor.execute(
                 """INSERT INTO Users (Username, Email, PasswordHash, Role, FirstName, LastName)
                    VALUES (%s, %s, %s, %s, %s, %s)""",
                 (username, email, password_hash, role, first_name, last_name)
             )
-            conn.commit()
 
             return jsonify({'message': 'Registration successful! Please login.'}), 201
 
-        except Error as err:
-            return jsonify({'error': f'Database error: {err}'}), 500
-        finally:
-            cursor.close()
-            conn.close()
-
     return render_template('register.html')
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -222,12 +333,7 @@ def login():
         if not username or not password:
             return jsonify({'error': 'Username/email and password required'}), 400
 
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'error': 'Database connection failed'}), 500
-
-        try:
-            cursor = conn.cursor()
+        with db_cursor() as cursor:
             # Support login by username or email
             cursor.execute(
                 "SELECT UserID, PasswordHash, Role, FirstName, LastName FROM Users WHERE Username = %s OR Email = %s",
@@ -235,15 +341,25 @@ def login():
             )
             user = cursor.fetchone()
 
-            if not user or not verify_password(password, user[1]):
-                return jsonify({'error': 'Invalid username or password'}), 401
-
-            # Update last login
-            cursor.execute(
-                "UPDATE Users SET LastLogin = NOW() WHERE UserID = %s",
-                (user[0],)
-            )
-            conn.commit()
+        # Verified outside the connection: a queued bcrypt job must not hold a pool slot
+        if not user:
+            return jsonify({'error': 'Invalid username or password'}), 401
+        matches, upgraded_hash = verify_password(password, user[1])
+        if not matches:
+            return jsonify({'error': 'Invalid username or password'}), 401
+
+        with db_cursor() as cursor:
+            # Update last login, replacing a hash made with an outdated BCRYPT_LOG_ROUNDS
+            if upgraded_hash:
+                cursor.execute(
+                    "UPDATE Users SET LastLogin = NOW(), PasswordHash = %s WHERE UserID = %s AND PasswordHash = %s",
+                    (upgraded_hash, user[0], user[1])
+                )
+            else:
+                cursor.execute(
+                    "UPDATE Users SET LastLogin = NOW() WHERE UserID = %s",
+                    (user[0],)
+                )
 
             # Create session
             session['user_id'] = user[0]
@@ -252,17 +368,14 @@ def login():
             session['first_name'] = user[3]
             session['last_name'] = user[4]
 
+            if user[2] == 'Student':
+                achievement_engine.publish('login', user[0], day=date.today())
+
             return jsonify({
                 'message': 'Login successful',
                 'redirect': url_for('student_dashboard') if user[2] == 'Student' else url_for('teacher_dashboard')
             }), 200
 
-        except Error as err:
-            return jsonify({'error': f'Database error: {err}'}), 500
-        finally:
-            cursor.close()
-            conn.close()
-
     return render_template('login.html')
 
 @app.route('/logout')
@@ -290,28 +403,70 @@ def student_assignments():
                          username=session.get('username'),
                          first_name=session.get('first_name'))
 
+ASSIGNMENT_STATUSES = ('Assigned', 'Started', 'Completed', 'Overdue')
+DOUBT_STATUSES = ('Pending', 'In_Progress', 'Cleared')
+
+# List orderings; each key picks the sort columns out of its endpoint's SELECT row
+STUDENT_ASSIGNMENT_SORTS = {
+    'dueDate': KeysetSort([('a.DueDate', True), ('a.AssignmentID', True)], lambda r: (r[4], r[0])),
+    'createdAt': KeysetSort([('a.CreatedAt', True), ('a.AssignmentID', True)], lambda r: (r[7], r[0])),
+}
+
+
+def page_args(sorts, default_sort):
+    """Parse sort/order/limit/cursor for a keyset-paged list; ValueError on bad input."""
+    return parse_page_request(request.args, sorts, default_sort, config.MAX_PAGE_SIZE, config.MAX_PAGE_SIZE)
+
+
+def graded_filter(column):
+    """SQL condition for the `graded` query parameter (true/false), or '' when absent."""
+    graded = request.args.get('graded')
+    if graded in (None, ''):
+        return ''
+    if graded not in ('true', 'false'):
+        raise ValueError('graded must be true or false')
+    return f" AND {column} IS {'NOT ' if graded == 'true' else ''}NULL"
+
+
 @app.route('/api/student/assignments')
 @login_required
 def get_student_assignments():
-    """Get all assignments for the logged-in student."""
-    user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    """
+    Get the logged-in student's assignments, one keyset page at a time.
 
+    Query params: status, exam_id (filters), sort (dueDate, createdAt),
+    order (asc/desc), limit (capped at MAX_PAGE_SIZE) and cursor (nextCursor
+    from the previous page).
+    """
+    user_id = session.get('user_id')
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT a.AssignmentID, a.ExamID, e.ExamName, e.TotalQuestions, 
-                   a.DueDate, a.Status, 
-                   COALESCE((SELECT Percentage FROM Results WHERE AssignmentID = a.AssignmentID AND StudentID = %s LIMIT 1), NULL) as Score
-            FROM Assignments a
-            JOIN Exams e ON a.ExamID = e.ExamID
-            WHERE a.StudentID = %s
-            ORDER BY a.DueDate DESC
-        """, (user_id, user_id))
-        
-        assignments = cursor.fetchall()
+        sort, limit, after = page_args(STUDENT_ASSIGNMENT_SORTS, 'dueDate')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sql = """
+        SELECT a.AssignmentID, a.ExamID, e.ExamName, e.TotalQuestions, 
+               a.DueDate, a.Status, 
+               COALESCE((SELECT Percentage FROM Results WHERE AssignmentID = a.AssignmentID AND StudentID = %s LIMIT 1), NULL) as Score,
+               a.CreatedAt
+        FROM Assignments a
+        JOIN Exams e ON a.ExamID = e.ExamID
+        WHERE a.StudentID = %s
+    """
+    params = [user_id, user_id]
+    status = request.args.get('status')
+    if status:
+        if status not in ASSIGNMENT_STATUSES:
+            return jsonify({'error': f'Invalid status: {status}'}), 400
+        sql += " AND a.Status = %s"
+        params.append(status)
+    exam_id = request.args.get('exam_id', type=int)
+    if exam_id:
+        sql += " AND a.ExamID = %s"
+        params.append(exam_id)
+
+    with db_cursor() as cursor:
+        assignments, next_cursor = fetch_keyset_page(cursor, sql, params, sort, limit, after)
         result = [
             {
                 'assignmentID': row[0],
@@ -324,23 +479,14 @@ def get_student_assignments():
             }
             for row in assignments
         ]
-        return jsonify({'assignments': result}), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        return jsonify({'assignments': result, 'nextCursor': next_cursor}), 200
 
 @app.route('/api/exams')
 @login_required
+@conditional_get(db_cursor, lambda user_id: [exams_resource()], cache_control='private, max-age=300')
 def get_exams():
     """Get all exams for dropdown selection."""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         cursor.execute("SELECT ExamID, ExamName FROM Exams ORDER BY ExamName ASC")
         exams = cursor.fetchall()
         result = [
@@ -351,47 +497,28 @@ def get_exams():
             for row in exams
         ]
         return jsonify({'exams': result}), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/api/student/stats')
 @login_required
+@response_cache.cached(tags=lambda user_id: [student_tag(user_id)])
 def get_student_stats():
     """Get student statistics including total time spent on platform."""
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
-        # Get total time from ActivityLog
+    with db_cursor() as cursor:
+        # Total and focus-session time from the daily activity rollup
         cursor.execute("""
-            SELECT SUM(Duration) as TotalSeconds
-            FROM ActivityLog
+            SELECT SUM(TotalSeconds),
+                   SUM(CASE WHEN ActivityType = 'FocusSession' THEN TotalSeconds ELSE 0 END)
+            FROM DailyActivityRollup
             WHERE UserID = %s
         """, (user_id,))
-        total_time_row = cursor.fetchone()
-        total_seconds = total_time_row[0] if total_time_row[0] else 0
-        total_hours = total_seconds / 3600
-        
-        # Get study hours (focus sessions only)
-        cursor.execute("""
-            SELECT SUM(Duration) as TotalSeconds
-            FROM ActivityLog
-            WHERE UserID = %s AND ActivityType = 'FocusSession'
-        """, (user_id,))
-        study_row = cursor.fetchone()
-        study_seconds = study_row[0] if study_row[0] else 0
-        study_hours = study_seconds / 3600
+        time_row = cursor.fetchone()
+        total_hours = (time_row[0] or 0) / 3600
+        study_hours = (time_row[1] or 0) / 3600
         
         # Get average score
         cursor.execute("""
-            SELECT AVG(Percentage) FROM Results WHERE StudentID = %s
+            SELECT SUM(ScoreSum) / SUM(AttemptCount) FROM TopicScoreRollup WHERE StudentID = %s
         """, (user_id,))
         avg_score_row = cursor.fetchone()
         avg_score = round(avg_score_row[0], 2) if avg_score_row[0] else 0
@@ -421,43 +548,60 @@ def get_student_stats():
             'completedAssignments': completed_assignments,
             'achievements': achievements
         }), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+
+
+TEACHER_DOUBT_SORTS = {
+    # Pending first, then in progress, then cleared; newest first within each
+    'status': KeysetSort([("FIELD(d.Status, 'Pending', 'In_Progress', 'Cleared')", False),
+                          ('d.Timestamp', True), ('d.DoubtID', True)], lambda r: (r[9], r[7], r[0])),
+    'createdAt': KeysetSort([('d.Timestamp', True), ('d.DoubtID', True)], lambda r: (r[7], r[0])),
+}
 
 
 @app.route('/api/teacher/doubts')
 @login_required
 @role_required('Teacher')
 def teacher_doubts():
-    """Return all doubts submitted by students in this teacher's classes."""
-    teacher_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    """
+    Return doubts submitted by students in this teacher's classes, one keyset page at a time.
 
+    Query params: status, topic, student_id (filters), sort (status,
+    createdAt), order, limit and cursor.
+    """
+    teacher_id = session.get('user_id')
     try:
-        cursor = conn.cursor()
-        # Get all doubts from students in teacher's classes
-        cursor.execute("""
-            SELECT d.DoubtID, d.StudentID, CONCAT(u.FirstName, ' ', u.LastName) as StudentName,
-                   d.Topic, d.DoubtText, d.Status, d.ResolutionText, d.Timestamp, d.ImagePath
-            FROM Doubts d
-            JOIN Users u ON d.StudentID = u.UserID
-            WHERE d.StudentID IN (
-                SELECT DISTINCT StudentID FROM Assignments WHERE TeacherID = %s
-            )
-            ORDER BY 
-                CASE WHEN d.Status = 'Pending' THEN 0
-                     WHEN d.Status = 'In_Progress' THEN 1
-                     WHEN d.Status = 'Cleared' THEN 2
-                     ELSE 3 END,
-                d.Timestamp DESC
-        """, (teacher_id,))
-
-        rows = cursor.fetchall()
+        sort, limit, after = page_args(TEACHER_DOUBT_SORTS, 'status')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Doubts from students in the teacher's classes
+    sql = """
+        SELECT d.DoubtID, d.StudentID, CONCAT(u.FirstName, ' ', u.LastName) as StudentName,
+               d.Topic, d.DoubtText, d.Status, d.ResolutionText, d.Timestamp, d.ImagePath,
+               FIELD(d.Status, 'Pending', 'In_Progress', 'Cleared') as StatusRank
+        FROM Doubts d
+        JOIN Users u ON d.StudentID = u.UserID
+        WHERE d.StudentID IN (
+            SELECT DISTINCT StudentID FROM Assignments WHERE TeacherID = %s
+        )
+    """
+    params = [teacher_id]
+    status = request.args.get('status')
+    if status:
+        if status not in DOUBT_STATUSES:
+            return jsonify({'error': f'Invalid status: {status}'}), 400
+        sql += " AND d.Status = %s"
+        params.append(status)
+    if request.args.get('topic'):
+        sql += " AND d.Topic = %s"
+        params.append(request.args['topic'])
+    student_id = request.args.get('student_id', type=int)
+    if student_id:
+        sql += " AND d.StudentID = %s"
+        params.append(student_id)
+
+    with db_cursor() as cursor:
+        rows, next_cursor = fetch_keyset_page(cursor, sql, params, sort, limit, after)
         doubts = [
             {
                 'doubtId': r[0],
@@ -473,13 +617,7 @@ def teacher_doubts():
             for r in rows
         ]
 
-        return jsonify({'doubts': doubts}), 200
-
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        return jsonify({'doubts': doubts, 'nextCursor': next_cursor}), 200
 
 
 @app.route('/api/teacher/respond-doubt', methods=['POST'])
@@ -495,17 +633,13 @@ def respond_doubt():
     if not doubt_id or not resolution:
         return jsonify({'error': 'doubt_id and resolution are required'}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
+    with db_cursor(transaction=True) as cursor:
         # Ensure the doubt belongs to one of this teacher's students
         cursor.execute("""
-            SELECT d.StudentID FROM Doubts d
+            SELECT d.StudentID, d.TeacherID, d.Status FROM Doubts d
             JOIN Assignments a ON d.StudentID = a.StudentID
             WHERE d.DoubtID = %s AND a.TeacherID = %s
+            LIMIT 1
         """, (doubt_id, teacher_id))
 
         row = cursor.fetchone()
@@ -517,86 +651,57 @@ def respond_doubt():
             SET TeacherID = %s, ResolutionText = %s, Status = 'Cleared', ResolvedAt = NOW()
             WHERE DoubtID = %s
         """, (teacher_id, resolution, doubt_id))
+        on_doubt_changed(cursor, row[1], row[2], teacher_id, 'Cleared')
+        bump(cursor, doubts_resource(row[0]))
 
-        conn.commit()
-        return jsonify({'message': 'Doubt resolved successfully'}), 200
+    response_cache.invalidate(teacher_tag(teacher_id), *([teacher_tag(row[1])] if row[1] else []))
+    if row[2] != 'Cleared':
+        achievement_engine.publish('doubt_cleared', row[0])
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+    return jsonify({'message': 'Doubt resolved successfully'}), 200
 
 @app.route('/student/focus-session')
 @login_required
 def focus_sessions_page():
     """Focus sessions page - shows available exams for drilling."""
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return render_template('student/focus-session.html', exams=[], error='Database connection failed')
-
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT ExamID, ExamName, TotalQuestions, TotalTime FROM Exams LIMIT 10")
-        exams = cursor.fetchall()
-        exam_list = [
-            {'examID': e[0], 'examName': e[1], 'totalQuestions': e[2], 'totalTime': e[3]}
-            for e in exams
-        ]
-        return render_template('student/focus-session.html',
-                             exams=exam_list,
-                             username=session.get('username'),
-                             first_name=session.get('first_name'))
+        with db_cursor() as cursor:
+            cursor.execute("SELECT ExamID, ExamName, TotalQuestions, TotalTime FROM Exams LIMIT 10")
+            exams = cursor.fetchall()
+    except DatabaseUnavailable:
+        return render_template('student/focus-session.html', exams=[], error='Database connection failed')
     except Error:
         return render_template('student/focus-session.html', exams=[], username=session.get('username'))
-    finally:
-        cursor.close()
-        conn.close()
+
+    exam_list = [
+        {'examID': e[0], 'examName': e[1], 'totalQuestions': e[2], 'totalTime': e[3]}
+        for e in exams
+    ]
+    return render_template('student/focus-session.html',
+                         exams=exam_list,
+                         username=session.get('username'),
+                         first_name=session.get('first_name'))
 
 @app.route('/api/student/focus-session/<int:exam_id>')
 @login_required
 def get_focus_session_questions(exam_id):
-    """Get questions for focus session drill with optional AI generation."""
+    """Get questions for focus session drill. Pass ?seed=N for a reproducible drill."""
     user_id = session.get('user_id')
+    seed = request.args.get('seed', type=int)
     # AI integration removed — always use database-backed questions
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         # Get weak topics
-        cursor.execute("""
-            SELECT r.Topic FROM Results r
-            WHERE r.StudentID = %s
-            GROUP BY r.Topic
-            ORDER BY AVG(r.Percentage) ASC LIMIT 2
-        """, (user_id,))
+        weak_topics = [row[0] for row in weakest_topics(cursor, user_id, 2)]
         
-        weak_topics = [row[0] for row in cursor.fetchall()]
-        
-        if weak_topics:
-            placeholders = ','.join(['%s'] * len(weak_topics))
-            query = f"""
-                SELECT QuestionID, Topic, QuestionText, DifficultyLevel
-                FROM Questions
-                WHERE ExamID = %s AND Topic IN ({placeholders})
-                ORDER BY RAND() LIMIT 10
-            """
-            cursor.execute(query, [exam_id] + weak_topics)
-        else:
-            cursor.execute("""
-                SELECT QuestionID, Topic, QuestionText, DifficultyLevel
-                FROM Questions
-                WHERE ExamID = %s
-                ORDER BY RAND() LIMIT 10
-            """, (exam_id,))
+        questions = question_sampler.sample(
+            cursor, exam_id, 'QuestionID, Topic, QuestionText, DifficultyLevel',
+            topics=weak_topics or None, k=10, seed=seed
+        )
         
         # Previously there was optional AI-generated questions here. AI support has been removed;
         # fall back to returning questions from the database only.
         
-        questions = cursor.fetchall()
         result = [
             {
                 'questionID': q[0],
@@ -607,11 +712,6 @@ def get_focus_session_questions(exam_id):
             for q in questions
         ]
         return jsonify({'questions': result, 'aiGenerated': False}), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/api/student/focus-session/submit', methods=['POST'])
 @login_required
@@ -628,22 +728,9 @@ def submit_focus_session():
     if not exam_id:
         return jsonify({'error': 'ExamID is required'}), 400
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Calculate correct answers
-        correct_count = 0
-        for qid, answer in answers.items():
-            cursor.execute("""
-                SELECT CorrectAnswer FROM Questions WHERE QuestionID = %s
-            """, (int(qid),))
-            result = cursor.fetchone()
-            if result and result[0] == answer:
-                correct_count += 1
+    with db_cursor(transaction=True) as cursor:
+        # Calculate correct answers against the cached answer key
+        correct_count = grade_answers(cursor, answer_keys, exam_id, answers)
         
         # Get total questions
         total_questions = len(answers) if answers else 0
@@ -654,25 +741,20 @@ def submit_focus_session():
             INSERT INTO Results (StudentID, ExamID, Percentage, TimeSpent, AnswersCorrect)
             VALUES (%s, %s, %s, %s, %s)
         """, (user_id, exam_id, percentage, duration, correct_count))
-        
-        conn.commit()
-        
-        # Check and award achievements
-        check_and_award_achievements(user_id)
-        
-        return jsonify({
-            'success': True,
-            'percentage': percentage,
-            'correctAnswers': correct_count,
-            'totalQuestions': total_questions
-        }), 200
-        
-    except Error as err:
-        conn.rollback()
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        on_result_recorded(cursor, user_id, percentage)
+        record_result(cursor, user_id, None, percentage)
+        stale_tags = own_dashboard_tags(cursor)
+
+    response_cache.invalidate(*stale_tags)
+    # Achievements are evaluated asynchronously
+    achievement_engine.publish('result', user_id, percentage=percentage)
+
+    return jsonify({
+        'success': True,
+        'percentage': percentage,
+        'correctAnswers': correct_count,
+        'totalQuestions': total_questions
+    }), 200
 
 @app.route('/student/doubts')
 @login_required
@@ -682,28 +764,46 @@ def student_doubts():
                          username=session.get('username'),
                          first_name=session.get('first_name'))
 
+STUDENT_DOUBT_SORTS = {
+    'createdAt': KeysetSort([('d.Timestamp', True), ('d.DoubtID', True)], lambda r: (r[5], r[0])),
+}
+
+
 @app.route('/api/student/doubts')
 @login_required
+@conditional_get(db_cursor, lambda user_id: [doubts_resource(user_id)])
 def get_student_doubts():
-    """Get all doubts submitted by the student."""
-    user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    """
+    Get the doubts submitted by the student, one keyset page at a time.
 
-    cursor = None
+    Query params: status, topic (filters), order, limit and cursor.
+    """
+    user_id = session.get('user_id')
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT d.DoubtID, d.Topic, d.DoubtText, d.Status, d.ResolutionText, 
-                   d.Timestamp, CONCAT(u.FirstName, ' ', u.LastName) as TeacherName, d.ImagePath
-            FROM Doubts d
-            LEFT JOIN Users u ON d.TeacherID = u.UserID
-            WHERE d.StudentID = %s
-            ORDER BY d.Timestamp DESC
-        """, (user_id,))
-        
-        doubts = cursor.fetchall()
+        sort, limit, after = page_args(STUDENT_DOUBT_SORTS, 'createdAt')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sql = """
+        SELECT d.DoubtID, d.Topic, d.DoubtText, d.Status, d.ResolutionText, 
+               d.Timestamp, CONCAT(u.FirstName, ' ', u.LastName) as TeacherName, d.ImagePath
+        FROM Doubts d
+        LEFT JOIN Users u ON d.TeacherID = u.UserID
+        WHERE d.StudentID = %s
+    """
+    params = [user_id]
+    status = request.args.get('status')
+    if status:
+        if status not in DOUBT_STATUSES:
+            return jsonify({'error': f'Invalid status: {status}'}), 400
+        sql += " AND d.Status = %s"
+        params.append(status)
+    if request.args.get('topic'):
+        sql += " AND d.Topic = %s"
+        params.append(request.args['topic'])
+
+    with db_cursor() as cursor:
+        doubts, next_cursor = fetch_keyset_page(cursor, sql, params, sort, limit, after)
         result = [
             {
                 'doubtID': row[0],
@@ -717,14 +817,7 @@ def get_student_doubts():
             }
             for row in doubts
         ]
-        return jsonify({'doubts': result}), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        return jsonify({'doubts': result, 'nextCursor': next_cursor}), 200
 
 @app.route('/student/achievements')
 @login_required
@@ -736,15 +829,11 @@ def student_achievements():
 
 @app.route('/api/student/achievements')
 @login_required
+@conditional_get(db_cursor, lambda user_id: [achievements_resource(), achievements_resource(user_id)])
 def get_student_achievements():
     """Get all achievements for the student."""
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         cursor.execute("""
             SELECT AchievementID, TrophyName, Description, Badge, Points, DateEarned
             FROM Achievements
@@ -765,11 +854,6 @@ def get_student_achievements():
             for row in achievements
         ]
         return jsonify({'achievements': result, 'totalPoints': sum([a['points'] for a in result])}), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/student/analytics')
 @login_required
@@ -781,43 +865,33 @@ def student_analytics():
 
 @app.route('/api/student/analytics')
 @login_required
+@response_cache.cached(tags=lambda user_id: [student_tag(user_id)])
 def get_student_analytics():
     """Get comprehensive analytics for the student."""
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         # Overall stats
+        # Topic-wise performance; overall stats are folded from the same rows
         cursor.execute("""
-            SELECT COUNT(DISTINCT ResultID) as TotalTests,
-                   AVG(Percentage) as AvgScore,
-                   MAX(Percentage) as BestScore,
-                   MIN(Percentage) as LowestScore
-            FROM Results
-            WHERE StudentID = %s
-        """, (user_id,))
-        
-        stats = cursor.fetchone()
-        
-        # Topic-wise performance
-        cursor.execute("""
-            SELECT Topic, COUNT(*) as AttemptCount, AVG(Percentage) as AvgScore, MAX(Percentage) as BestScore
-            FROM Results
+            SELECT Topic, AttemptCount, ScoreSum / AttemptCount as AvgScore, BestScore, LowestScore, ScoreSum
+            FROM TopicScoreRollup
             WHERE StudentID = %s
-            GROUP BY Topic
             ORDER BY AvgScore DESC
         """, (user_id,))
         
         topics = cursor.fetchall()
+        total_tests = sum(t[1] for t in topics)
+        stats = (
+            total_tests,
+            sum(t[5] for t in topics) / total_tests if total_tests else None,
+            max(t[3] for t in topics) if topics else None,
+            min(t[4] for t in topics) if topics else None
+        )
         
         # Time stats
         cursor.execute("""
-            SELECT ActivityType, COUNT(*) as Count, SUM(Duration) as TotalSeconds
-            FROM ActivityLog
+            SELECT ActivityType, SUM(ActivityCount) as Count, SUM(TotalSeconds) as TotalSeconds
+            FROM DailyActivityRollup
             WHERE UserID = %s
             GROUP BY ActivityType
         """, (user_id,))
@@ -833,7 +907,7 @@ def get_student_analytics():
             },
             'topicPerformance': [
                 {
-                    'topic': t[0],
+                    'topic': topic_label(t[0]),
                     'attemptCount': t[1],
                     'avgScore': float(t[2]),
                     'bestScore': float(t[3])
@@ -843,17 +917,12 @@ def get_student_analytics():
             'activityStats': [
                 {
                     'activityType': a[0],
-                    'count': a[1],
+                    'count': int(a[1]),
                     'totalHours': round(a[2] / 3600, 2) if a[2] else 0
                 }
                 for a in activities
             ]
         }), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/api/student/weakness-topics')
 @login_required
@@ -863,24 +932,9 @@ def get_weakness_topics():
     Returns the two topics with lowest average scores.
     """
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
-        # Query: Get average score by topic for the student
-        cursor.execute("""
-            SELECT r.Topic, AVG(r.Percentage) as AvgPercentage, COUNT(r.ResultID) as AttemptCount
-            FROM Results r
-            WHERE r.StudentID = %s
-            GROUP BY r.Topic
-            ORDER BY AvgPercentage ASC
-            LIMIT 2
-        """, (user_id,))
-
-        weakness_topics = cursor.fetchall()
+    with db_cursor() as cursor:
+        # Lowest-average topics from the maintained topic mastery rollup
+        weakness_topics = weakest_topics(cursor, user_id, 2)
         
         if not weakness_topics:
             return jsonify({'weaknessTopics': [], 'message': 'No test data available yet'}), 200
@@ -896,52 +950,27 @@ def get_weakness_topics():
 
         return jsonify({'weaknessTopics': result}), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
 @app.route('/student/focus-session/<int:exam_id>')
 @login_required
 def focus_session(exam_id):
     """
     Fetch 10 random questions from the student's two weakest topics
-    for targeted drilling.
+    for targeted drilling. Pass ?seed=N for a reproducible drill.
     """
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
+    seed = request.args.get('seed', type=int)
+    with db_cursor() as cursor:
         # Get two weakest topics
-        cursor.execute("""
-            SELECT r.Topic FROM Results r
-            WHERE r.StudentID = %s
-            GROUP BY r.Topic
-            ORDER BY AVG(r.Percentage) ASC
-            LIMIT 2
-        """, (user_id,))
-        
-        topics = [row[0] for row in cursor.fetchall()]
+        topics = [row[0] for row in weakest_topics(cursor, user_id, 2)]
         
         if not topics:
             return jsonify({'error': 'No weakness data available'}), 400
 
         # Fetch 10 random questions from weakest topics
-        placeholders = ','.join(['%s'] * len(topics))
-        cursor.execute(f"""
-            SELECT QuestionID, QuestionText, Options, Topic, SubTopic
-            FROM Questions
-            WHERE ExamID = %s AND Topic IN ({placeholders})
-            ORDER BY RAND()
-            LIMIT 10
-        """, [exam_id] + topics)
-
-        questions = cursor.fetchall()
+        questions = question_sampler.sample(
+            cursor, exam_id, 'QuestionID, QuestionText, Options, Topic, SubTopic',
+            topics=topics, k=10, seed=seed
+        )
         
         result = [
             {
@@ -960,12 +989,6 @@ def focus_session(exam_id):
             'totalQuestions': len(result)
         }), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
 @app.route('/api/log-activity', methods=['POST'])
 @login_required
 def log_activity():
@@ -986,36 +1009,27 @@ def log_activity():
 
     if not activity_type:
         return jsonify({'error': 'activity_type is required'}), 400
+    if activity_type not in ACTIVITY_TYPES:
+        return jsonify({'error': f'Unknown activity_type: {activity_type}'}), 400
+    if duration is not None:
+        try:
+            duration = int(duration)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'duration must be a whole number of seconds'}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    # Written in batches by the ingester; achievements follow once the batch is stored
+    if not activity_ingester.submit(user_id, activity_type, duration, exam_id, assignment_id, details):
+        response = jsonify({'error': 'Activity queue is full, please retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
 
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO ActivityLog (UserID, ActivityType, Duration, ExamID, AssignmentID, Details)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (user_id, activity_type, duration, exam_id, assignment_id, json.dumps(details)))
-        
-        conn.commit()
-        
-        # Check if achievements can be awarded
-        check_and_award_achievements(user_id)
-        
+    if activity_ingester.synchronous:
         return jsonify({'message': 'Activity logged successfully'}), 201
-
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    return jsonify({'message': 'Activity accepted'}), 202
 
 @app.route('/student/submit-doubt', methods=['POST'])
 @login_required
+@accepts_upload(DOUBT_IMAGE_UPLOADS)
 def submit_doubt():
     """
     Submit a doubt/question for teacher resolution.
@@ -1033,59 +1047,35 @@ def submit_doubt():
     if not topic or not doubt_text:
         return jsonify({'error': 'Topic and doubt description are required'}), 400
 
-    # Handle image upload if provided
-    if 'image' in request.files:
-        file = request.files['image']
-        if file and file.filename:
-            # Validate file type
-            allowed_extensions = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
-            if '.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in allowed_extensions:
-                try:
-                    # Create uploads/doubts directory if it doesn't exist
-                    upload_dir = os.path.join('uploads', 'doubts')
-                    os.makedirs(upload_dir, exist_ok=True)
-                    
-                    # Save file with timestamp to avoid conflicts
-                    filename = secure_filename(f"{int(time.time())}_{file.filename}")
-                    filepath = os.path.join(upload_dir, filename)
-                    file.save(filepath)
-                    image_path = f"uploads/doubts/{filename}"
-                except Exception as e:
-                    print(f"File upload error: {e}")
-                    return jsonify({'error': f'File upload failed: {str(e)}'}), 500
-
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    # Image upload if provided (already streamed to disk and checked by DOUBT_IMAGE_UPLOADS)
+    image = received_upload('image')
+    image_hash = image.sha256 if image else None
 
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        # Validate priority value
-        if priority not in ['Low', 'Medium', 'High']:
-            priority = 'Medium'
-        
-        cursor.execute("""
-            INSERT INTO Doubts (StudentID, Topic, DoubtText, QuestionID, Priority, Status, ImagePath)
-            VALUES (%s, %s, %s, %s, %s, 'Pending', %s)
-        """, (user_id, topic, doubt_text, question_id if question_id else None, priority, image_path))
-        
-        conn.commit()
-        
-        return jsonify({
-            'message': 'Doubt submitted successfully',
-            'doubtId': cursor.lastrowid
-        }), 201
+    # Validate priority value
+    if priority not in ['Low', 'Medium', 'High']:
+        priority = 'Medium'
 
+    try:
+        with db_cursor(transaction=True) as cursor:
+            if image:
+                image_path = blob_store.add(cursor, image)
+            cursor.execute("""
+                INSERT INTO Doubts (StudentID, Topic, DoubtText, QuestionID, Priority, Status, ImagePath, ImageBlobHash)
+                VALUES (%s, %s, %s, %s, %s, 'Pending', %s, %s)
+            """, (user_id, topic, doubt_text, question_id if question_id else None, priority, image_path, image_hash))
+            doubt_id = cursor.lastrowid
+            bump(cursor, doubts_resource(user_id))
     except Error as err:
-        conn.rollback()
         print(f"Database error in submit_doubt: {err}")
         return jsonify({'error': f'Failed to submit doubt: {str(err)}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    except OSError as e:
+        print(f"File upload error: {e}")
+        return jsonify({'error': f'File upload failed: {str(e)}'}), 500
+
+    return jsonify({
+        'message': 'Doubt submitted successfully',
+        'doubtId': doubt_id
+    }), 201
 
 @app.route('/api/student/performance')
 @login_required
@@ -1095,21 +1085,13 @@ def student_performance():
     Returns: progression over time, breakdown by topic/subtopic.
     """
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         # Progression over time (last 10 results)
         cursor.execute("""
-            SELECT DATE(Timestamp) as DateOnly, AVG(Percentage) as AvgPercentage
-            FROM Results
+            SELECT ResultDate as DateOnly, ScoreSum / AttemptCount as AvgPercentage
+            FROM DailyScoreRollup
             WHERE StudentID = %s
-            GROUP BY DATE(Timestamp)
-            ORDER BY DateOnly DESC
+            ORDER BY ResultDate DESC
             LIMIT 10
         """, (user_id,))
         
@@ -1117,23 +1099,22 @@ def student_performance():
         
         # Topic breakdown
         cursor.execute("""
-            SELECT Topic, AVG(Percentage) as AvgPercentage, COUNT(*) as TestCount
-            FROM Results
+            SELECT Topic, ScoreSum / AttemptCount as AvgPercentage, AttemptCount as TestCount
+            FROM TopicScoreRollup
             WHERE StudentID = %s
-            GROUP BY Topic
         """, (user_id,))
         
         topic_breakdown = [
-            {'topic': row[0], 'percentage': float(row[1]), 'testCount': int(row[2])}
+            {'topic': topic_label(row[0]), 'percentage': float(row[1]), 'testCount': int(row[2])}
             for row in cursor.fetchall()
         ]
         
-        # Study hours this week
+        # Study hours this week (last seven calendar days, today included)
         cursor.execute("""
-            SELECT SUM(Duration) as TotalSeconds
-            FROM ActivityLog
+            SELECT SUM(TotalSeconds) as TotalSeconds
+            FROM DailyActivityRollup
             WHERE UserID = %s AND ActivityType = 'FocusSession'
-            AND Timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
+            AND ActivityDate > DATE_SUB(CURDATE(), INTERVAL 7 DAY)
         """, (user_id,))
         
         study_hours_row = cursor.fetchone()
@@ -1145,118 +1126,14 @@ def student_performance():
             'studyHoursThisWeek': float(study_hours)
         }), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
 @app.route('/api/student/class-stats')
 @login_required
 def student_class_stats():
     """Get class-wide statistics for display on student dashboard."""
-    user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        
-        # Find the teacher assigned to this student
-        cursor.execute("""
-            SELECT DISTINCT a.TeacherID
-            FROM Assignments a
-            WHERE a.StudentID = %s
-            LIMIT 1
-        """, (user_id,))
-        teacher_row = cursor.fetchone()
-        if not teacher_row:
-            # No teacher assigned, return default stats
-            return jsonify({
-                'totalStudents': 0,
-                'totalAssignments': 0,
-                'completedAssignments': 0,
-                'totalExams': 0,
-                'totalTestsTaken': 0,
-                'averagePerformance': 0.0,
-                'pendingDoubts': 0
-            }), 200
-        
-        teacher_id = teacher_row[0]
-        
-        # Total students
-        cursor.execute("""
-            SELECT COUNT(DISTINCT StudentID)
-            FROM Assignments
-            WHERE TeacherID = %s
-        """, (teacher_id,))
-        total_students = cursor.fetchone()[0] or 0
-        
-        # Total assignments given
-        cursor.execute("""
-            SELECT COUNT(*) FROM Assignments WHERE TeacherID = %s
-        """, (teacher_id,))
-        total_assignments = cursor.fetchone()[0] or 0
-        
-        # Completed assignments
-        cursor.execute("""
-            SELECT COUNT(*) FROM Assignments WHERE TeacherID = %s AND Status = 'Completed'
-        """, (teacher_id,))
-        completed_assignments = cursor.fetchone()[0] or 0
-        
-        # Total tests available (count all exams)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT ExamID) FROM Exams
-        """)
-        total_exams = cursor.fetchone()[0] or 0
-        
-        # Total test attempts from assigned students
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM Results r
-            JOIN Assignments a ON r.StudentID = a.StudentID
-            WHERE a.TeacherID = %s
-        """, (teacher_id,))
-        total_tests_taken = cursor.fetchone()[0] or 0
-        
-        # Average student performance
-        cursor.execute("""
-            SELECT AVG(r.Percentage)
-            FROM Results r
-            JOIN Assignments a ON r.StudentID = a.StudentID
-            WHERE a.TeacherID = %s
-        """, (teacher_id,))
-        avg_performance = cursor.fetchone()[0] or 0
-        
-        # Pending doubts
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM Doubts d
-            WHERE d.TeacherID = %s AND d.Status = 'Pending'
-        """, (teacher_id,))
-        pending_doubts = cursor.fetchone()[0] or 0
-        
-        return jsonify({
-            'totalStudents': total_students,
-            'totalAssignments': total_assignments,
-            'completedAssignments': completed_assignments,
-            'totalExams': total_exams,
-            'totalTestsTaken': total_tests_taken,
-            'averagePerformance': round(float(avg_performance), 2),
-            'pendingDoubts': pending_doubts
-        }), 200
-
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    identity = current_identity()
+    with db_cursor() as cursor:
+        stats = get_class_stats_for_student(cursor, identity.user_id, identity.teacher_ids(cursor))
+    return jsonify(stats), 200
 
 
 # ============================================================================
@@ -1270,22 +1147,18 @@ def htmx_recent_activity():
     """
     user_id = session.get('user_id')
     activities = []
-    conn = get_db_connection()
-    if not conn:
-        return render_template('partials/recent_activity.html', activities=[])
-
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT ActivityType, Duration, ExamID, AssignmentID, Details, Timestamp
-            FROM ActivityLog
-            WHERE UserID = %s
-            ORDER BY Timestamp DESC
-            LIMIT 5
-        """, (user_id,))
-        rows = cursor.fetchall()
-        # Map rows to simple objects for template consumption
-        for r in rows:
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT ActivityType, Duration, ExamID, AssignmentID, Details, Timestamp
+                FROM ActivityLog
+                WHERE UserID = %s
+                ORDER BY Timestamp DESC
+                LIMIT 5
+            """, (user_id,))
+            rows = cursor.fetchall()
+        # Map rows to simple objects for template consumption
+        for r in rows:
             activities.append({
                 'ActivityType': r[0],
                 'Duration': r[1],
@@ -1296,15 +1169,6 @@ def htmx_recent_activity():
             })
     except Exception:
         activities = []
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     return render_template('partials/recent_activity.html', activities=activities)
 
@@ -1315,34 +1179,18 @@ def htmx_focus_session(exam_id):
     """Return an HTMX partial rendering the focus session Alpine component."""
     print(f"[htmx_focus_session] requested exam_id={exam_id}")
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        # render empty partial with metadata and empty questions array
-        rendered = render_template('partials/focus_session_inner.html', exam_id=exam_id, exam_name=f'Exam {exam_id}', questions=[])
-        wrapper = f"""
-<div data-exam-id="{exam_id}" data-exam-name="Exam {exam_id}">
-    <script type=\"application/json\">{json.dumps([])}</script>
-    {rendered}
-</div>
-"""
-        return wrapper
-
+    seed = request.args.get('seed', type=int)
     try:
-        cursor = conn.cursor()
-        # Get exam name
-        cursor.execute("SELECT ExamName FROM Exams WHERE ExamID = %s", (exam_id,))
-        row = cursor.fetchone()
-        exam_name = row[0] if row else f'Exam {exam_id}'
-
-        # Fetch questions from DB
-        cursor.execute("""
-            SELECT QuestionID, Topic, QuestionText, DifficultyLevel, Options
-            FROM Questions
-            WHERE ExamID = %s
-            ORDER BY RAND()
-            LIMIT 10
-        """, (exam_id,))
-        rows = cursor.fetchall()
+        with db_cursor() as cursor:
+            # Get exam name
+            cursor.execute("SELECT ExamName FROM Exams WHERE ExamID = %s", (exam_id,))
+            row = cursor.fetchone()
+            exam_name = row[0] if row else f'Exam {exam_id}'
+
+            # Fetch questions from DB
+            rows = question_sampler.sample(
+                cursor, exam_id, 'QuestionID, Topic, QuestionText, DifficultyLevel, Options', k=10, seed=seed
+            )
         questions = []
         for r in rows:
             options = []
@@ -1360,54 +1208,31 @@ def htmx_focus_session(exam_id):
     except Exception:
         questions = []
         exam_name = f'Exam {exam_id}'
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
 
-    # If no questions found for this exam, try a fallback random pool (outside finally)
+    # If no questions found for this exam, try a fallback random pool
     fallback_used = False
     if not questions:
         print(f"[htmx_focus_session] no questions found for exam {exam_id}; trying fallback pool")
         try:
-            conn2 = get_db_connection()
-            if conn2:
-                cur2 = conn2.cursor()
-                cur2.execute("""
-                    SELECT QuestionID, Topic, QuestionText, DifficultyLevel, Options
-                    FROM Questions
-                    ORDER BY RAND()
-                    LIMIT 10
-                """)
-                rows = cur2.fetchall()
-                for r in rows:
-                    options = []
-                    try:
-                        options = json.loads(r[4]) if r[4] else []
-                    except Exception:
-                        options = []
-                    questions.append({
-                        'questionID': r[0],
-                        'topic': r[1],
-                        'text': r[2],
-                        'difficulty': r[3] or 'Medium',
-                        'options': options
-                    })
-                try:
-                    cur2.close()
-                except Exception:
-                    pass
+            with db_cursor() as cur2:
+                rows = question_sampler.sample(
+                    cur2, None, 'QuestionID, Topic, QuestionText, DifficultyLevel, Options', k=10, seed=seed
+                )
+            for r in rows:
+                options = []
                 try:
-                    conn2.close()
+                    options = json.loads(r[4]) if r[4] else []
                 except Exception:
-                    pass
-                if questions:
-                    fallback_used = True
+                    options = []
+                questions.append({
+                    'questionID': r[0],
+                    'topic': r[1],
+                    'text': r[2],
+                    'difficulty': r[3] or 'Medium',
+                    'options': options
+                })
+            if questions:
+                fallback_used = True
         except Exception as e:
             print(f"[htmx_focus_session] fallback query failed: {e}")
 
@@ -1452,123 +1277,29 @@ def student_roster():
     """
     Fetch all assigned students with their engagement scores.
     Engagement Score = (Study Hours * 0.3) + (Completion Rate * 0.4) + (Trophy Count * 0.3)
+    Metrics for the whole cohort come from a fixed number of grouped queries (see analytics.py).
+    ?stream=ndjson|json streams the roster row by row instead (name order).
     """
     teacher_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
-        # Get all unique students assigned to this teacher
-        cursor.execute("""
-            SELECT DISTINCT a.StudentID, u.FirstName, u.LastName, u.Username
-            FROM Assignments a
-            JOIN Users u ON a.StudentID = u.UserID
-            WHERE a.TeacherID = %s
-        """, (teacher_id,))
-        
-        students = cursor.fetchall()
-        # If teacher has very few assigned students, fall back to returning all students
-        # so the teacher can view wider roster (useful in small test data setups).
-        assigned_mode = True
-        if not students or len(students) < 5:
-            cursor.execute("""
-                SELECT UserID, FirstName, LastName, Username
-                FROM Users
-                WHERE Role = 'Student'
-                ORDER BY FirstName, LastName
-            """)
-            students = cursor.fetchall()
-            assigned_mode = False
-        roster = []
-        
-        for student in students:
-            student_id, first_name, last_name, username = student
-            
-            # Calculate study hours (last 30 days)
-            cursor.execute("""
-                SELECT SUM(Duration) as TotalSeconds
-                FROM ActivityLog
-                WHERE UserID = %s AND ActivityType = 'FocusSession'
-                AND Timestamp >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-            """, (student_id,))
-            study_hours_row = cursor.fetchone()
-            study_hours = float((study_hours_row[0] / 3600) if study_hours_row[0] else 0)
-            
-            # Calculate completion rate
-            if assigned_mode:
-                cursor.execute("""
-                    SELECT COUNT(CASE WHEN Status = 'Completed' THEN 1 END) as Completed,
-                           COUNT(*) as Total
-                    FROM Assignments
-                    WHERE StudentID = %s AND TeacherID = %s
-                """, (student_id, teacher_id))
-            else:
-                # When listing all students (fallback), compute completion regardless of teacher
-                cursor.execute("""
-                    SELECT COUNT(CASE WHEN Status = 'Completed' THEN 1 END) as Completed,
-                           COUNT(*) as Total
-                    FROM Assignments
-                    WHERE StudentID = %s
-                """, (student_id,))
-            completion_row = cursor.fetchone()
-            # Apply Bayesian smoothing to avoid extreme 0%/100% values for small sample sizes.
-            # Use a weak prior: prior_mean = 0.40 (40%), prior_weight = 2 pseudo-observations.
-            completed = int(completion_row[0] or 0)
-            total = int(completion_row[1] or 0)
-            prior_mean = 0.40
-            prior_weight = 2
-            if (total + prior_weight) > 0:
-                completion_rate = float((completed + prior_mean * prior_weight) / (total + prior_weight) * 100)
-            else:
-                completion_rate = 0.0
-            
-            # Count trophies
-            cursor.execute("""
-                SELECT COUNT(*) FROM Achievements WHERE StudentID = %s
-            """, (student_id,))
-            trophy_count = cursor.fetchone()[0]
-            
-            # Calculate engagement score
-            engagement_score = (study_hours * 0.3) + (completion_rate * 0.004) + (trophy_count * 10)
-            
-            roster.append({
-                'studentId': student_id,
-                'name': f"{first_name} {last_name}",
-                'username': username,
-                'engagementScore': round(engagement_score, 2),
-                'studyHours': round(study_hours, 1),
-                'completionRate': round(completion_rate, 1),
-                'trophyCount': trophy_count,
-                'scoreLevel': 'High' if engagement_score >= 70 else 'Medium' if engagement_score >= 40 else 'Low'
-            })
-        
-        # Sort by engagement score descending
-        roster.sort(key=lambda x: x['engagementScore'], reverse=True)
-        
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in STREAM_FORMATS:
+            return jsonify({'error': f'Invalid stream format: {stream}'}), 400
+        return stream_response(db_cursor, lambda cursor: stream_student_roster(cursor, teacher_id),
+                               stream, 'students')
+
+    with db_cursor() as cursor:
+        roster = build_student_roster(cursor, teacher_id)
         return jsonify({'students': roster}), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
 @app.route('/api/teacher/stats')
 @login_required
 @role_required('Teacher')
+@response_cache.cached(tags=lambda user_id: [teacher_tag(user_id)])
 def get_teacher_stats():
     """Get teacher dashboard statistics including total student study hours."""
     teacher_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         # Get assigned students
         cursor.execute("""
             SELECT COUNT(DISTINCT StudentID)
@@ -1577,12 +1308,13 @@ def get_teacher_stats():
         """, (teacher_id,))
         total_students = cursor.fetchone()[0] or 0
         
-        # Get total study hours from all assigned students
+        # Get total study hours from all assigned students (the daily rollup
+        # outlives expired ActivityLog partitions)
         cursor.execute("""
-            SELECT SUM(al.Duration) as TotalSeconds
-            FROM ActivityLog al
-            JOIN Assignments a ON al.UserID = a.StudentID
-            WHERE a.TeacherID = %s AND al.ActivityType = 'FocusSession'
+            SELECT SUM(TotalSeconds) as TotalSeconds
+            FROM DailyActivityRollup
+            WHERE ActivityType = 'FocusSession'
+            AND UserID IN (SELECT StudentID FROM Assignments WHERE TeacherID = %s)
         """, (teacher_id,))
         study_hours_row = cursor.fetchone()
         total_study_hours = float((study_hours_row[0] / 3600) if study_hours_row[0] else 0)
@@ -1597,14 +1329,7 @@ def get_teacher_stats():
         """, (teacher_id,))
         completion_row = cursor.fetchone()
         # Bayesian smoothing for aggregated completion rate as well
-        completed = int(completion_row[0] or 0)
-        total = int(completion_row[1] or 0)
-        prior_mean = 0.40
-        prior_weight = 2
-        if (total + prior_weight) > 0:
-            completion_rate = float((completed + prior_mean * prior_weight) / (total + prior_weight) * 100)
-        else:
-            completion_rate = 0.0
+        completion_rate = smoothed_completion_rate(completion_row[0], completion_row[1])
         
         # Get pending doubts
         cursor.execute("""
@@ -1619,176 +1344,103 @@ def get_teacher_stats():
             'completionRate': round(completion_rate, 1),
             'pendingDoubts': pending_doubts
         }), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/api/teacher/all-students')
 @login_required
 @role_required('Teacher')
 def get_all_students_performance():
-    """Fetch all students with their performance metrics (not just assigned students)."""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    """
+    Fetch all students with their performance metrics (not just assigned students).
 
+    Query params: sort (avgScore, studyHours, totalTime, completedAssignments,
+    achievements, name), order (asc/desc), limit (page size, capped at
+    MAX_PAGE_SIZE) and cursor (nextCursor from the previous page).
+    With stream=ndjson|json every student is streamed in the requested order
+    instead of one page (limit and cursor are ignored).
+    """
+    sort = request.args.get('sort', 'avgScore')
+    if sort not in SNAPSHOT_SORT_KEYS:
+        return jsonify({'error': f'Invalid sort field: {sort}'}), 400
+    descending = request.args.get('order', 'asc' if sort == 'name' else 'desc').lower() != 'asc'
+
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in STREAM_FORMATS:
+            return jsonify({'error': f'Invalid stream format: {stream}'}), 400
+        return stream_response(db_cursor, lambda cursor: stream_performance_snapshot(cursor, sort, descending),
+                               stream, 'students')
+
+    limit = clamp_page_size(request.args.get('limit'), config.MAX_PAGE_SIZE, config.MAX_PAGE_SIZE)
     try:
-        cursor = conn.cursor()
-        
-        # Get all students in the system
-        cursor.execute("""
-            SELECT UserID, FirstName, LastName, Username, CreatedAt
-            FROM Users
-            WHERE Role = 'Student'
-            ORDER BY FirstName, LastName
-        """)
-        
-        students = cursor.fetchall()
-        roster = []
-        
-        for student in students:
-            try:
-                student_id, first_name, last_name, username, created_at = student
-                
-                # Calculate study hours (total from ActivityLog)
-                cursor.execute("""
-                    SELECT SUM(Duration) as TotalSeconds
-                    FROM ActivityLog
-                    WHERE UserID = %s AND ActivityType = 'FocusSession'
-                """, (student_id,))
-                study_hours_row = cursor.fetchone()
-                study_hours = float((study_hours_row[0] / 3600) if study_hours_row[0] else 0)
-                
-                # Calculate total time using all activities
-                cursor.execute("""
-                    SELECT SUM(Duration) as TotalSeconds
-                    FROM ActivityLog
-                    WHERE UserID = %s
-                """, (student_id,))
-                total_time_row = cursor.fetchone()
-                total_time = float((total_time_row[0] / 3600) if total_time_row[0] else 0)
-                
-                # Get average test score
-                cursor.execute("""
-                    SELECT AVG(Percentage) FROM Results WHERE StudentID = %s
-                """, (student_id,))
-                avg_score_row = cursor.fetchone()
-                avg_score = float(round(avg_score_row[0], 2) if avg_score_row[0] else 0)
-                
-                # Count assignments completed
-                cursor.execute("""
-                    SELECT COUNT(*) FROM Assignments WHERE StudentID = %s AND Status = 'Completed'
-                """, (student_id,))
-                completed_assignments = int(cursor.fetchone()[0] or 0)
-                
-                # Count achievements
-                cursor.execute("""
-                    SELECT COUNT(*) FROM Achievements WHERE StudentID = %s
-                """, (student_id,))
-                achievements = int(cursor.fetchone()[0] or 0)
-                
-                roster.append({
-                    'studentId': student_id,
-                    'name': f"{first_name or ''} {last_name or ''}".strip() or 'Unknown',
-                    'username': username or 'unknown',
-                    'studyHours': round(study_hours, 2),
-                    'totalTime': round(total_time, 2),
-                    'avgScore': avg_score,
-                    'completedAssignments': completed_assignments,
-                    'achievements': achievements,
-                    'joinDate': created_at.strftime('%Y-%m-%d') if created_at else '',
-                    'performanceLevel': 'High' if avg_score >= 80 else 'Good' if avg_score >= 70 else 'Average' if avg_score >= 60 else 'Below Average'
-                })
-            except Exception as e:
-                # Log error but continue processing other students
-                print(f"Error processing student {student_id if 'student_id' in locals() else 'unknown'}: {e}")
-                continue
-        
-        # Sort by average score descending
-        roster.sort(key=lambda x: x['avgScore'], reverse=True)
-        
-        return jsonify({'students': roster}), 200
+        after = decode_cursor(request.args.get('cursor'))
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
-@app.route('/api/admin/teachers')
-@login_required
-@role_required('Teacher')
-def admin_teachers():
-    """Return list of teachers with aggregated metrics for the roster page."""
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
+    with db_cursor() as cursor:
+        snapshot = build_performance_snapshot(cursor)
 
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT UserID, FirstName, LastName, Username, CreatedAt
-            FROM Users
-            WHERE Role = 'Teacher'
-            ORDER BY FirstName, LastName
-        """)
-        teachers = cursor.fetchall()
-        result = []
-        for t in teachers:
-            teacher_id, first_name, last_name, username, created_at = t
+        page, next_cursor = keyset_page(snapshot, SNAPSHOT_SORT_KEYS[sort], limit, after=after, descending=descending)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
 
-            # Total students assigned
-            cursor.execute("""
-                SELECT COUNT(DISTINCT StudentID) FROM Assignments WHERE TeacherID = %s
-            """, (teacher_id,))
-            total_students = cursor.fetchone()[0] or 0
+    return jsonify({'students': page, 'nextCursor': next_cursor, 'total': len(snapshot)}), 200
 
-            # Average student score for this teacher
-            cursor.execute("""
-                SELECT AVG(r.Percentage) FROM Results r
-                JOIN Assignments a ON r.StudentID = a.StudentID
-                WHERE a.TeacherID = %s
-            """, (teacher_id,))
-            avg_score = cursor.fetchone()[0] or 0
-            avg_score = round(float(avg_score), 2)
-
-            # Total assignments
-            cursor.execute("""
-                SELECT COUNT(*) FROM Assignments WHERE TeacherID = %s
-            """, (teacher_id,))
-            total_assignments = cursor.fetchone()[0] or 0
+@app.route('/api/teacher/export/<source>')
+@login_required
+@role_required('Teacher')
+def export_teacher_data(source):
+    """
+    Download Results or ActivityLog rows for the teacher's students as CSV.
 
-            # Doubts resolved and pending
-            cursor.execute("""
-                SELECT COUNT(*) FROM Doubts WHERE TeacherID = %s AND Status = 'Cleared'
-            """, (teacher_id,))
-            doubts_resolved = cursor.fetchone()[0] or 0
-            cursor.execute("""
-                SELECT COUNT(*) FROM Doubts WHERE TeacherID = %s AND Status = 'Pending'
-            """, (teacher_id,))
-            doubts_pending = cursor.fetchone()[0] or 0
+    Query params: exam_id, since / until (YYYY-MM-DD, until exclusive) and
+    after (resume after this primary key, i.e. the first column of the last
+    row received). Rows are read EXPORT_CHUNK_SIZE at a time in key order and
+    streamed, so the whole table is never held in memory.
+    """
+    if source not in EXPORT_SOURCES:
+        return jsonify({'error': f'Unknown export source: {source}'}), 404
+    try:
+        filters = {
+            'teacher_id': session['user_id'],
+            'exam_id': request.args.get('exam_id', type=int),
+            'since': parse_date(request.args.get('since')),
+            'until': parse_date(request.args.get('until')),
+        }
+    except ValueError:
+        return jsonify({'error': 'since/until must be YYYY-MM-DD'}), 400
+    after = request.args.get('after', type=int)
+
+    def generate():
+        header = True
+        last_key = after
+        try:
+            with db_cursor() as cursor:
+                for columns, rows in iter_chunks(cursor, EXPORT_SOURCES[source], filters,
+                                                 config.EXPORT_CHUNK_SIZE, after=after):
+                    yield csv_lines(columns, rows, header=header)
+                    header = False
+                    last_key = rows[-1][0]
+        except Exception as e:
+            # The 200 headers are already sent, so re-raise: the server drops the connection
+            # without ending the chunked body and the client sees a failed download instead of
+            # a short CSV, then resumes with ?after=<last key received>
+            print(f"[export] {source} export aborted after key {last_key}: {e}")
+            raise
 
-            result.append({
-                'teacherId': teacher_id,
-                'name': f"{first_name} {last_name}",
-                'username': username,
-                'joinDate': created_at.strftime('%Y-%m-%d') if created_at else '',
-                'totalStudents': total_students,
-                'avgStudentScore': avg_score,
-                'totalAssignments': total_assignments,
-                'doubtsResolved': doubts_resolved,
-                'pendingDoubts': doubts_pending,
-                'performanceRating': 'Excellent' if avg_score >= 85 else 'Good' if avg_score >= 70 else 'Average'
-            })
+    response = Response(generate(), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="{source}-export.csv"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
+@app.route('/api/admin/teachers')
+@login_required
+@role_required('Teacher')
+def admin_teachers():
+    """Return list of teachers with aggregated metrics for the roster page."""
+    with db_cursor() as cursor:
+        result = build_teacher_leaderboard(cursor)
         return jsonify({'teachers': result}), 200
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 
 @app.route('/api/teacher/assignment/create', methods=['POST'])
@@ -1804,41 +1456,25 @@ def create_assignment():
 
     if not exam_id or not student_ids:
         return jsonify({'error': 'exam_id and student_ids are required'}), 400
-
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        assignment_ids = []
-        
-        for student_id in student_ids:
-            # Check if assignment already exists
-            cursor.execute("""
-                SELECT AssignmentID FROM Assignments
-                WHERE TeacherID = %s AND StudentID = %s AND ExamID = %s
-            """, (teacher_id, student_id, exam_id))
-            
-            if not cursor.fetchone():
-                cursor.execute("""
-                    INSERT INTO Assignments (TeacherID, StudentID, ExamID, Status, DueDate)
-                    VALUES (%s, %s, %s, 'Assigned', %s)
-                """, (teacher_id, student_id, exam_id, due_date))
-                assignment_ids.append(cursor.lastrowid)
-        
-        conn.commit()
-        
-        return jsonify({
-            'message': 'Assignments created successfully',
-            'assignmentIds': assignment_ids
-        }), 201
-
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+    if not isinstance(student_ids, list) or not all(isinstance(s, int) and not isinstance(s, bool) for s in student_ids):
+        return jsonify({'error': 'student_ids must be a list of integers'}), 400
+
+    with db_cursor(transaction=True) as cursor:
+        result = bulk_assign(cursor, teacher_id, exam_id, student_ids, due_date,
+                             batch_size=config.ASSIGNMENT_BATCH_SIZE, return_ids=True)
+        on_assignments_created(cursor, teacher_id, result['created'])
+        if result['created']:
+            bump(cursor, assignments_resource(teacher_id))
+
+    if result['created']:
+        identity_provider.invalidate(teacher_id, *student_ids)
+        response_cache.invalidate(teacher_tag(teacher_id), *[student_tag(s) for s in student_ids])
+    return jsonify({
+        'message': 'Assignments created successfully',
+        'assignmentIds': result['assignmentIds'],
+        'created': result['created'],
+        'skipped': result['skipped']
+    }), 201
 
 @app.route('/api/teacher/assignment/create-simple', methods=['POST'])
 @login_required
@@ -1852,15 +1488,9 @@ def create_simple_assignment():
     if not exam_id or not due_date:
         return jsonify({'error': 'exam_id and due_date are required'}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        
-        # Get all students this teacher has taught
+    with db_cursor(transaction=True) as cursor:
+        # Get all students this teacher has taught (read here, not from the identity cache,
+        # so the cohort is exact inside the write transaction)
         cursor.execute("""
             SELECT DISTINCT StudentID FROM Assignments WHERE TeacherID = %s
         """, (teacher_id,))
@@ -1872,35 +1502,22 @@ def create_simple_assignment():
             cursor.execute("SELECT UserID FROM Users WHERE Role = 'Student' AND IsActive = 1")
             student_ids = [row[0] for row in cursor.fetchall()]
         
-        created_count = 0
-        for student_id in student_ids:
-            # Check if assignment already exists
-            cursor.execute("""
-                SELECT AssignmentID FROM Assignments 
-                WHERE StudentID = %s AND TeacherID = %s AND ExamID = %s
-            """, (student_id, teacher_id, exam_id))
-            
-            if not cursor.fetchone():
-                cursor.execute("""
-                    INSERT INTO Assignments (StudentID, TeacherID, ExamID, DueDate, Status)
-                    VALUES (%s, %s, %s, %s, 'Assigned')
-                """, (student_id, teacher_id, exam_id, due_date))
-                created_count += 1
-        
-        conn.commit()
-        
-        return jsonify({
-            'message': f'Assignment created and assigned to {created_count} students',
-            'studentCount': created_count
-        }), 201
-
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        result = bulk_assign(cursor, teacher_id, exam_id, student_ids, due_date,
+                             batch_size=config.ASSIGNMENT_BATCH_SIZE)
+        created_count = result['created']
+        on_assignments_created(cursor, teacher_id, created_count)
+        if created_count:
+            bump(cursor, assignments_resource(teacher_id))
+
+    if created_count:
+        identity_provider.invalidate(teacher_id, *student_ids)
+        response_cache.invalidate(teacher_tag(teacher_id), *[student_tag(s) for s in student_ids])
+    return jsonify({
+        'message': f'Assignment created and assigned to {created_count} students',
+        'studentCount': created_count,
+        'created': created_count,
+        'skipped': result['skipped']
+    }), 201
 
 @app.route('/api/teacher/analysis/question-effectiveness', methods=['POST'])
 @login_required
@@ -1917,13 +1534,7 @@ def question_effectiveness():
     if not exam_id:
         return jsonify({'error': 'exam_id is required'}), 400
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         # Verify teacher owns this exam
         cursor.execute("""
             SELECT DISTINCT q.TeacherID FROM Questions q WHERE q.ExamID = %s
@@ -1962,25 +1573,13 @@ def question_effectiveness():
         
         return jsonify({'analysis': analysis}), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
-
 @app.route('/api/teacher/doubts-frequency')
 @login_required
 @role_required('Teacher')
 def doubts_frequency():
     """Get frequency of doubts by topic for the teacher's students."""
     teacher_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         cursor.execute("""
             SELECT d.Topic, COUNT(d.DoubtID) as DoubtCount
             FROM Doubts d
@@ -1994,78 +1593,43 @@ def doubts_frequency():
         
         return jsonify({'doubtsByTopic': doubts}), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 # ============================================================================
 # GAMIFICATION & ACHIEVEMENT LOGIC
 # ============================================================================
-def check_and_award_achievements(user_id):
-    """
-    Check and award achievements based on student performance and activity.
-    Achievements:
-    - "Focused Learner": 5+ hours of study in a week
-    - "Consistent": 7 consecutive days of login
-    - "High Scorer": 90%+ in any test
-    - "Problem Solver": Cleared 5+ doubts
-    """
-    conn = get_db_connection()
-    if not conn:
-        return
-
+# Trophies are awarded off the request path by a background worker that
+# consumes the events published by the routes above (rules: achievements.py)
+achievement_engine = AchievementEngine(
+    db_cursor,
+    max_queue=config.ACHIEVEMENT_QUEUE_SIZE,
+    on_awarded=lambda student_id, trophies: response_cache.invalidate(student_tag(student_id))
+)
+
+
+def publish_activity_achievements(events):
+    """Hand stored activity events to the achievement engine and drop the dashboards they change."""
+    for event in events:
+        achievement_engine.publish('activity', event['user_id'],
+                                   activity_type=event['activity_type'], duration=event['duration'])
     try:
-        cursor = conn.cursor()
-        
-        # Check "Focused Learner" (5+ hours this week)
-        cursor.execute("""
-            SELECT SUM(Duration) FROM ActivityLog
-            WHERE UserID = %s AND ActivityType = 'FocusSession'
-            AND Timestamp >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-        """, (user_id,))
-        
-        study_seconds = cursor.fetchone()[0] or 0
-        if study_seconds >= 18000:  # 5 hours = 18000 seconds
-            cursor.execute("""
-                SELECT AchievementID FROM Achievements
-                WHERE StudentID = %s AND TrophyName = 'Focused Learner'
-            """, (user_id,))
-            
-            if not cursor.fetchone():
-                cursor.execute("""
-                    INSERT INTO Achievements (StudentID, TrophyName, Description, Badge, Points)
-                    VALUES (%s, 'Focused Learner', 'Completed 5+ hours of focused study sessions', 'focus-badge', 50)
-                """, (user_id,))
-                conn.commit()
-        
-        # Check "High Scorer" (90%+ in any test)
-        cursor.execute("""
-            SELECT COUNT(*) FROM Achievements
-            WHERE StudentID = %s AND TrophyName = 'High Scorer'
-        """, (user_id,))
-        
-        existing = cursor.fetchone()[0]
-        if existing == 0:
-            cursor.execute("""
-                SELECT COUNT(DISTINCT ResultID) FROM Results
-                WHERE StudentID = %s AND Percentage >= 90
-            """, (user_id,))
-            
-            high_scores = cursor.fetchone()[0]
-            if high_scores > 0:
-                cursor.execute("""
-                    INSERT INTO Achievements (StudentID, TrophyName, Description, Badge, Points)
-                    VALUES (%s, 'High Scorer', 'Scored 90% or higher on a test', 'star-badge', 100)
-                """, (user_id,))
-                conn.commit()
-
-    except Error:
-        pass
-    finally:
-        cursor.close()
-        conn.close()
+        with db_cursor() as cursor:
+            stale_tags = dashboard_tags(cursor, [event['user_id'] for event in events])
+    except (Error, DatabaseUnavailable):
+        # Without the teacher links, at least the students' own dashboards refresh
+        stale_tags = [student_tag(event['user_id']) for event in events]
+    response_cache.invalidate(*stale_tags)
+
+
+# Write-behind buffer for /api/log-activity (see activity_ingest.py)
+activity_ingester = ActivityIngester(
+    db_cursor,
+    max_queue=config.ACTIVITY_QUEUE_SIZE,
+    batch_size=config.ACTIVITY_BATCH_SIZE,
+    flush_interval=config.ACTIVITY_FLUSH_INTERVAL,
+    spill_path=config.ACTIVITY_SPILL_PATH or None,
+    on_flushed=publish_activity_achievements,
+    synchronous=config.ACTIVITY_WRITE_MODE == 'sync'
+)
 
 # ============================================================================
 # TEACHER PORTAL - ADDITIONAL PAGES
@@ -2121,17 +1685,12 @@ def teacher_doubts_page():
 @app.route('/api/teacher/assignments')
 @login_required
 @role_required('Teacher')
+@conditional_get(db_cursor, lambda user_id: [assignments_resource(user_id), exams_resource()],
+                 cache_control='private, no-cache')
 def get_teacher_assignments():
     """Get all assignments created/managed by this teacher."""
     teacher_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         cursor.execute("""
             SELECT a.AssignmentID, a.ExamID, e.ExamName, a.DueDate, a.Status,
                    COUNT(DISTINCT a.StudentID) as StudentCount,
@@ -2165,28 +1724,14 @@ def get_teacher_assignments():
         
         return jsonify({'assignments': result}), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
 @app.route('/api/teacher/class-analytics')
 @login_required
 @role_required('Teacher')
+@response_cache.cached(tags=lambda user_id: [teacher_tag(user_id)])
 def teacher_class_analytics():
     """Get class-wide analytics and performance metrics."""
     teacher_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         # Performance distribution (breakdown by score ranges)
         cursor.execute("""
             SELECT 
@@ -2259,13 +1804,6 @@ def teacher_class_analytics():
             'assignmentTrend': assignment_trend
         }), 200
 
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 # ============================================================================
 # ERROR HANDLERS
@@ -2274,32 +1812,22 @@ def teacher_class_analytics():
 @login_required
 def admin_exam_question_counts():
     """Admin diagnostics: show exam list with question counts."""
-    conn = get_db_connection()
-    if not conn:
-        return "Database connection failed", 500
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT e.ExamID, e.ExamName, COALESCE(COUNT(q.QuestionID),0) as QCount
-            FROM Exams e
-            LEFT JOIN Questions q ON e.ExamID = q.ExamID
-            GROUP BY e.ExamID, e.ExamName
-            ORDER BY e.ExamName ASC
-        """)
-        rows = cursor.fetchall()
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT e.ExamID, e.ExamName, COALESCE(COUNT(q.QuestionID),0) as QCount
+                FROM Exams e
+                LEFT JOIN Questions q ON e.ExamID = q.ExamID
+                GROUP BY e.ExamID, e.ExamName
+                ORDER BY e.ExamName ASC
+            """)
+            rows = cursor.fetchall()
         exams = [{'examID': r[0], 'examName': r[1], 'count': int(r[2])} for r in rows]
+    except DatabaseUnavailable:
+        return "Database connection failed", 500
     except Exception as e:
         print(f"[admin_exam_question_counts] error: {e}")
         exams = []
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     return render_template('admin/exam_question_counts.html', exams=exams,
                            username=session.get('username'), first_name=session.get('first_name'))
@@ -2320,46 +1848,71 @@ def admin_seed_sample_questions():
 
     seed_count = int(data.get('count') or 5)
 
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM Questions WHERE ExamID = %s", (exam_id,))
-        existing = cursor.fetchone()[0]
-        if existing and existing > 0:
-            return jsonify({'message': 'Exam already has questions', 'existing': int(existing)}), 200
-
-        samples = []
-        for i in range(1, seed_count+1):
-            qtext = f"Sample question {i} for exam {exam_id}. What is {i} + {i}?"
-            options = [str(i+i), str(i+i+1), str(i+i-1), str(i+i+2)]
-            samples.append((exam_id, 'General', qtext, 'Easy', json.dumps(options)))
-
-        insert_sql = """
-            INSERT INTO Questions (ExamID, Topic, QuestionText, DifficultyLevel, Options)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        cursor.executemany(insert_sql, samples)
-        conn.commit()
-
-        cursor.execute("SELECT COUNT(*) FROM Questions WHERE ExamID = %s", (exam_id,))
-        new_count = int(cursor.fetchone()[0])
-        return jsonify({'message': 'Seeded sample questions', 'new_count': new_count}), 201
+        with db_cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM Questions WHERE ExamID = %s", (exam_id,))
+            existing = cursor.fetchone()[0]
+            if existing and existing > 0:
+                return jsonify({'message': 'Exam already has questions', 'existing': int(existing)}), 200
+
+            samples = []
+            for i in range(1, seed_count+1):
+                qtext = f"Sample question {i} for exam {exam_id}. What is {i} + {i}?"
+                options = [str(i+i), str(i+i+1), str(i+i-1), str(i+i+2)]
+                samples.append((exam_id, 'General', qtext, 'Easy', json.dumps(options)))
+
+            insert_sql = """
+                INSERT INTO Questions (ExamID, Topic, QuestionText, DifficultyLevel, Options)
+                VALUES (%s, %s, %s, %s, %s)
+            """
+            cursor.executemany(insert_sql, samples)
+            answer_keys.invalidate(exam_id)
+            question_sampler.invalidate(exam_id)
 
+            cursor.execute("SELECT COUNT(*) FROM Questions WHERE ExamID = %s", (exam_id,))
+            new_count = int(cursor.fetchone()[0])
+            return jsonify({'message': 'Seeded sample questions', 'new_count': new_count}), 201
     except Exception as e:
         print(f"[admin_seed_sample_questions] error: {e}")
         return jsonify({'error': str(e)}), 500
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
+
+@app.route('/api/admin/import-questions', methods=['POST'])
+@login_required
+@role_required('Teacher')
+def admin_import_questions():
+    """
+    Bulk-import a question file (multipart field 'file': .csv, .jsonl or .json).
+
+    Optional form field exam_id applies to records that do not name an exam.
+    The upload is parsed as a stream and inserted in batches; duplicates of
+    existing questions are skipped. Returns the import summary.
+    """
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        return jsonify({'error': 'No question file uploaded'}), 400
+    try:
+        fmt = detect_format(upload.filename)
+        default_exam_id = int(request.form['exam_id']) if request.form.get('exam_id') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    try:
+        summary = import_questions(db_cursor, read_records(stream, fmt), default_exam_id=default_exam_id,
+                                   teacher_id=session['user_id'], batch_size=config.QUESTION_IMPORT_BATCH_SIZE)
+    except (ValueError, UnicodeDecodeError) as e:
+        # Batches committed before the bad byte stay in; drop every cached key to be safe
+        answer_keys.invalidate()
+        question_sampler.invalidate()
+        return jsonify({'error': f'Could not read question file: {e}'}), 400
+
+    for exam_id in summary['exams']:
+        answer_keys.invalidate(exam_id)
+        question_sampler.invalidate(exam_id)
+
+    print(f"[admin_import_questions] {summary['inserted']} inserted, {summary['duplicates']} duplicates, "
+          f"{summary['invalid']} invalid ({summary['rowsPerSecond']} rows/s)")
+    return jsonify(summary), 200
 
 @app.errorhandler(404)
 def not_found(error):
@@ -2375,6 +1928,7 @@ def internal_error(error):
 
 @app.route('/api/submit-assignment', methods=['POST'])
 @login_required
+@accepts_upload(SUBMISSION_UPLOADS)
 def submit_assignment():
     """
     Handle assignment submission with file upload.
@@ -2389,119 +1943,126 @@ def submit_assignment():
     if 'file' not in request.files:
         return jsonify({'error': 'No file provided'}), 400
     
-    file = request.files['file']
+    # Type, size and magic bytes were checked while the body streamed to disk
+    file = received_upload('file')
     
-    if not file or file.filename == '':
+    if not file:
         return jsonify({'error': 'No file selected'}), 400
     
-    # Allowed file extensions
-    allowed_extensions = {'pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'xls', 'xlsx', 'ppt', 'pptx'}
-    
-    if '.' not in file.filename or file.filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
-        return jsonify({'error': 'File type not allowed. Allowed: PDF, DOC, DOCX, TXT, JPG, PNG, XLS, XLSX, PPT, PPTX'}), 400
-    
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        
-        # Verify assignment belongs to this student
-        cursor.execute(
-            "SELECT AssignmentID FROM Assignments WHERE AssignmentID = %s AND StudentID = %s",
-            (assignment_id, user_id)
-        )
-        if not cursor.fetchone():
-            return jsonify({'error': 'Assignment not found or does not belong to you'}), 403
-        
-        # Create submissions directory
-        submissions_dir = os.path.join('uploads', 'submissions', str(assignment_id))
-        os.makedirs(submissions_dir, exist_ok=True)
-        
-        # Save file with timestamp to avoid conflicts
-        original_filename = secure_filename(file.filename)
-        file_ext = original_filename.rsplit('.', 1)[1].lower()
-        filename = f"{user_id}_{int(time.time())}.{file_ext}"
-        filepath = os.path.join(submissions_dir, filename)
-        
-        file.save(filepath)
-        file_size = os.path.getsize(filepath)
-        
-        # Check if submission already exists
-        cursor.execute(
-            "SELECT SubmissionID FROM AssignmentSubmissions WHERE AssignmentID = %s AND StudentID = %s",
-            (assignment_id, user_id)
-        )
-        existing_submission = cursor.fetchone()
-        
-        if existing_submission:
-            # Update existing submission
-            submission_id = existing_submission[0]
+        with db_cursor(transaction=True) as cursor:
+            # Verify assignment belongs to this student
             cursor.execute(
-                """UPDATE AssignmentSubmissions 
-                   SET FilePath = %s, FileName = %s, FileSize = %s, SubmittedAt = NOW()
-                   WHERE SubmissionID = %s""",
-                (filepath, original_filename, file_size, submission_id)
+                "SELECT AssignmentID FROM Assignments WHERE AssignmentID = %s AND StudentID = %s",
+                (assignment_id, user_id)
             )
-            message = 'Assignment updated successfully'
-        else:
-            # Create new submission
+            if not cursor.fetchone():
+                return jsonify({'error': 'Assignment not found or does not belong to you'}), 403
+
+            # Store the streamed file by content (identical uploads share one blob)
+            original_filename = secure_filename(file.filename)
+            file_hash = file.sha256
+            file_size = file.size
+            filepath = blob_store.add(cursor, file)
+
+            # Check if submission already exists
             cursor.execute(
-                """INSERT INTO AssignmentSubmissions (AssignmentID, StudentID, FilePath, FileName, FileSize)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                (assignment_id, user_id, filepath, original_filename, file_size)
+                """SELECT SubmissionID, FilePath, BlobHash FROM AssignmentSubmissions
+                   WHERE AssignmentID = %s AND StudentID = %s FOR UPDATE""",
+                (assignment_id, user_id)
             )
-            message = 'Assignment submitted successfully'
-        
-        # Update assignment status to 'Completed'
-        cursor.execute(
-            "UPDATE Assignments SET Status = 'Completed' WHERE AssignmentID = %s",
-            (assignment_id,)
-        )
-        
-        conn.commit()
-        
+            existing_submission = cursor.fetchone()
+            replaced_file = None
+
+            if existing_submission:
+                # Update existing submission and drop its reference to the previous file
+                submission_id, previous_path, previous_hash = existing_submission
+                cursor.execute(
+                    """UPDATE AssignmentSubmissions 
+                       SET FilePath = %s, BlobHash = %s, FileName = %s, FileSize = %s, SubmittedAt = NOW()
+                       WHERE SubmissionID = %s""",
+                    (filepath, file_hash, original_filename, file_size, submission_id)
+                )
+                if previous_hash:
+                    blob_store.release(cursor, previous_hash)
+                else:
+                    replaced_file = previous_path
+                message = 'Assignment updated successfully'
+            else:
+                # Create new submission
+                cursor.execute(
+                    """INSERT INTO AssignmentSubmissions (AssignmentID, StudentID, FilePath, BlobHash, FileName, FileSize)
+                       VALUES (%s, %s, %s, %s, %s, %s)""",
+                    (assignment_id, user_id, filepath, file_hash, original_filename, file_size)
+                )
+                message = 'Assignment submitted successfully'
+
+            # Update assignment status to 'Completed'
+            cursor.execute(
+                "UPDATE Assignments SET Status = 'Completed' WHERE AssignmentID = %s AND Status <> 'Completed'",
+                (assignment_id,)
+            )
+            completed = cursor.rowcount == 1
+            if completed:
+                on_assignment_completed(cursor, assignment_id)
+                bump_assignment_teacher(cursor, assignment_id)
+                stale_tags = own_dashboard_tags(cursor)
+
+        if completed:
+            response_cache.invalidate(*stale_tags)
+        # A file saved before the blob store has no reference count; remove it once replaced
+        remove_replaced_file(replaced_file)
         return jsonify({'message': message, 'filename': original_filename}), 201
-    
     except Exception as e:
         print(f"[Assignment Submission] Error: {e}")
         return jsonify({'error': f'Failed to submit assignment: {str(e)}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+
+STUDENT_SUBMISSION_SORTS = {
+    'submittedAt': KeysetSort([('sub.SubmittedAt', True), ('sub.SubmissionID', True)], lambda r: (r[5], r[0])),
+}
+
 
 @app.route('/api/student/submissions', methods=['GET'])
 @login_required
 def get_student_submissions():
-    """Get all submissions for the logged-in student."""
+    """
+    Get the logged-in student's submissions, one keyset page at a time.
+
+    Query params: assignment_id, graded (true/false) (filters), order, limit
+    and cursor.
+    """
     user_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT 
-                sub.SubmissionID, 
-                sub.AssignmentID,
-                a.ExamID,
-                e.ExamName,
-                sub.FileName,
-                sub.SubmittedAt,
-                sub.Grade,
-                sub.TeacherFeedback,
-                a.Status,
-                a.DueDate
-            FROM AssignmentSubmissions sub
-            JOIN Assignments a ON sub.AssignmentID = a.AssignmentID
-            JOIN Exams e ON a.ExamID = e.ExamID
-            WHERE sub.StudentID = %s
-            ORDER BY sub.SubmittedAt DESC
-        """, (user_id,))
-        
-        submissions = cursor.fetchall()
+        sort, limit, after = page_args(STUDENT_SUBMISSION_SORTS, 'submittedAt')
+        grade_condition = graded_filter('sub.Grade')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sql = """
+        SELECT 
+            sub.SubmissionID, 
+            sub.AssignmentID,
+            a.ExamID,
+            e.ExamName,
+            sub.FileName,
+            sub.SubmittedAt,
+            sub.Grade,
+            sub.TeacherFeedback,
+            a.Status,
+            a.DueDate
+        FROM AssignmentSubmissions sub
+        JOIN Assignments a ON sub.AssignmentID = a.AssignmentID
+        JOIN Exams e ON a.ExamID = e.ExamID
+        WHERE sub.StudentID = %s
+    """ + grade_condition
+    params = [user_id]
+    assignment_id = request.args.get('assignment_id', type=int)
+    if assignment_id:
+        sql += " AND sub.AssignmentID = %s"
+        params.append(assignment_id)
+
+    with db_cursor() as cursor:
+        submissions, next_cursor = fetch_keyset_page(cursor, sql, params, sort, limit, after)
         result = [
             {
                 'submissionID': row[0],
@@ -2518,27 +2079,33 @@ def get_student_submissions():
             for row in submissions
         ]
         
-        return jsonify({'submissions': result}), 200
-    
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        return jsonify({'submissions': result, 'nextCursor': next_cursor}), 200
+
+ASSIGNMENT_SUBMISSION_SORTS = {
+    'submittedAt': KeysetSort([('sub.SubmittedAt', True), ('sub.SubmissionID', True)], lambda r: (r[9], r[0])),
+    'student': KeysetSort([('u.LastName', False), ('u.FirstName', False), ('sub.SubmissionID', False)],
+                          lambda r: (r[4], r[3], r[0])),
+}
+
 
 @app.route('/api/teacher/submissions/<int:assignment_id>', methods=['GET'])
 @login_required
 @role_required('Teacher')
 def get_assignment_submissions(assignment_id):
-    """Get all submissions for a specific assignment (teacher view)."""
+    """
+    Get the submissions for one of the teacher's assignments, one keyset page at a time.
+
+    Query params: graded (true/false) (filter), sort (submittedAt, student),
+    order, limit and cursor.
+    """
     teacher_id = session.get('user_id')
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
     try:
-        cursor = conn.cursor()
-        
+        sort, limit, after = page_args(ASSIGNMENT_SUBMISSION_SORTS, 'submittedAt')
+        grade_condition = graded_filter('sub.Grade')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with db_cursor() as cursor:
         # Verify teacher owns this assignment
         cursor.execute(
             "SELECT AssignmentID FROM Assignments WHERE AssignmentID = %s AND TeacherID = %s",
@@ -2547,8 +2114,8 @@ def get_assignment_submissions(assignment_id):
         if not cursor.fetchone():
             return jsonify({'error': 'Assignment not found or does not belong to you'}), 403
         
-        # Get all submissions for this assignment
-        cursor.execute("""
+        # One page of this assignment's submissions
+        submissions, next_cursor = fetch_keyset_page(cursor, """
             SELECT 
                 sub.SubmissionID,
                 sub.AssignmentID,
@@ -2567,10 +2134,7 @@ def get_assignment_submissions(assignment_id):
             JOIN Assignments a ON sub.AssignmentID = a.AssignmentID
             JOIN Users u ON sub.StudentID = u.UserID
             WHERE sub.AssignmentID = %s
-            ORDER BY sub.SubmittedAt DESC
-        """, (assignment_id,))
-        
-        submissions = cursor.fetchall()
+        """ + grade_condition, [assignment_id], sort, limit, after)
         result = [
             {
                 'submissionID': row[0],
@@ -2589,13 +2153,7 @@ def get_assignment_submissions(assignment_id):
             for row in submissions
         ]
         
-        return jsonify({'submissions': result}), 200
-    
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+        return jsonify({'submissions': result, 'nextCursor': next_cursor}), 200
 
 @app.route('/api/grade-submission/<int:submission_id>', methods=['POST'])
 @login_required
@@ -2610,13 +2168,7 @@ def grade_submission(submission_id):
     if not grade:
         return jsonify({'error': 'Grade is required'}), 400
     
-    conn = get_db_connection()
-    if not conn:
-        return jsonify({'error': 'Database connection failed'}), 500
-    
-    try:
-        cursor = conn.cursor()
-        
+    with db_cursor() as cursor:
         # Verify submission exists and belongs to this teacher's assignment
         cursor.execute("""
             SELECT sub.SubmissionID FROM AssignmentSubmissions sub
@@ -2634,23 +2186,50 @@ def grade_submission(submission_id):
                WHERE SubmissionID = %s""",
             (grade, feedback, submission_id)
         )
-        
-        conn.commit()
-        
+
         return jsonify({'message': 'Submission graded successfully', 'grade': grade}), 200
-    
-    except Error as err:
-        return jsonify({'error': f'Database error: {err}'}), 500
-    finally:
-        cursor.close()
-        conn.close()
+
+@app.route('/api/grade-submissions', methods=['POST'])
+@login_required
+@role_required('Teacher')
+def grade_submissions_bulk():
+    """
+    Grade many submissions at once, all or nothing.
+
+    Accepts JSON {"grades": [{submission_id, grade, feedback}, ...]}, a CSV
+    body (Content-Type: text/csv) or a multipart CSV upload in field 'file',
+    with the columns submission_id, grade, feedback.
+    """
+    teacher_id = session.get('user_id')
+    if request.is_json:
+        data = request.get_json(silent=True)
+        items = data.get('grades') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({'error': 'grades must be a list'}), 400
+        records = enumerate(items, start=1)
+    elif request.files.get('file'):
+        records = read_grade_csv(io.TextIOWrapper(request.files['file'].stream, encoding='utf-8-sig', newline=''))
+    elif request.mimetype == 'text/csv':
+        records = read_grade_csv(io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline=''))
+    else:
+        return jsonify({'error': 'Send JSON grades or a CSV file'}), 400
+
+    try:
+        grades = parse_grades(records)
+        with db_cursor(transaction=True) as cursor:
+            graded = apply_grades(cursor, teacher_id, grades, batch_size=config.GRADE_BATCH_SIZE)
+    except UnicodeDecodeError:
+        return jsonify({'error': 'CSV must be UTF-8 encoded'}), 400
+    except GradingError as e:
+        return jsonify({'error': str(e), **e.payload}), e.status
+
+    return jsonify({'message': f'Graded {graded} submissions', 'graded': graded}), 200
 
 @app.route('/uploads/submissions/<path:filepath>', methods=['GET'])
 @login_required
 def download_submission(filepath):
     """Download a submission file (with authorization)."""
-    user_id = session.get('user_id')
-    user_role = session.get('role')
+    identity = current_identity()
     
     # Reconstruct safe filepath
     safe_path = os.path.join('uploads', 'submissions', filepath)
@@ -2663,37 +2242,60 @@ def download_submission(filepath):
     try:
         assignment_id = filepath.split('/')[0]
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'error': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        
-        # Check if user is the student
-        cursor.execute(
-            "SELECT AssignmentID FROM Assignments WHERE AssignmentID = %s AND StudentID = %s",
-            (assignment_id, user_id)
-        )
-        is_student = cursor.fetchone() is not None
-        
-        # Check if user is the teacher
-        cursor.execute(
-            "SELECT AssignmentID FROM Assignments WHERE AssignmentID = %s AND TeacherID = %s",
-            (assignment_id, user_id)
-        )
-        is_teacher = cursor.fetchone() is not None
-        
-        cursor.close()
-        conn.close()
+        # One ownership check, on the column that matches the caller's role
+        owner_column = 'TeacherID' if identity.role == 'Teacher' else 'StudentID'
+        with db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT AssignmentID FROM Assignments WHERE AssignmentID = %s AND {owner_column} = %s",
+                (assignment_id, identity.user_id)
+            )
+            allowed = cursor.fetchone() is not None
         
-        if not (is_student or is_teacher):
+        if not allowed:
             return jsonify({'error': 'Unauthorized'}), 403
         
         return send_from_directory(os.path.dirname(safe_path), os.path.basename(safe_path))
     
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Database connection failed'}), 500
     except Exception as e:
         return jsonify({'error': f'Error downloading file: {str(e)}'}), 500
 
+@app.route('/uploads/blobs/<path:key>', methods=['GET'])
+@login_required
+def download_blob(key):
+    """
+    Serve a stored submission file or doubt image. Submission files go to the
+    student who uploaded them and the assignment's teacher; doubt images to
+    any signed-in user.
+    """
+    identity = current_identity()
+    sha256 = BlobStore.parse_key(key)
+    if not sha256:
+        return jsonify({'error': 'File not found'}), 404
+
+    try:
+        with db_cursor() as cursor:
+            cursor.execute("""
+                SELECT EXISTS(
+                    SELECT 1 FROM AssignmentSubmissions sub
+                    JOIN Assignments a ON sub.AssignmentID = a.AssignmentID
+                    WHERE sub.BlobHash = %s AND (sub.StudentID = %s OR a.TeacherID = %s)
+                ) OR EXISTS(SELECT 1 FROM Doubts WHERE ImageBlobHash = %s)
+            """, (sha256, identity.user_id, identity.user_id, sha256))
+            allowed = bool(cursor.fetchone()[0])
+    except DatabaseUnavailable:
+        return jsonify({'error': 'Database connection failed'}), 500
+
+    if not allowed:
+        return jsonify({'error': 'Unauthorized'}), 403
+    if not os.path.exists(blob_store.disk_path(key)):
+        return jsonify({'error': 'File not found'}), 404
+    response = send_from_directory(os.path.abspath(blob_store.root), key)
+    # Content never changes under a given hash
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
 # ============================================================================
 # RUN APPLICATION
 # ============================================================================
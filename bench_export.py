@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark: bulk export throughput and memory vs. table size.
+
+Seeds a synthetic teacher with N Results and N ActivityLog rows inside a
+transaction, exports them (filtered to that teacher) with exports.py into a
+temporary directory in every available format, and rolls everything back
+afterwards. Peak Python memory should depend on --chunk-size, not on N.
+
+Usage: python bench_export.py [--rows 10000,100000] [--chunk-size 10000]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from exports import EXPORT_FORMATS, _HAS_PYARROW, export_to_directory
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'learnmatrix')
+}
+
+STUDENTS = 50
+
+
+def seed_rows(cursor, rows, tag):
+    """Insert one teacher, STUDENTS students and `rows` Results and ActivityLog rows. Returns the teacher id."""
+    cursor.execute("INSERT INTO Exams (ExamName, TotalQuestions) VALUES (%s, 10)", (f'bench_export_{tag}',))
+    exam_id = cursor.lastrowid
+    cursor.execute(
+        """INSERT INTO Users (Username, Email, PasswordHash, Role, FirstName, LastName)
+           VALUES (%s, %s, 'x', 'Teacher', 'Bench', 'Teacher')""",
+        (f'bench_et_{tag}', f'bench_et_{tag}@example.com')
+    )
+    teacher_id = cursor.lastrowid
+    cursor.executemany(
+        """INSERT INTO Users (Username, Email, PasswordHash, Role, FirstName, LastName)
+           VALUES (%s, %s, 'x', 'Student', 'Bench', %s)""",
+        [(f'bench_es_{tag}_{i}', f'bench_es_{tag}_{i}@example.com', str(i)) for i in range(STUDENTS)]
+    )
+    cursor.execute("SELECT UserID FROM Users WHERE Username LIKE %s", (f'bench_es_{tag}_%',))
+    student_ids = [r[0] for r in cursor.fetchall()]
+    cursor.executemany(
+        "INSERT INTO Assignments (TeacherID, StudentID, ExamID, Status) VALUES (%s, %s, %s, 'Completed')",
+        [(teacher_id, sid, exam_id) for sid in student_ids]
+    )
+    cursor.execute("SELECT StudentID, AssignmentID FROM Assignments WHERE TeacherID = %s", (teacher_id,))
+    assignments = cursor.fetchall()
+
+    batch = 5000
+    for start in range(0, rows, batch):
+        indexes = range(start, min(start + batch, rows))
+        cursor.executemany(
+            """INSERT INTO Results (AssignmentID, StudentID, Score, TotalQuestions, Percentage, CompletionTime, Topic)
+               VALUES (%s, %s, %s, 10, %s, %s, 'Physics')""",
+            [(assignments[i % len(assignments)][1], assignments[i % len(assignments)][0],
+              i % 11, (i % 11) * 10, 300 + i % 900) for i in indexes]
+        )
+        cursor.executemany(
+            """INSERT INTO ActivityLog (UserID, ActivityType, Duration, ExamID, Details)
+               VALUES (%s, 'FocusSession', %s, %s, '{"source": "bench"}')""",
+            [(student_ids[i % len(student_ids)], 60 + i % 3600, exam_id) for i in indexes]
+        )
+    return teacher_id
+
+
+def run_export(cursor, source, fmt, chunk_size, teacher_id):
+    """Export into a throwaway directory; returns (rows, seconds, peak MB, bytes written)."""
+    out_dir = tempfile.mkdtemp(prefix='bench_export_')
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        state = export_to_directory(cursor, source, out_dir, fmt=fmt, chunk_size=chunk_size,
+                                    filters={'teacher_id': teacher_id})
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        written = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        return state['rows'], elapsed, peak, written
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10000,100000', help='comma-separated row counts per table')
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.rows.split(',') if s.strip()]
+    formats = [f for f in EXPORT_FORMATS if f != 'parquet' or _HAS_PYARROW]
+    if not _HAS_PYARROW:
+        print("(pyarrow not installed: skipping parquet)")
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    print(f"{'source':>10} {'format':>8} {'rows':>10} {'seconds':>8} {'rows/s':>10} {'peak MB':>8} {'MB out':>8}")
+    try:
+        for size in sizes:
+            conn.start_transaction()
+            try:
+                cursor = conn.cursor(buffered=True)
+                teacher_id = seed_rows(cursor, size, f'{size}_{int(time.time())}')
+                for source in ('results', 'activity'):
+                    for fmt in formats:
+                        rows, elapsed, peak, written = run_export(cursor, source, fmt, args.chunk_size, teacher_id)
+                        print(f"{source:>10} {fmt:>8} {rows:>10} {elapsed:>8.2f} {rows / elapsed:>10.0f} "
+                              f"{peak:>8.1f} {written / (1024 * 1024):>8.1f}")
+                cursor.close()
+            finally:
+                conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: login throughput under a storm vs. latency of other endpoints.
+
+Runs against a live server. For each concurrency level, that many client
+threads POST /login in a loop for --duration seconds while one probe thread
+polls a cheap endpoint (/api/db-health by default). Logins/s should grow
+with PASSWORD_HASH_WORKERS (up to the core count) and the probe latency
+should stay flat; once the hashing queue is full, extra logins are answered
+503 immediately instead of queueing behind bcrypt.
+
+Usage: python bench_login.py --username student1 --password test123
+                             [--url http://localhost:5000] [--concurrency 1,2,4,8,16] [--duration 10]
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def post_login(url, username, password):
+    body = json.dumps({'username': username, 'password': password}).encode('utf-8')
+    req = urllib.request.Request(url + '/login', data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status
+    except urllib.error.HTTPError as err:
+        return err.code
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as err:
+        return err.code
+
+
+def run_level(args, concurrency):
+    stop = threading.Event()
+    counts = {}
+    probe_ms = []
+    lock = threading.Lock()
+
+    def storm():
+        while not stop.is_set():
+            status = post_login(args.url, args.username, args.password)
+            with lock:
+                counts[status] = counts.get(status, 0) + 1
+
+    def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            get(args.url + args.probe)
+            probe_ms.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=storm, daemon=True) for _ in range(concurrency)]
+    threads.append(threading.Thread(target=probe, daemon=True))
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    ok = counts.get(200, 0)
+    p95 = statistics.quantiles(probe_ms, n=20)[-1] if len(probe_ms) >= 20 else max(probe_ms or [0])
+    median = statistics.median(probe_ms) if probe_ms else 0
+    print(f"{concurrency:>11} {ok / args.duration:>9.1f} {counts.get(503, 0):>8} "
+          f"{sum(v for k, v in counts.items() if k not in (200, 503)):>7} {median:>10.1f} {p95:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help='comma-separated client thread counts')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per level')
+    parser.add_argument('--probe', default='/api/db-health', help='endpoint whose latency is sampled')
+    args = parser.parse_args()
+
+    if post_login(args.url, args.username, args.password) != 200:
+        raise SystemExit('Login failed: check --url, --username and --password')
+    print(f"{'concurrency':>11} {'logins/s':>9} {'503s':>8} {'errors':>7} {'probe p50':>10} {'probe p95':>10}")
+    for level in [int(c) for c in args.concurrency.split(',') if c.strip()]:
+        run_level(args, level)
+
+
+if __name__ == '__main__':
+    main()
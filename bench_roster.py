@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: teacher student-roster round trips vs. cohort size.
+
+Seeds synthetic cohorts of increasing size inside a transaction, runs the
+batched roster engine against them and rolls everything back afterwards.
+The per-student implementation it replaced issued 3N+2 queries; the engine
+should report the same query count for every cohort size.
+
+Usage: python bench_roster.py [--sizes 10,100,1000]
+"""
+
+import argparse
+import os
+import time
+
+import mysql.connector
+from dotenv import load_dotenv
+
+from analytics import build_student_roster
+
+load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', ''),
+    'database': os.getenv('DB_NAME', 'learnmatrix')
+}
+
+
+class CountingCursor:
+    """Cursor proxy that counts execute() round trips."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.queries = 0
+
+    def execute(self, *args, **kwargs):
+        self.queries += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def seed_cohort(cursor, size, tag):
+    """Insert one teacher plus `size` students with assignments, activity and trophies."""
+    cursor.execute("SELECT ExamID FROM Exams LIMIT 1")
+    row = cursor.fetchone()
+    if row:
+        exam_id = row[0]
+    else:
+        cursor.execute("INSERT INTO Exams (ExamName, TotalQuestions) VALUES (%s, 0)", (f'bench_exam_{tag}',))
+        exam_id = cursor.lastrowid
+
+    cursor.execute(
+        """INSERT INTO Users (Username, Email, PasswordHash, Role, FirstName, LastName)
+           VALUES (%s, %s, 'x', 'Teacher', 'Bench', 'Teacher')""",
+        (f'bench_t_{tag}', f'bench_t_{tag}@example.com')
+    )
+    teacher_id = cursor.lastrowid
+
+    cursor.executemany(
+        """INSERT INTO Users (Username, Email, PasswordHash, Role, FirstName, LastName)
+           VALUES (%s, %s, 'x', 'Student', 'Bench', %s)""",
+        [(f'bench_s_{tag}_{i}', f'bench_s_{tag}_{i}@example.com', str(i)) for i in range(size)]
+    )
+    cursor.execute("SELECT UserID FROM Users WHERE Username LIKE %s", (f'bench_s_{tag}_%',))
+    student_ids = [r[0] for r in cursor.fetchall()]
+
+    cursor.executemany(
+        """INSERT INTO Assignments (TeacherID, StudentID, ExamID, Status)
+           VALUES (%s, %s, %s, %s)""",
+        [(teacher_id, sid, exam_id, 'Completed' if i % 2 else 'Assigned') for i, sid in enumerate(student_ids)]
+    )
+    cursor.executemany(
+        "INSERT INTO ActivityLog (UserID, ActivityType, Duration) VALUES (%s, 'FocusSession', %s)",
+        [(sid, 600 + i % 3600) for i, sid in enumerate(student_ids)]
+    )
+    cursor.executemany(
+        "INSERT INTO Achievements (StudentID, TrophyName, Points) VALUES (%s, 'Bench Trophy', 10)",
+        [(sid,) for sid in student_ids[::3]]
+    )
+    return teacher_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,1000', help='comma-separated cohort sizes')
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    print(f"{'students':>10} {'legacy queries':>15} {'engine queries':>15} {'engine ms':>10}")
+    try:
+        for size in sizes:
+            conn.start_transaction()
+            try:
+                cursor = conn.cursor(buffered=True)
+                teacher_id = seed_cohort(cursor, size, f'{size}_{int(time.time())}')
+                counting = CountingCursor(cursor)
+                started = time.perf_counter()
+                roster = build_student_roster(counting, teacher_id)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                print(f"{len(roster):>10} {3 * len(roster) + 2:>15} {counting.queries:>15} {elapsed_ms:>10.1f}")
+                cursor.close()
+            finally:
+                conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: multipart upload handling, spool-and-save vs. the streaming pipeline.
+
+Builds multipart bodies of increasing size on disk and parses each one in
+process, with no server or database: once with Werkzeug's default spooling
+followed by FileStorage.save() and os.path.getsize() (the old handlers), and
+once through uploads.UploadRequest with a policy that streams to disk,
+hashes and checks magic bytes on the fly. Reports wall time, peak Python
+memory and bytes read from the body; a rejected oversized upload should stop
+reading soon after its cap.
+
+Usage: python bench_upload.py [--sizes-mb 1,8,32] [--cap-mb 10]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+from uploads import UploadPolicy, UploadRejected, UploadRequest
+
+BOUNDARY = 'benchboundary'
+
+
+class CountingReader:
+    """wsgi.input proxy that counts bytes read."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readinto(self, buffer):
+        count = self._stream.readinto(buffer)
+        self.bytes_read += count
+        return count
+
+    def readline(self, size=-1):
+        data = self._stream.readline(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def write_body(path, size):
+    head = (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="bench.pdf"\r\n'
+            f'Content-Type: application/pdf\r\n\r\n').encode('ascii')
+    with open(path, 'wb') as out:
+        out.write(head + b'%PDF-1.7\n')
+        block = os.urandom(1024 * 1024)
+        remaining = size - 9
+        while remaining > 0:
+            out.write(block[:remaining])
+            remaining -= len(block)
+        out.write(f'\r\n--{BOUNDARY}--\r\n'.encode('ascii'))
+    return os.path.getsize(path)
+
+
+def make_environ(body_path, length):
+    environ = EnvironBuilder(method='POST', path='/api/submit-assignment').get_environ()
+    environ['CONTENT_TYPE'] = f'multipart/form-data; boundary={BOUNDARY}'
+    environ['CONTENT_LENGTH'] = str(length)
+    environ['wsgi.input'] = CountingReader(open(body_path, 'rb'))
+    return environ
+
+
+def run_spooled(environ, workdir):
+    req = Request(environ)
+    file = req.files['file']
+    destination = os.path.join(workdir, 'spooled.pdf')
+    file.save(destination)
+    os.path.getsize(destination)
+    req.close()
+
+
+def run_streamed(environ, workdir, policy):
+    req = UploadRequest(environ)
+    req.upload_policy = policy
+    # What received_upload() does, without needing a Flask request context
+    upload = req.files['file'].stream.finish()
+    upload.save_as(os.path.join(workdir, 'streamed.pdf'))
+    upload.sha256
+    req.close()
+
+
+def measure(fn, environ, *args):
+    tracemalloc.start()
+    started = time.perf_counter()
+    status = 'ok'
+    try:
+        fn(environ, *args)
+    except UploadRejected as err:
+        status = f'{err.status}'
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    environ['wsgi.input']._stream.close()
+    return elapsed, peak, environ['wsgi.input'].bytes_read, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-mb', default='1,8,32', help='comma-separated upload sizes in MB')
+    parser.add_argument('--cap-mb', type=float, default=10, help='per-file cap of the streaming policy')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_upload_')
+    policy = UploadPolicy({'pdf': int(args.cap_mb * 1024 * 1024)}, os.path.join(workdir, '.incoming'))
+    try:
+        print(f"{'size MB':>8} {'mode':>9} {'seconds':>8} {'peak MB':>8} {'read MB':>8} {'result':>7}")
+        for size_mb in [float(s) for s in args.sizes_mb.split(',') if s.strip()]:
+            body_path = os.path.join(workdir, 'body.bin')
+            length = write_body(body_path, int(size_mb * 1024 * 1024))
+            for mode, fn, extra in (('spooled', run_spooled, ()), ('streamed', run_streamed, (policy,))):
+                elapsed, peak, read, status = measure(fn, make_environ(body_path, length), workdir, *extra)
+                print(f"{size_mb:>8g} {mode:>9} {elapsed:>8.3f} {peak / 1048576:>8.2f} "
+                      f"{read / 1048576:>8.2f} {status:>7}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
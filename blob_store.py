@@ -0,0 +1,398 @@
+"""
+LearnMatrix: Content-Addressed Blob Store
+Submission files and doubt images are stored once per distinct content,
+under their SHA-256 (computed while the upload streamed in, see uploads.py):
+
+    uploads/blobs/ab/cd/abcd...ef.pdf
+
+Two levels of 256-way sharding keep every directory small however many files
+are stored. The Blobs table holds one row per stored file with a RefCount of
+the AssignmentSubmissions (BlobHash) and Doubts (ImageBlobHash) rows that
+point at it:
+
+- add() takes the reference inside the caller's transaction (the upsert
+  locks the Blobs row) and only then moves the file into place, or drops
+  the upload when identical content is already stored
+- release() gives a reference back, e.g. when a submission is replaced
+- collect() (the garbage collector, run from the CLI) re-counts references
+  so rows removed by ON DELETE CASCADE are accounted for, deletes blobs
+  nobody has referenced for the grace period (re-checked under lock), and
+  removes stray files and abandoned partial uploads
+
+Usage:
+    python blob_store.py --stats
+    python blob_store.py --gc              (collect unreferenced blobs)
+    python blob_store.py --adopt-legacy    (move pre-blob-store files in)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+from uploads import file_extension
+
+BLOB_NAME = re.compile(r'^([0-9a-f]{64})\.([a-z0-9]{1,10})$')
+BLOB_KEY = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})\.([a-z0-9]{1,10})$')
+
+BLOBS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS Blobs (
+    Sha256 CHAR(64) NOT NULL PRIMARY KEY,
+    Extension VARCHAR(10) NOT NULL,
+    Size BIGINT NOT NULL,
+    RefCount INT NOT NULL DEFAULT 0 COMMENT 'AssignmentSubmissions + Doubts rows using the blob',
+    CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    INDEX idx_unreferenced (RefCount, UpdatedAt)
+)
+"""
+
+# (table, key column, path column, hash column) of every row type that references blobs
+REFERENCES = (
+    ('AssignmentSubmissions', 'SubmissionID', 'FilePath', 'BlobHash'),
+    ('Doubts', 'DoubtID', 'ImagePath', 'ImageBlobHash'),
+)
+
+
+def ensure_blob_schema(cursor):
+    """Create Blobs and the reference columns on databases created before the blob store."""
+    cursor.execute(BLOBS_TABLE_SQL)
+    added = []
+    for table, _, path_column, hash_column in REFERENCES:
+        cursor.execute("""
+            SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (table, hash_column))
+        if cursor.fetchone():
+            continue
+        cursor.execute(f"""
+            ALTER TABLE {table}
+            ADD COLUMN {hash_column} CHAR(64) NULL COMMENT 'Blobs.Sha256 of the file' AFTER {path_column},
+            ADD INDEX idx_{hash_column.lower()} ({hash_column})
+        """)
+        added.append(f'{table}.{hash_column}')
+    return added
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """(sha256 hex digest, size) of a file on disk, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class BlobStore:
+    """Sharded blob directory plus the Blobs reference counts; see the module docstring."""
+
+    def __init__(self, root, incoming_dir=None):
+        self.root = root
+        self.incoming_dir = incoming_dir
+        # Stored paths always use '/', like the other upload paths kept in the database
+        self.path_prefix = root.replace(os.sep, '/').rstrip('/')
+
+    @staticmethod
+    def key(sha256, extension):
+        return f'{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}'
+
+    def stored_path(self, key):
+        return f'{self.path_prefix}/{key}'
+
+    def disk_path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    @staticmethod
+    def parse_key(key):
+        """The SHA-256 of a blob key ('ab/cd/<sha256>.<ext>'), or None when it is not one."""
+        match = BLOB_KEY.match(key or '')
+        if not match or match.group(3)[:2] != match.group(1) or match.group(3)[2:4] != match.group(2):
+            return None
+        return match.group(3)
+
+    # ------------------------------------------------------------------
+    # References
+    # ------------------------------------------------------------------
+    def _reference(self, cursor, sha256, extension, size):
+        """Take one reference on a blob row (creating it) and return its key."""
+        cursor.execute("""
+            INSERT INTO Blobs (Sha256, Extension, Size, RefCount) VALUES (%s, %s, %s, 1)
+            ON DUPLICATE KEY UPDATE RefCount = RefCount + 1
+        """, (sha256, extension, size))
+        if cursor.rowcount != 1:
+            # Existing blob: keep the extension it was first stored with
+            cursor.execute("SELECT Extension FROM Blobs WHERE Sha256 = %s", (sha256,))
+            extension = cursor.fetchone()[0]
+        return self.key(sha256, extension)
+
+    def add(self, cursor, upload):
+        """
+        Store a StreamedUpload and take a reference to it within the caller's
+        transaction. Returns the stored path to keep in FilePath/ImagePath.
+        """
+        key = self._reference(cursor, upload.sha256, upload.extension, upload.size)
+        path = self.disk_path(key)
+        if os.path.exists(path):
+            # Same content is already stored; refresh its mtime so the stray-file sweep leaves it alone
+            os.utime(path, None)
+            upload.discard()
+        else:
+            upload.save_as(path)
+        return self.stored_path(key)
+
+    def release(self, cursor, sha256):
+        """Give back one reference; the file is removed by collect() once nothing uses it."""
+        if sha256:
+            cursor.execute("""
+                UPDATE Blobs SET RefCount = GREATEST(RefCount - 1, 0) WHERE Sha256 = %s
+            """, (sha256,))
+
+    # ------------------------------------------------------------------
+    # Garbage collection
+    # ------------------------------------------------------------------
+    def recount(self, cursor_factory, batch_size=1000):
+        """Reset RefCount from the referencing tables, one keyset batch per transaction. Returns rows fixed."""
+        counts = ' + '.join(f"(SELECT COUNT(*) FROM {table} r WHERE r.{hash_column} = b.Sha256)"
+                            for table, _, _, hash_column in REFERENCES)
+        fixed = 0
+        last = ''
+        while True:
+            with cursor_factory(transaction=True) as cursor:
+                cursor.execute("SELECT Sha256 FROM Blobs WHERE Sha256 > %s ORDER BY Sha256 LIMIT %s",
+                               (last, batch_size))
+                batch = [row[0] for row in cursor.fetchall()]
+                if not batch:
+                    return fixed
+                placeholders = ','.join(['%s'] * len(batch))
+                cursor.execute(f"""
+                    UPDATE Blobs b SET RefCount = {counts}
+                    WHERE b.Sha256 IN ({placeholders})
+                """, batch)
+                fixed += max(cursor.rowcount, 0)
+            last = batch[-1]
+
+    def _delete_unreferenced(self, cursor, batch):
+        """Delete the blobs of `batch` that are still unreferenced once locked. Returns (count, bytes)."""
+        placeholders = ','.join(['%s'] * len(batch))
+        cursor.execute(f"""
+            SELECT Sha256, Extension, Size FROM Blobs
+            WHERE Sha256 IN ({placeholders}) AND RefCount = 0
+            FOR UPDATE
+        """, batch)
+        locked = {row[0]: row for row in cursor.fetchall()}
+        if not locked:
+            return 0, 0
+        # New references need the Blobs row lock we now hold, so committed rows are all there is
+        for table, _, _, hash_column in REFERENCES:
+            placeholders = ','.join(['%s'] * len(locked))
+            cursor.execute(f"""
+                SELECT DISTINCT {hash_column} FROM {table}
+                WHERE {hash_column} IN ({placeholders})
+                LOCK IN SHARE MODE
+            """, list(locked))
+            for row in cursor.fetchall():
+                locked.pop(row[0], None)
+            if not locked:
+                return 0, 0
+
+        freed = 0
+        for sha256, extension, size in locked.values():
+            try:
+                os.remove(self.disk_path(self.key(sha256, extension)))
+            except FileNotFoundError:
+                pass
+            freed += size or 0
+        placeholders = ','.join(['%s'] * len(locked))
+        cursor.execute(f"DELETE FROM Blobs WHERE Sha256 IN ({placeholders})", list(locked))
+        return len(locked), freed
+
+    def _sweep_disk(self, cursor_factory, cutoff, batch_size):
+        """Remove files older than `cutoff` that have no Blobs row (uploads whose transaction rolled back)."""
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for first in os.scandir(self.root):
+            if not first.is_dir():
+                continue
+            for second in os.scandir(first.path):
+                if not second.is_dir():
+                    continue
+                stale = {}
+                for entry in os.scandir(second.path):
+                    match = BLOB_NAME.match(entry.name)
+                    if match and entry.is_file() and entry.stat().st_mtime < cutoff:
+                        stale.setdefault(match.group(1), []).append(entry.path)
+                for batch in _chunks(sorted(stale), batch_size):
+                    with cursor_factory() as cursor:
+                        placeholders = ','.join(['%s'] * len(batch))
+                        cursor.execute(f"SELECT Sha256 FROM Blobs WHERE Sha256 IN ({placeholders})", batch)
+                        known = {row[0] for row in cursor.fetchall()}
+                    for sha256 in batch:
+                        if sha256 in known:
+                            continue
+                        for path in stale[sha256]:
+                            try:
+                                os.remove(path)
+                                removed += 1
+                            except FileNotFoundError:
+                                pass
+        return removed
+
+    def _sweep_incoming(self, cutoff):
+        """Remove partial uploads left behind by crashed workers."""
+        removed = 0
+        if not self.incoming_dir or not os.path.isdir(self.incoming_dir):
+            return removed
+        for entry in os.scandir(self.incoming_dir):
+            if entry.name.endswith('.part') and entry.is_file() and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def collect(self, cursor_factory, grace=3600, batch_size=500):
+        """
+        Garbage-collect the store: re-count references, delete blobs
+        unreferenced for `grace` seconds, then stray files and stale partial
+        uploads older than `grace`. Returns a summary dict.
+        """
+        started = time.time()
+        summary = {'recounted': self.recount(cursor_factory), 'blobsDeleted': 0, 'bytesFreed': 0}
+
+        last = ''
+        while True:
+            with cursor_factory(transaction=True) as cursor:
+                cursor.execute("""
+                    SELECT Sha256 FROM Blobs
+                    WHERE RefCount = 0 AND UpdatedAt < NOW() - INTERVAL %s SECOND AND Sha256 > %s
+                    ORDER BY Sha256 LIMIT %s
+                """, (int(grace), last, batch_size))
+                batch = [row[0] for row in cursor.fetchall()]
+                if not batch:
+                    break
+                deleted, freed = self._delete_unreferenced(cursor, batch)
+            summary['blobsDeleted'] += deleted
+            summary['bytesFreed'] += freed
+            last = batch[-1]
+
+        cutoff = started - grace
+        summary['strayFiles'] = self._sweep_disk(cursor_factory, cutoff, batch_size)
+        summary['stalePartials'] = self._sweep_incoming(cutoff)
+        summary['seconds'] = round(time.time() - started, 2)
+        return summary
+
+    def stats(self, cursor):
+        cursor.execute("""
+            SELECT COUNT(*), COALESCE(SUM(Size), 0), COALESCE(SUM(RefCount), 0),
+                   COALESCE(SUM(Size * RefCount), 0), COALESCE(SUM(RefCount = 0), 0)
+            FROM Blobs
+        """)
+        blobs, stored, references, referenced, unreferenced = cursor.fetchone()
+        return {
+            'blobs': blobs,
+            'references': int(references),
+            'unreferenced': int(unreferenced),
+            'storedBytes': int(stored),
+            # what the same references would take with one file per upload
+            'referencedBytes': int(referenced),
+        }
+
+    # ------------------------------------------------------------------
+    # Files written before the blob store
+    # ------------------------------------------------------------------
+    def adopt_legacy(self, cursor_factory, batch_size=200):
+        """
+        Move files referenced by rows without a blob hash into the store and
+        point the rows at them. Returns {'adopted': n, 'missing': n}.
+        """
+        summary = {'adopted': 0, 'missing': 0}
+        for table, id_column, path_column, hash_column in REFERENCES:
+            last_id = 0
+            while True:
+                moved = []
+                with cursor_factory(transaction=True) as cursor:
+                    cursor.execute(f"""
+                        SELECT {id_column}, {path_column} FROM {table}
+                        WHERE {hash_column} IS NULL AND {path_column} IS NOT NULL AND {path_column} <> ''
+                          AND {id_column} > %s
+                        ORDER BY {id_column} LIMIT %s
+                        FOR UPDATE
+                    """, (last_id, batch_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    for row_id, stored in rows:
+                        local = os.path.normpath(stored.replace('/', os.sep))
+                        if not os.path.isfile(local):
+                            summary['missing'] += 1
+                            continue
+                        sha256, size = hash_file(local)
+                        key = self._reference(cursor, sha256, file_extension(local) or 'bin', size)
+                        path = self.disk_path(key)
+                        if not os.path.exists(path):
+                            os.makedirs(os.path.dirname(path), exist_ok=True)
+                            # Link now, unlink the old name after commit: a rollback leaves the row intact
+                            try:
+                                os.link(local, path)
+                            except OSError:
+                                shutil.copyfile(local, path)
+                        cursor.execute(f"""
+                            UPDATE {table} SET {path_column} = %s, {hash_column} = %s WHERE {id_column} = %s
+                        """, (self.stored_path(key), sha256, row_id))
+                        moved.append(local)
+                    last_id = rows[-1][0]
+                for local in moved:
+                    try:
+                        os.remove(local)
+                    except FileNotFoundError:
+                        pass
+                summary['adopted'] += len(moved)
+        return summary
+
+
+def remove_replaced_file(stored_path):
+    """Delete a pre-blob-store file whose row now points elsewhere (blobs are left to collect())."""
+    if not stored_path:
+        return
+    local = os.path.normpath(stored_path.replace('/', os.sep))
+    try:
+        os.remove(local)
+    except OSError as err:
+        print(f"[blob_store] could not remove replaced file {stored_path}: {err}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Maintain the content-addressed upload store')
+    parser.add_argument('--stats', action='store_true', help='show blob counts and the space saved by dedupe')
+    parser.add_argument('--gc', action='store_true', help='delete unreferenced blobs and stray files')
+    parser.add_argument('--grace', type=int, help='seconds a blob must be unreferenced before deletion')
+    parser.add_argument('--adopt-legacy', action='store_true',
+                        help='move files stored before the blob store into it')
+    args = parser.parse_args()
+    if not (args.stats or args.gc or args.adopt_legacy):
+        parser.print_help()
+    else:
+        from app import db_cursor
+        from config import config
+        store = BlobStore(config.BLOB_STORE_DIR, config.UPLOAD_INCOMING_DIR)
+        if args.adopt_legacy:
+            print(json.dumps(store.adopt_legacy(db_cursor), indent=2))
+        if args.gc:
+            grace = args.grace if args.grace is not None else config.BLOB_GC_GRACE
+            print(json.dumps(store.collect(db_cursor, grace=grace), indent=2))
+        if args.stats:
+            with db_cursor() as cursor:
+                print(json.dumps(store.stats(cursor), indent=2))
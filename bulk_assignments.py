@@ -0,0 +1,69 @@
+"""
+LearnMatrix: Batched Assignment Creation
+Assigns one exam to a whole cohort with multi-row inserts instead of a
+SELECT + INSERT per student. Duplicates are resolved by the database through
+UNIQUE KEY unique_assignment (TeacherID, StudentID, ExamID): an existing
+assignment is left untouched and counted as skipped.
+
+Students are processed `batch_size` at a time, so each statement (and the
+Python-side batch) stays bounded however large the cohort is: assigning
+100k students costs about 100 round trips at the default batch size.
+"""
+
+INSERT_SQL = """
+    INSERT INTO Assignments (TeacherID, StudentID, ExamID, Status, DueDate)
+    VALUES (%s, %s, %s, 'Assigned', %s)
+    ON DUPLICATE KEY UPDATE AssignmentID = AssignmentID
+"""
+
+
+def _batches(student_ids, batch_size):
+    batch = []
+    for student_id in student_ids:
+        batch.append(student_id)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _assigned_ids(cursor, teacher_id, exam_id, student_ids):
+    placeholders = ','.join(['%s'] * len(student_ids))
+    cursor.execute(f"""
+        SELECT StudentID, AssignmentID FROM Assignments
+        WHERE TeacherID = %s AND ExamID = %s AND StudentID IN ({placeholders})
+    """, (teacher_id, exam_id, *student_ids))
+    return dict(cursor.fetchall())
+
+
+def bulk_assign(cursor, teacher_id, exam_id, student_ids, due_date=None, batch_size=1000, return_ids=False):
+    """
+    Assign `exam_id` to every student in `student_ids` (any iterable) within
+    the caller's transaction. Returns {'created', 'skipped'} counts, plus
+    'assignmentIds' of the newly created rows when return_ids is set (two
+    extra set-based lookups per batch).
+    """
+    created = 0
+    skipped = 0
+    new_ids = []
+    for batch in _batches(student_ids, batch_size):
+        batch = list(dict.fromkeys(batch))
+        existing = _assigned_ids(cursor, teacher_id, exam_id, batch) if return_ids else {}
+        missing = [s for s in batch if s not in existing]
+        if missing:
+            # mysql-connector rewrites this executemany into one multi-row INSERT
+            cursor.executemany(INSERT_SQL, [(teacher_id, s, exam_id, due_date) for s in missing])
+            # ON DUPLICATE KEY UPDATE AssignmentID = AssignmentID counts 1 per insert, 0 per duplicate
+            inserted = max(cursor.rowcount, 0)
+        else:
+            inserted = 0
+        created += inserted
+        skipped += len(batch) - inserted
+        if return_ids and inserted:
+            new_ids.extend(_assigned_ids(cursor, teacher_id, exam_id, missing).values())
+
+    result = {'created': created, 'skipped': skipped}
+    if return_ids:
+        result['assignmentIds'] = new_ids
+    return result
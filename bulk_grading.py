@@ -0,0 +1,105 @@
+"""
+LearnMatrix: Bulk Submission Grading
+Grades many AssignmentSubmissions in one request: records are validated up
+front, ownership of every submission is checked with set-based lookups, and
+the grades are written with one CASE-based UPDATE per batch inside the
+caller's transaction, so a grading sheet is applied completely or not at all.
+
+Records come from a JSON list or a CSV stream with the columns
+submission_id, grade, feedback (feedback optional).
+"""
+
+import csv
+
+GRADE_MAX_LENGTH = 2  # AssignmentSubmissions.Grade is VARCHAR(2)
+
+
+class GradingError(Exception):
+    """Raised when a batch cannot be applied; `payload` carries the offending rows or submissions."""
+
+    def __init__(self, message, status=400, **payload):
+        super().__init__(message)
+        self.status = status
+        self.payload = payload
+
+
+def read_grade_csv(stream):
+    """Yield (line, record) pairs from a CSV text stream with a header row."""
+    reader = csv.DictReader(stream)
+    for record in reader:
+        yield reader.line_num, {(k or '').strip().lower(): v for k, v in record.items()}
+
+
+def parse_grades(records):
+    """
+    Validate (line, record) pairs into {submission_id: (grade, feedback)};
+    a submission listed twice keeps its last grade. Raises GradingError
+    listing every invalid row.
+    """
+    grades = {}
+    errors = []
+    for line, record in records:
+        if not isinstance(record, dict):
+            errors.append({'line': line, 'error': 'record is not an object'})
+            continue
+        try:
+            submission_id = int(record.get('submission_id'))
+        except (TypeError, ValueError):
+            errors.append({'line': line, 'error': 'submission_id must be an integer'})
+            continue
+        grade = str(record.get('grade') or '').strip()
+        if not grade:
+            errors.append({'line': line, 'error': 'grade is required'})
+            continue
+        if len(grade) > GRADE_MAX_LENGTH:
+            errors.append({'line': line, 'error': f'grade must be at most {GRADE_MAX_LENGTH} characters'})
+            continue
+        grades[submission_id] = (grade, str(record.get('feedback') or '').strip())
+    if errors:
+        raise GradingError(f'{len(errors)} invalid grade record(s)', errors=errors[:100])
+    if not grades:
+        raise GradingError('No grades supplied')
+    return grades
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_grades(cursor, teacher_id, grades, batch_size=500):
+    """
+    Write {submission_id: (grade, feedback)} for `teacher_id` within the
+    caller's transaction. Every submission must belong to one of the
+    teacher's assignments, otherwise GradingError lists the rest and nothing
+    is written. Returns the number of submissions graded.
+    """
+    submission_ids = sorted(grades)
+    owned = set()
+    for batch in _chunks(submission_ids, batch_size):
+        placeholders = ','.join(['%s'] * len(batch))
+        # FOR UPDATE keeps the rows from moving or being deleted before the UPDATE below
+        cursor.execute(f"""
+            SELECT sub.SubmissionID FROM AssignmentSubmissions sub
+            JOIN Assignments a ON sub.AssignmentID = a.AssignmentID
+            WHERE sub.SubmissionID IN ({placeholders}) AND a.TeacherID = %s
+            FOR UPDATE
+        """, (*batch, teacher_id))
+        owned.update(row[0] for row in cursor.fetchall())
+    foreign = [s for s in submission_ids if s not in owned]
+    if foreign:
+        raise GradingError('Submissions not found or do not belong to you', 403, submissionIds=foreign[:100])
+
+    for batch in _chunks(submission_ids, batch_size):
+        cases = ' '.join(['WHEN %s THEN %s'] * len(batch))
+        placeholders = ','.join(['%s'] * len(batch))
+        params = [v for s in batch for v in (s, grades[s][0])]
+        params += [v for s in batch for v in (s, grades[s][1])]
+        cursor.execute(f"""
+            UPDATE AssignmentSubmissions
+            SET Grade = CASE SubmissionID {cases} END,
+                TeacherFeedback = CASE SubmissionID {cases} END,
+                GradedAt = NOW()
+            WHERE SubmissionID IN ({placeholders})
+        """, (*params, *batch))
+    return len(submission_ids)
@@ -0,0 +1,219 @@
+"""
+LearnMatrix: Per-Teacher Class Statistics Store
+Class-wide aggregates shown on every student dashboard are kept in
+TeacherClassStats, one row per teacher, and adjusted in place by the write
+paths (assign, submit, test result, doubt resolution). A dashboard load is a
+single keyed lookup; rows are only recomputed when missing or marked stale.
+
+Usage: python class_stats.py --rebuild   (create the table and recompute every teacher)
+"""
+
+import argparse
+
+from analytics import TEACHER_SCORE_TOTALS_SQL
+
+CLASS_STATS_DDL = """
+CREATE TABLE IF NOT EXISTS TeacherClassStats (
+    TeacherID INT PRIMARY KEY,
+    TotalStudents INT NOT NULL DEFAULT 0,
+    TotalAssignments INT NOT NULL DEFAULT 0,
+    CompletedAssignments INT NOT NULL DEFAULT 0,
+    TotalTestsTaken INT NOT NULL DEFAULT 0,
+    ScoreSum DECIMAL(14, 2) NOT NULL DEFAULT 0 COMMENT 'Sum of Results.Percentage for the class',
+    PendingDoubts INT NOT NULL DEFAULT 0,
+    IsStale TINYINT(1) NOT NULL DEFAULT 0 COMMENT 'Set when membership changed; recomputed on next read',
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (TeacherID) REFERENCES Users(UserID) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+EMPTY_CLASS_STATS = {
+    'totalStudents': 0,
+    'totalAssignments': 0,
+    'completedAssignments': 0,
+    'totalExams': 0,
+    'totalTestsTaken': 0,
+    'averagePerformance': 0.0,
+    'pendingDoubts': 0
+}
+
+
+def _to_response(row, total_exams):
+    total_students, total_assignments, completed, tests_taken, score_sum, pending = row
+    tests_taken = int(tests_taken or 0)
+    return {
+        'totalStudents': int(total_students or 0),
+        'totalAssignments': int(total_assignments or 0),
+        'completedAssignments': int(completed or 0),
+        'totalExams': int(total_exams or 0),
+        'totalTestsTaken': tests_taken,
+        'averagePerformance': round(float(score_sum) / tests_taken, 2) if tests_taken else 0.0,
+        'pendingDoubts': int(pending or 0)
+    }
+
+
+# ============================================================================
+# READ PATH
+# ============================================================================
+def get_class_stats_for_student(cursor, student_id, teacher_ids=None):
+    """
+    Return the class statistics of the student's teacher, computing the row on
+    first use. Callers that already know the student's TeacherIDs (the
+    request identity) pass them to skip the Assignments lookup.
+    """
+    if teacher_ids is not None:
+        if not teacher_ids:
+            return dict(EMPTY_CLASS_STATS)
+        cursor.execute("""
+            SELECT %s, s.TeacherID, s.IsStale,
+                   s.TotalStudents, s.TotalAssignments, s.CompletedAssignments,
+                   s.TotalTestsTaken, s.ScoreSum, s.PendingDoubts,
+                   (SELECT COUNT(*) FROM Exams)
+            FROM (SELECT 1) one
+            LEFT JOIN TeacherClassStats s ON s.TeacherID = %s
+        """, (teacher_ids[0], teacher_ids[0]))
+        return _stats_from_row(cursor, cursor.fetchone())
+
+    cursor.execute("""
+        SELECT a.TeacherID, s.TeacherID, s.IsStale,
+               s.TotalStudents, s.TotalAssignments, s.CompletedAssignments,
+               s.TotalTestsTaken, s.ScoreSum, s.PendingDoubts,
+               (SELECT COUNT(*) FROM Exams)
+        FROM (SELECT TeacherID FROM Assignments WHERE StudentID = %s LIMIT 1) a
+        LEFT JOIN TeacherClassStats s ON s.TeacherID = a.TeacherID
+    """, (student_id,))
+    return _stats_from_row(cursor, cursor.fetchone())
+
+
+def _stats_from_row(cursor, row):
+    if not row:
+        # No teacher assigned yet
+        return dict(EMPTY_CLASS_STATS)
+
+    teacher_id, stored_teacher, is_stale = row[0], row[1], row[2]
+    total_exams = row[9]
+    if stored_teacher is None or is_stale:
+        return _to_response(refresh_teacher(cursor, teacher_id), total_exams)
+    return _to_response(row[3:9], total_exams)
+
+
+def refresh_teacher(cursor, teacher_id):
+    """Recompute one teacher's row from the base tables and store it. Returns the stored counters."""
+    cursor.execute("""
+        SELECT COUNT(DISTINCT StudentID), COUNT(*),
+               COUNT(CASE WHEN Status = 'Completed' THEN 1 END)
+        FROM Assignments
+        WHERE TeacherID = %s
+    """, (teacher_id,))
+    total_students, total_assignments, completed = cursor.fetchone()
+
+    cursor.execute(TEACHER_SCORE_TOTALS_SQL + " WHERE ts.TeacherID = %s GROUP BY ts.TeacherID", (teacher_id,))
+    score_row = cursor.fetchone()
+    _, score_sum, tests_taken = score_row if score_row else (teacher_id, 0, 0)
+
+    cursor.execute("""
+        SELECT COUNT(*) FROM Doubts WHERE TeacherID = %s AND Status = 'Pending'
+    """, (teacher_id,))
+    pending = cursor.fetchone()[0] or 0
+
+    counters = (int(total_students or 0), int(total_assignments or 0), int(completed or 0),
+                int(tests_taken or 0), score_sum or 0, int(pending))
+    cursor.execute("""
+        INSERT INTO TeacherClassStats
+            (TeacherID, TotalStudents, TotalAssignments, CompletedAssignments,
+             TotalTestsTaken, ScoreSum, PendingDoubts, IsStale)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, 0)
+        ON DUPLICATE KEY UPDATE
+            TotalStudents = VALUES(TotalStudents),
+            TotalAssignments = VALUES(TotalAssignments),
+            CompletedAssignments = VALUES(CompletedAssignments),
+            TotalTestsTaken = VALUES(TotalTestsTaken),
+            ScoreSum = VALUES(ScoreSum),
+            PendingDoubts = VALUES(PendingDoubts),
+            IsStale = 0
+    """, (teacher_id,) + counters)
+    return counters
+
+
+# ============================================================================
+# WRITE HOOKS (call on the same cursor as the write they describe)
+# ============================================================================
+def on_assignments_created(cursor, teacher_id, created_count):
+    """
+    New assignments bump the assignment counter in place. They may also add a
+    student to the class, which changes the student count and the score
+    totals, so the row is flagged for a one-off recompute on the next read.
+    """
+    if not created_count:
+        return
+    cursor.execute("""
+        UPDATE TeacherClassStats
+        SET TotalAssignments = TotalAssignments + %s, IsStale = 1
+        WHERE TeacherID = %s
+    """, (created_count, teacher_id))
+
+
+def on_assignment_completed(cursor, assignment_id):
+    """An assignment moved to 'Completed' for the first time."""
+    cursor.execute("""
+        UPDATE TeacherClassStats s
+        JOIN Assignments a ON a.TeacherID = s.TeacherID
+        SET s.CompletedAssignments = s.CompletedAssignments + 1
+        WHERE a.AssignmentID = %s
+    """, (assignment_id,))
+
+
+def on_result_recorded(cursor, student_id, percentage):
+    """A test result was stored for a student; every class the student belongs to counts it once."""
+    cursor.execute("""
+        UPDATE TeacherClassStats s
+        JOIN (SELECT DISTINCT TeacherID FROM Assignments WHERE StudentID = %s) t
+          ON t.TeacherID = s.TeacherID
+        SET s.TotalTestsTaken = s.TotalTestsTaken + 1,
+            s.ScoreSum = s.ScoreSum + %s
+    """, (student_id, percentage))
+
+
+def on_doubt_changed(cursor, old_teacher_id, old_status, new_teacher_id, new_status):
+    """Adjust pending-doubt counters when a doubt changes owner or status."""
+    was_pending = old_teacher_id is not None and old_status == 'Pending'
+    is_pending = new_teacher_id is not None and new_status == 'Pending'
+    if was_pending and is_pending and old_teacher_id == new_teacher_id:
+        return
+    if was_pending:
+        cursor.execute("""
+            UPDATE TeacherClassStats SET PendingDoubts = GREATEST(PendingDoubts - 1, 0)
+            WHERE TeacherID = %s
+        """, (old_teacher_id,))
+    if is_pending:
+        cursor.execute("""
+            UPDATE TeacherClassStats SET PendingDoubts = PendingDoubts + 1
+            WHERE TeacherID = %s
+        """, (new_teacher_id,))
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+def rebuild_all(cursor):
+    """Create the table if needed and recompute every teacher. Returns the number of rows written."""
+    cursor.execute(CLASS_STATS_DDL)
+    cursor.execute("SELECT UserID FROM Users WHERE Role = 'Teacher'")
+    teacher_ids = [row[0] for row in cursor.fetchall()]
+    for teacher_id in teacher_ids:
+        refresh_teacher(cursor, teacher_id)
+    return len(teacher_ids)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Maintain the TeacherClassStats table')
+    parser.add_argument('--rebuild', action='store_true', help='create the table and recompute all teachers')
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.print_help()
+    else:
+        from app import db_cursor
+        with db_cursor(transaction=True) as cursor:
+            count = rebuild_all(cursor)
+        print(f"✓ Rebuilt class statistics for {count} teachers")
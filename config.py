@@ -23,9 +23,13 @@ class Config:
     # ========================================================================
     # SESSION CONFIGURATION
     # ========================================================================
-    SESSION_TYPE = 'filesystem'
+    SESSION_TYPE = os.getenv('SESSION_TYPE', 'sqlite')  # 'sqlite' (session_store.py) or 'filesystem' (flask-session)
     SESSION_PERMANENT = True
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions/sessions.db')
+    SESSION_LEGACY_DIR = os.getenv('SESSION_LEGACY_DIR', 'flask_session')  # old session files, migrated on first use
+    SESSION_SWEEP_INTERVAL = int(os.getenv('SESSION_SWEEP_INTERVAL', '300'))  # seconds between expired-session sweeps
+    SESSION_REFRESH_INTERVAL = int(os.getenv('SESSION_REFRESH_INTERVAL', '3600'))  # min seconds between expiry rewrites
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
@@ -39,20 +43,37 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'learnmatrix')
     DB_PORT = int(os.getenv('DB_PORT', '3306'))
     
+    # Connection pool (see db_pool.py)
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # max connection age in seconds
+    DB_POOL_IDLE_TIMEOUT = int(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))  # close surplus idle connections
+    DB_POOL_PRE_PING_AFTER = float(os.getenv('DB_POOL_PRE_PING_AFTER', '1'))  # ping if idle this long
+    
     DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     
     # ========================================================================
     # SECURITY SETTINGS
     # ========================================================================
-    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))  # changing it rehashes passwords on next login
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))  # bcrypt processes per app worker (0 = inline)
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', '64'))  # queued logins before 503
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))  # seconds a login waits for its hash
     MAX_LOGIN_ATTEMPTS = int(os.getenv('MAX_LOGIN_ATTEMPTS', '5'))
     LOGIN_TIMEOUT = int(os.getenv('LOGIN_TIMEOUT', '900'))  # 15 minutes
+    IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '30'))  # seconds teacher/cohort links stay cached
     
     # ========================================================================
     # FILE UPLOAD SETTINGS
     # ========================================================================
-    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', '16777216'))  # 16MB
+    MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', '16777216'))  # 16MB body cap of the submission/doubt upload routes
     UPLOAD_FOLDER = 'uploads'
+    UPLOAD_INCOMING_DIR = os.path.join(UPLOAD_FOLDER, '.incoming')  # uploads stream here, then move into place
+    UPLOAD_DOCUMENT_MAX_BYTES = int(os.getenv('UPLOAD_DOCUMENT_MAX_BYTES', str(10 * 1024 * 1024)))
+    UPLOAD_IMAGE_MAX_BYTES = int(os.getenv('UPLOAD_IMAGE_MAX_BYTES', str(5 * 1024 * 1024)))
+    BLOB_STORE_DIR = os.path.join(UPLOAD_FOLDER, 'blobs')  # content-addressed submission/doubt files
+    BLOB_GC_GRACE = int(os.getenv('BLOB_GC_GRACE', '3600'))  # seconds a blob stays after its last reference
     ALLOWED_EXTENSIONS = {'pdf', 'txt', 'doc', 'docx', 'xls', 'xlsx', 'jpg', 'png'}
     
     # ========================================================================
@@ -74,10 +95,33 @@ class Config:
     
     # Pagination
     ITEMS_PER_PAGE = 20
+    MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '500'))  # hard cap on rows per list response
     
-    # Cache settings (future Redis integration)
-    CACHE_TYPE = 'simple'
+    # Cache settings (see response_cache.py)
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'simple')  # 'simple' (in-process), 'redis' (shared) or 'null' (off)
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '5000'))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(32 * 1024 * 1024)))  # in-process memory cap
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', '60'))  # seconds a dashboard response may be served
+    ANSWER_KEY_TTL = int(os.getenv('ANSWER_KEY_TTL', '300'))  # seconds an exam's answer key stays cached
+    QUESTION_INDEX_TTL = int(os.getenv('QUESTION_INDEX_TTL', '300'))  # seconds an exam's sampling index stays cached
+    ACHIEVEMENT_QUEUE_SIZE = int(os.getenv('ACHIEVEMENT_QUEUE_SIZE', '10000'))  # pending events before new ones are dropped
+    
+    # Activity ingestion (see activity_ingest.py)
+    ACTIVITY_WRITE_MODE = os.getenv('ACTIVITY_WRITE_MODE', 'buffered')  # 'buffered' or 'sync'
+    ACTIVITY_QUEUE_SIZE = int(os.getenv('ACTIVITY_QUEUE_SIZE', '10000'))  # pending events before 503 backpressure
+    ACTIVITY_BATCH_SIZE = int(os.getenv('ACTIVITY_BATCH_SIZE', '500'))
+    ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', '1'))  # seconds
+    ACTIVITY_SPILL_PATH = os.getenv('ACTIVITY_SPILL_PATH', 'spill/activity.jsonl')  # empty disables spilling
+    ACTIVITY_RETENTION_MONTHS = int(os.getenv('ACTIVITY_RETENTION_MONTHS', '12'))  # raw months kept before rollup + drop
+    ACTIVITY_PARTITIONS_AHEAD = int(os.getenv('ACTIVITY_PARTITIONS_AHEAD', '3'))  # future monthly partitions to keep ready
+    
+    # Bulk exports (see exports.py)
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '10000'))  # rows per export file / keyset query
+    QUESTION_IMPORT_BATCH_SIZE = int(os.getenv('QUESTION_IMPORT_BATCH_SIZE', '2000'))  # questions per executemany / transaction
+    ASSIGNMENT_BATCH_SIZE = int(os.getenv('ASSIGNMENT_BATCH_SIZE', '1000'))  # students per multi-row assignment INSERT
+    GRADE_BATCH_SIZE = int(os.getenv('GRADE_BATCH_SIZE', '500'))  # submissions per ownership check / CASE UPDATE
 
 
 class DevelopmentConfig(Config):
@@ -102,6 +146,8 @@ class TestingConfig(Config):
     DEBUG = True
     DB_NAME = 'learnmatrix_test'
     WTF_CSRF_ENABLED = False
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
 
 
 # Environment-based configuration selection
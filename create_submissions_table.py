@@ -22,6 +22,7 @@ CREATE TABLE IF NOT EXISTS AssignmentSubmissions (
     AssignmentID INT NOT NULL,
     StudentID INT NOT NULL,
     FilePath VARCHAR(500) NOT NULL,
+    BlobHash CHAR(64) NULL COMMENT "Blobs.Sha256 of the file",
     FileName VARCHAR(255) NOT NULL,
     FileSize INT COMMENT "in bytes",
     SubmittedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -35,6 +36,9 @@ CREATE TABLE IF NOT EXISTS AssignmentSubmissions (
     INDEX idx_assignment_submissions (AssignmentID),
     INDEX idx_student_submissions (StudentID),
     INDEX idx_submitted_at (SubmittedAt),
+    INDEX idx_student_submitted (StudentID, SubmittedAt),
+    INDEX idx_assignment_submitted (AssignmentID, SubmittedAt),
+    INDEX idx_blobhash (BlobHash),
     UNIQUE KEY unique_assignment_submission (AssignmentID, StudentID)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
 '''
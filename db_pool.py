@@ -0,0 +1,297 @@
+"""
+LearnMatrix: Pooled MySQL Connection Layer
+Keeps a bounded set of live connections so requests skip the TCP/auth handshake
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when no connection can be obtained (server down or pool exhausted)."""
+
+
+class PoolTimeout(DatabaseUnavailable):
+    """Raised when every pooled connection stayed checked out for the whole wait."""
+
+
+class _PooledConnection:
+    """Bookkeeping wrapper around a raw connection held by the pool."""
+
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool.
+
+    - min_size connections are opened on first use and kept warm
+    - at most max_size connections exist at any time; extra callers wait up to
+      `timeout` seconds before PoolTimeout is raised
+    - connections idle for longer than `pre_ping_after` seconds are pinged
+      before being handed out, broken ones are replaced transparently
+    - connections older than `recycle` seconds, or idle above min_size for
+      longer than `idle_timeout` seconds, are closed and replaced
+    """
+
+    def __init__(self, db_config, min_size=2, max_size=10, timeout=5.0,
+                 recycle=1800, idle_timeout=300, pre_ping_after=1.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError('Invalid pool size: min_size=%s max_size=%s' % (min_size, max_size))
+        self.db_config = dict(db_config)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.idle_timeout = idle_timeout
+        self.pre_ping_after = pre_ping_after
+
+        self._idle = deque()
+        self._size = 0
+        self._warmed = False
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'connects': 0,
+            'connectErrors': 0,
+            'pingFailures': 0,
+            'recycled': 0,
+            'discarded': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Connection lifecycle
+    # ------------------------------------------------------------------
+    def _connect(self):
+        try:
+            conn = mysql.connector.connect(**self.db_config)
+        except Error as err:
+            with self._cond:
+                self._stats['connectErrors'] += 1
+            if err.errno == 2003:
+                print("Error: Unable to connect to MySQL Server.")
+            elif err.errno == 1045:
+                print("Error: Invalid username or password.")
+            else:
+                print(f"Error: {err}")
+            raise DatabaseUnavailable(str(err)) from err
+        with self._cond:
+            self._stats['connects'] += 1
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _close_quietly(pooled):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pooled, now):
+        return self.recycle and now - pooled.created_at > self.recycle
+
+    def _is_alive(self, pooled, now):
+        """Pre-ping connections that have been idle long enough to have gone stale."""
+        if now - pooled.last_used < self.pre_ping_after:
+            return True
+        try:
+            pooled.conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._stats['pingFailures'] += 1
+            return False
+
+    def _warm_up(self):
+        """Open min_size connections the first time the pool is used."""
+        with self._cond:
+            if self._warmed:
+                return
+            self._warmed = True
+            missing = max(0, self.min_size - self._size)
+            self._size += missing
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self._connect())
+        except DatabaseUnavailable:
+            pass
+        with self._cond:
+            self._size -= missing - len(opened)
+            self._idle.extend(opened)
+            self._cond.notify_all()
+
+    def _reap_idle(self, now):
+        """Close surplus connections that sat idle past idle_timeout. Caller holds the lock."""
+        reaped = []
+        while (self.idle_timeout and self._size > self.min_size and self._idle
+               and now - self._idle[0].last_used > self.idle_timeout):
+            reaped.append(self._idle.popleft())
+            self._size -= 1
+            self._stats['recycled'] += 1
+        return reaped
+
+    def acquire(self, timeout=None):
+        """Check out a live connection, waiting up to `timeout` seconds if the pool is full."""
+        if not self._warmed:
+            self._warm_up()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+
+        while True:
+            pooled = None
+            create = False
+            with self._cond:
+                now = time.monotonic()
+                stale = self._reap_idle(now)
+                while pooled is None:
+                    if self._idle:
+                        # LIFO keeps the hot connections hot and lets the rest age out
+                        pooled = self._idle.pop()
+                    elif self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats['timeouts'] += 1
+                            for item in stale:
+                                self._close_quietly(item)
+                            raise PoolTimeout('Timed out after %.1fs waiting for a database connection' % timeout)
+                        if not waited:
+                            waited = True
+                            self._stats['waits'] += 1
+                        self._cond.wait(remaining)
+            for item in stale:
+                self._close_quietly(item)
+
+            if create:
+                try:
+                    pooled = self._connect()
+                except DatabaseUnavailable:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._is_expired(pooled, now) or not self._is_alive(pooled, now):
+                    self._discard(pooled, recycled=self._is_expired(pooled, now))
+                    continue
+
+            pooled.last_used = time.monotonic()
+            with self._cond:
+                self._stats['checkouts'] += 1
+            return pooled
+
+    def release(self, pooled, broken=False):
+        """Return a connection to the pool, discarding it if it is unusable."""
+        conn = pooled.conn
+        if not broken:
+            try:
+                if conn.unread_result:
+                    conn.consume_results()
+                if conn.in_transaction:
+                    conn.rollback()
+                broken = not conn.is_connected()
+            except Exception:
+                broken = True
+        if broken:
+            self._discard(pooled)
+            return
+        pooled.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _discard(self, pooled, recycled=False):
+        self._close_quietly(pooled)
+        with self._cond:
+            self._size -= 1
+            self._stats['recycled' if recycled else 'discarded'] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones are closed on release)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._warmed = False
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    # ------------------------------------------------------------------
+    # Context-manager API
+    # ------------------------------------------------------------------
+    @contextmanager
+    def connection(self, transaction=False):
+        """
+        Yield a pooled connection and always give it back.
+
+        With transaction=True the block runs inside START TRANSACTION and is
+        committed on success or rolled back on any exception.
+        """
+        pooled = self.acquire()
+        conn = pooled.conn
+        broken = False
+        try:
+            if transaction:
+                conn.start_transaction()
+            yield conn
+            if transaction:
+                conn.commit()
+        except BaseException as exc:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                broken = True
+            if isinstance(exc, Error) and not conn.is_connected():
+                broken = True
+            raise
+        finally:
+            self.release(pooled, broken=broken)
+
+    @contextmanager
+    def cursor(self, transaction=False, **cursor_kwargs):
+        """Yield a cursor on a pooled connection; cursor and connection are cleaned up on exit."""
+        with self.connection(transaction=transaction) as conn:
+            cursor = conn.cursor(**cursor_kwargs)
+            try:
+                yield cursor
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+    def stats(self):
+        """Return a snapshot of pool counters for health checks."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'inUse': self._size - len(self._idle),
+                'minSize': self.min_size,
+                'maxSize': self.max_size,
+            })
+        return snapshot
@@ -0,0 +1,225 @@
+"""
+LearnMatrix: Bulk Table Exports
+Streams Results and ActivityLog (whole tables, or filtered by exam, teacher
+and date range) into CSV or Parquet files of a fixed number of rows each.
+Rows are read in primary-key order one chunk-sized keyset query at a time,
+so memory is bounded by the chunk size, and a state file records the last
+exported key so an interrupted export resumes where it stopped.
+
+Usage:
+    python exports.py results --out exports/ [--format csv|parquet] [--chunk-size 10000]
+                      [--exam ID] [--teacher ID] [--since YYYY-MM-DD] [--until YYYY-MM-DD] [--resume]
+    python exports.py activity --out exports/ ...
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+from datetime import date
+
+try:
+    import pyarrow  # type: ignore
+    import pyarrow.parquet  # type: ignore
+    _HAS_PYARROW = True
+except Exception:
+    # Parquet output is optional; CSV needs nothing beyond the standard library
+    pyarrow = None
+    _HAS_PYARROW = False
+
+EXPORT_FORMATS = ('csv', 'parquet')
+
+
+class ExportSource:
+    """A table that can be exported, with the columns its filters apply to."""
+
+    def __init__(self, table, alias, key, time_column, student_column, exam_condition):
+        self.table = table
+        self.alias = alias
+        self.key = key
+        self.time_column = time_column
+        self.student_column = student_column
+        self.exam_condition = exam_condition
+
+
+EXPORT_SOURCES = {
+    'results': ExportSource('Results', 'r', 'ResultID', 'r.Timestamp', 'r.StudentID',
+                            "r.AssignmentID IN (SELECT AssignmentID FROM Assignments WHERE ExamID = %s)"),
+    'activity': ExportSource('ActivityLog', 'al', 'LogID', 'al.Timestamp', 'al.UserID',
+                             "al.ExamID = %s"),
+}
+
+
+def _filter_sql(source, filters):
+    """WHERE conditions and params for exam_id, teacher_id, since (inclusive) and until (exclusive)."""
+    conditions = []
+    params = []
+    if filters.get('exam_id'):
+        conditions.append(source.exam_condition)
+        params.append(filters['exam_id'])
+    if filters.get('teacher_id'):
+        conditions.append(f"{source.student_column} IN (SELECT StudentID FROM Assignments WHERE TeacherID = %s)")
+        params.append(filters['teacher_id'])
+    if filters.get('since'):
+        conditions.append(f"{source.time_column} >= %s")
+        params.append(filters['since'])
+    if filters.get('until'):
+        conditions.append(f"{source.time_column} < %s")
+        params.append(filters['until'])
+    return conditions, params
+
+
+def iter_chunks(cursor, source, filters=None, chunk_size=10000, after=None):
+    """
+    Yield (columns, rows) chunks of at most `chunk_size` rows in primary-key
+    order, starting after key `after`. Each chunk is one indexed range query.
+    """
+    conditions, params = _filter_sql(source, filters or {})
+    key = f"{source.alias}.{source.key}"
+    while True:
+        where = conditions + ([f"{key} > %s"] if after is not None else [])
+        cursor.execute(f"""
+            SELECT {source.alias}.*
+            FROM {source.table} {source.alias}
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY {key}
+            LIMIT %s
+        """, tuple(params) + ((after,) if after is not None else ()) + (chunk_size,))
+        columns = [d[0] for d in cursor.description]
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield columns, rows
+        after = rows[-1][columns.index(source.key)]
+        if len(rows) < chunk_size:
+            return
+
+
+# ============================================================================
+# WRITERS
+# ============================================================================
+def _text(value):
+    # JSON columns can come back as bytes depending on the connector build
+    return value.decode('utf-8', 'replace') if isinstance(value, (bytes, bytearray)) else value
+
+
+def _csv_value(value):
+    return '' if value is None else _text(value)
+
+
+def csv_lines(columns, rows, header=False):
+    """Encode rows as CSV text (with the header row first when asked)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_value(v) for v in row])
+    return buffer.getvalue()
+
+
+def _write_csv(path, columns, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as out:
+        out.write(csv_lines(columns, rows, header=True))
+
+
+def _write_parquet(path, columns, rows):
+    data = {name: [_text(row[i]) for row in rows] for i, name in enumerate(columns)}
+    pyarrow.parquet.write_table(pyarrow.table(data), path)
+
+
+WRITERS = {'csv': _write_csv, 'parquet': _write_parquet}
+
+
+# ============================================================================
+# RESUMABLE DIRECTORY EXPORT
+# ============================================================================
+def _state_path(out_dir, name):
+    return os.path.join(out_dir, f"{name}.export.json")
+
+
+def _save_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as out:
+        json.dump(state, out, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def export_to_directory(cursor, name, out_dir, fmt='csv', chunk_size=10000, filters=None,
+                        resume=False, progress=None):
+    """
+    Export a source into `out_dir` as <name>-000001.<fmt>, <name>-000002.<fmt>, ...
+
+    Every chunk file is written under a temporary name and renamed when
+    complete, then the state file is advanced, so a crash never leaves a
+    partial chunk behind. With resume=True an existing state file (for the
+    same filters and format) continues after its last key. Returns the state.
+    """
+    if fmt == 'parquet' and not _HAS_PYARROW:
+        raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow)')
+    source = EXPORT_SOURCES[name]
+    filters = {k: (v.isoformat() if isinstance(v, date) else v) for k, v in (filters or {}).items() if v}
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = _state_path(out_dir, name)
+
+    state = {'source': name, 'format': fmt, 'filters': filters, 'chunkSize': chunk_size,
+             'lastKey': None, 'chunks': 0, 'rows': 0, 'complete': False}
+    if resume and os.path.exists(state_path):
+        with open(state_path, encoding='utf-8') as existing:
+            saved = json.load(existing)
+        if saved.get('filters') != filters or saved.get('format') != fmt:
+            raise ValueError('Existing export state was made with different filters or format; '
+                             'use another --out directory or drop --resume')
+        state = saved
+        if state.get('complete'):
+            return state
+    elif os.path.exists(state_path):
+        raise ValueError(f'{state_path} exists; pass --resume to continue it or choose another --out directory')
+
+    write = WRITERS[fmt]
+    for columns, rows in iter_chunks(cursor, source, filters, chunk_size, after=state['lastKey']):
+        sequence = state['chunks'] + 1
+        path = os.path.join(out_dir, f"{name}-{sequence:06d}.{fmt}")
+        write(path + '.part', columns, rows)
+        os.replace(path + '.part', path)
+        state.update(lastKey=rows[-1][columns.index(source.key)], chunks=sequence,
+                     rows=state['rows'] + len(rows))
+        _save_state(state_path, state)
+        if progress:
+            progress(state)
+
+    state['complete'] = True
+    _save_state(state_path, state)
+    return state
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD filter value; ValueError when malformed."""
+    return date.fromisoformat(value) if value else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export Results or ActivityLog in fixed-size chunks')
+    parser.add_argument('source', choices=sorted(EXPORT_SOURCES))
+    parser.add_argument('--out', default='exports', help='output directory (default: exports)')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--chunk-size', type=int, default=None, help='rows per file (default: EXPORT_CHUNK_SIZE)')
+    parser.add_argument('--exam', type=int, help='only rows for this ExamID')
+    parser.add_argument('--teacher', type=int, help="only rows for this teacher's students")
+    parser.add_argument('--since', type=parse_date, help='from this date (inclusive)')
+    parser.add_argument('--until', type=parse_date, help='up to this date (exclusive)')
+    parser.add_argument('--resume', action='store_true', help='continue an interrupted export in --out')
+    args = parser.parse_args()
+
+    from app import db_cursor
+    from config import config
+    with db_cursor() as cursor:
+        final = export_to_directory(
+            cursor, args.source, args.out, fmt=args.format,
+            chunk_size=args.chunk_size or config.EXPORT_CHUNK_SIZE,
+            filters={'exam_id': args.exam, 'teacher_id': args.teacher, 'since': args.since, 'until': args.until},
+            resume=args.resume,
+            progress=lambda s: print(f"  chunk {s['chunks']}: {s['rows']} rows (last key {s['lastKey']})")
+        )
+    print(f"✓ Exported {final['rows']} {args.source} rows in {final['chunks']} files to {args.out}")
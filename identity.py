@@ -0,0 +1,127 @@
+"""
+LearnMatrix: Request Identity Context
+Builds the caller's identity once per request (user id, role and names from
+the session, and whether the request is an API/XHR call) and keeps it on
+flask.g, so login_required, role_required and the handler all share it.
+
+Teacher/student links (a student's TeacherIDs, a teacher's cohort of
+StudentIDs) are loaded on first use and cached per process for a short TTL.
+Writers that create or remove assignments call invalidate() for the users
+involved; other processes catch up within IDENTITY_CACHE_TTL seconds.
+Authorization checks that must be exact should keep querying the database.
+"""
+
+import threading
+import time
+
+from flask import g, request, session
+
+
+def is_api_request():
+    """True for /api/ paths, JSON bodies and XHR calls (answer with JSON 401s instead of redirects)."""
+    try:
+        return (request.path.startswith('/api/') or request.is_json
+                or request.headers.get('X-Requested-With') == 'XMLHttpRequest')
+    except Exception:
+        return False
+
+
+class Identity:
+    """The current caller; relationship IDs are loaded lazily through the provider."""
+
+    def __init__(self, provider, user_id, role, username=None, first_name=None, last_name=None, is_api=False):
+        self._provider = provider
+        self.user_id = user_id
+        self.role = role
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+        self.is_api = is_api
+
+    @property
+    def authenticated(self):
+        return self.user_id is not None
+
+    def teacher_ids(self, cursor=None):
+        """Sorted TeacherIDs of a student's assignments (empty for other roles)."""
+        if self.role != 'Student' or not self.authenticated:
+            return ()
+        return self._provider.links(self.user_id, 'Student', cursor)
+
+    def student_ids(self, cursor=None):
+        """Sorted StudentIDs a teacher has assigned work to (empty for other roles)."""
+        if self.role != 'Teacher' or not self.authenticated:
+            return ()
+        return self._provider.links(self.user_id, 'Teacher', cursor)
+
+
+class IdentityProvider:
+    """
+    Hands out the per-request Identity and caches relationship IDs per user
+    for `ttl` seconds (at most `max_users` users, oldest loaded dropped first).
+    """
+
+    def __init__(self, cursor_factory, ttl=30, max_users=10000):
+        self.cursor_factory = cursor_factory
+        self.ttl = ttl
+        self.max_users = max_users
+        self._links = {}  # (user_id, role) -> (loaded_at, ids)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def current(self):
+        """The request's Identity, built from the session on first use."""
+        identity = getattr(g, '_identity', None)
+        if identity is None:
+            identity = g._identity = Identity(
+                self, session.get('user_id'), session.get('role'), session.get('username'),
+                session.get('first_name'), session.get('last_name'), is_api_request()
+            )
+        return identity
+
+    def links(self, user_id, role, cursor=None):
+        """A student's TeacherIDs or a teacher's StudentIDs, from cache or one DISTINCT query."""
+        key = (user_id, role)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._links.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+
+        if role == 'Student':
+            sql = "SELECT DISTINCT TeacherID FROM Assignments WHERE StudentID = %s ORDER BY TeacherID"
+        else:
+            sql = "SELECT DISTINCT StudentID FROM Assignments WHERE TeacherID = %s ORDER BY StudentID"
+        if cursor is not None:
+            cursor.execute(sql, (user_id,))
+            ids = tuple(row[0] for row in cursor.fetchall())
+        else:
+            with self.cursor_factory() as own_cursor:
+                own_cursor.execute(sql, (user_id,))
+                ids = tuple(row[0] for row in own_cursor.fetchall())
+
+        with self._lock:
+            if key not in self._links and len(self._links) >= self.max_users:
+                oldest = min(self._links, key=lambda k: self._links[k][0])
+                del self._links[oldest]
+            self._links[key] = (now, ids)
+        return ids
+
+    def invalidate(self, *user_ids):
+        """Forget the cached links of these users (any role); no arguments clears everything."""
+        with self._lock:
+            if not user_ids:
+                self._links.clear()
+            else:
+                wanted = set(user_ids)
+                for key in [k for k in self._links if k[0] in wanted]:
+                    del self._links[key]
+            self._stats['invalidations'] += 1
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['users'] = len(self._links)
+        return snapshot
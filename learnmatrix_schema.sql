@@ -5,6 +5,14 @@
 -- ============================================================================
 -- DROP EXISTING TABLES (for fresh setup)
 -- ============================================================================
+DROP TABLE IF EXISTS Blobs;
+DROP TABLE IF EXISTS ResourceVersions;
+DROP TABLE IF EXISTS ActivityRetention;
+DROP TABLE IF EXISTS AchievementProgress;
+DROP TABLE IF EXISTS DailyScoreRollup;
+DROP TABLE IF EXISTS TopicScoreRollup;
+DROP TABLE IF EXISTS DailyActivityRollup;
+DROP TABLE IF EXISTS TeacherClassStats;
 DROP TABLE IF EXISTS Achievements;
 DROP TABLE IF EXISTS ActivityLog;
 DROP TABLE IF EXISTS Doubts;
@@ -65,12 +73,14 @@ CREATE TABLE Questions (
     Explanation TEXT,
     TeacherID INT,
     DifficultyLevel ENUM('Easy', 'Medium', 'Hard') DEFAULT 'Medium',
+    ContentHash CHAR(64) NULL COMMENT 'sha256 of normalised text, options and answer (question_import.py)',
     CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     
     FOREIGN KEY (ExamID) REFERENCES Exams(ExamID) ON DELETE CASCADE,
     FOREIGN KEY (TeacherID) REFERENCES Users(UserID) ON DELETE SET NULL,
     
+    UNIQUE KEY uq_exam_content (ExamID, ContentHash),
     INDEX idx_exam_topic (ExamID, Topic),
     INDEX idx_topic (Topic),
     INDEX idx_subtopic (SubTopic),
@@ -99,6 +109,7 @@ CREATE TABLE Assignments (
     INDEX idx_student_assignments (StudentID),
     INDEX idx_exam_assignments (ExamID),
     INDEX idx_status (Status),
+    INDEX idx_student_due (StudentID, DueDate),
     UNIQUE KEY unique_assignment (TeacherID, StudentID, ExamID)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -110,6 +121,7 @@ CREATE TABLE AssignmentSubmissions (
     AssignmentID INT NOT NULL,
     StudentID INT NOT NULL,
     FilePath VARCHAR(500) NOT NULL,
+    BlobHash CHAR(64) NULL COMMENT 'Blobs.Sha256 of the file',
     FileName VARCHAR(255) NOT NULL,
     FileSize INT COMMENT 'in bytes',
     SubmittedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -123,6 +135,9 @@ CREATE TABLE AssignmentSubmissions (
     INDEX idx_assignment_submissions (AssignmentID),
     INDEX idx_student_submissions (StudentID),
     INDEX idx_submitted_at (SubmittedAt),
+    INDEX idx_student_submitted (StudentID, SubmittedAt),
+    INDEX idx_assignment_submitted (AssignmentID, SubmittedAt),
+    INDEX idx_blobhash (BlobHash),
     UNIQUE KEY unique_assignment_submission (AssignmentID, StudentID)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -161,6 +176,7 @@ CREATE TABLE Doubts (
     Topic VARCHAR(100) NOT NULL,
     DoubtText LONGTEXT NOT NULL,
     ImagePath VARCHAR(255),
+    ImageBlobHash CHAR(64) NULL COMMENT 'Blobs.Sha256 of the image',
     Status ENUM('Pending', 'In_Progress', 'Cleared') NOT NULL DEFAULT 'Pending',
     ResolutionText LONGTEXT,
     Priority ENUM('Low', 'Medium', 'High') DEFAULT 'Medium',
@@ -175,11 +191,17 @@ CREATE TABLE Doubts (
     INDEX idx_teacher_doubts (TeacherID),
     INDEX idx_status (Status),
     INDEX idx_topic_doubts (Topic),
-    INDEX idx_timestamp (Timestamp)
+    INDEX idx_timestamp (Timestamp),
+    INDEX idx_student_time (StudentID, Timestamp),
+    INDEX idx_status_time (Status, Timestamp),
+    INDEX idx_imageblobhash (ImageBlobHash)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- ============================================================================
 -- 7. ACTIVITYLOG TABLE - Track Study Time and Website Usage
+-- Production installs partition this table by month with
+-- `python activity_partitions.py --convert` (drops the foreign keys and
+-- widens the primary key to (LogID, Timestamp), as MySQL partitioning requires)
 -- ============================================================================
 CREATE TABLE ActivityLog (
     LogID INT AUTO_INCREMENT PRIMARY KEY,
@@ -221,6 +243,118 @@ CREATE TABLE Achievements (
     UNIQUE KEY unique_student_trophy (StudentID, TrophyName)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- ============================================================================
+-- 9. TEACHER CLASS STATS TABLE - Precomputed Dashboard Aggregates
+-- Maintained incrementally by the application (see class_stats.py)
+-- ============================================================================
+CREATE TABLE TeacherClassStats (
+    TeacherID INT PRIMARY KEY,
+    TotalStudents INT NOT NULL DEFAULT 0,
+    TotalAssignments INT NOT NULL DEFAULT 0,
+    CompletedAssignments INT NOT NULL DEFAULT 0,
+    TotalTestsTaken INT NOT NULL DEFAULT 0,
+    ScoreSum DECIMAL(14, 2) NOT NULL DEFAULT 0 COMMENT 'Sum of Results.Percentage for the class',
+    PendingDoubts INT NOT NULL DEFAULT 0,
+    IsStale TINYINT(1) NOT NULL DEFAULT 0 COMMENT 'Set when membership changed; recomputed on next read',
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (TeacherID) REFERENCES Users(UserID) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================================
+-- 10. METRIC ROLLUP TABLES - Maintained Student Time and Score Summaries
+-- Updated alongside ActivityLog / Results inserts; rebuild with
+-- `python rollups.py --backfill` after bulk loads (see rollups.py); days before
+-- ActivityRetention.RawSince are kept, their raw rows are gone
+-- ============================================================================
+CREATE TABLE DailyActivityRollup (
+    UserID INT NOT NULL,
+    ActivityDate DATE NOT NULL,
+    ActivityType VARCHAR(32) NOT NULL,
+    ActivityCount INT NOT NULL DEFAULT 0,
+    TotalSeconds BIGINT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (UserID, ActivityDate, ActivityType),
+    FOREIGN KEY (UserID) REFERENCES Users(UserID) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE TopicScoreRollup (
+    StudentID INT NOT NULL,
+    Topic VARCHAR(100) NOT NULL DEFAULT '' COMMENT 'Empty string for results without a topic',
+    AttemptCount INT NOT NULL DEFAULT 0,
+    ScoreSum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    BestScore DECIMAL(5, 2),
+    LowestScore DECIMAL(5, 2),
+    AvgScore DECIMAL(9, 4) AS (ScoreSum / AttemptCount) STORED COMMENT 'Topic mastery; indexed for weakest-topic lookups',
+
+    PRIMARY KEY (StudentID, Topic),
+    INDEX idx_student_mastery (StudentID, AvgScore),
+    FOREIGN KEY (StudentID) REFERENCES Users(UserID) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE DailyScoreRollup (
+    StudentID INT NOT NULL,
+    ResultDate DATE NOT NULL,
+    AttemptCount INT NOT NULL DEFAULT 0,
+    ScoreSum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (StudentID, ResultDate),
+    FOREIGN KEY (StudentID) REFERENCES Users(UserID) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================================
+-- 11. ACHIEVEMENT PROGRESS TABLE - Counters for Event-Driven Trophies
+-- Maintained by the achievement worker (see achievements.py)
+-- ============================================================================
+CREATE TABLE AchievementProgress (
+    StudentID INT PRIMARY KEY,
+    LoginStreak INT NOT NULL DEFAULT 0 COMMENT 'Consecutive days with a login, ending at LastLoginDate',
+    LastLoginDate DATE,
+    DoubtsCleared INT NOT NULL DEFAULT 0,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    FOREIGN KEY (StudentID) REFERENCES Users(UserID) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================================
+-- 12. ACTIVITY RETENTION WATERMARK - Raw vs. Rolled-Up Activity Boundary
+-- Moved forward by `python activity_partitions.py --maintain` before expired
+-- ActivityLog partitions are dropped (see activity_partitions.py)
+-- ============================================================================
+CREATE TABLE ActivityRetention (
+    Id TINYINT PRIMARY KEY DEFAULT 1,
+    RawSince DATE NOT NULL COMMENT 'ActivityLog holds raw rows from this day on; earlier days live in DailyActivityRollup',
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================================
+-- 13. RESOURCE VERSIONS TABLE - Change Counters Behind API ETags
+-- Bumped by writers in the same transaction (see resource_versions.py)
+-- ============================================================================
+CREATE TABLE ResourceVersions (
+    Resource VARCHAR(100) PRIMARY KEY,
+    Version BIGINT NOT NULL DEFAULT 1,
+    UpdatedAt TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================================================
+-- 14. BLOBS TABLE - Content-Addressed Upload Store
+-- One row per distinct submission file / doubt image, stored under
+-- uploads/blobs/<sha[0:2]>/<sha[2:4]>/<sha>.<ext>; RefCount counts the
+-- AssignmentSubmissions.BlobHash and Doubts.ImageBlobHash rows using it
+-- (see blob_store.py, whose --gc deletes unreferenced blobs)
+-- ============================================================================
+CREATE TABLE Blobs (
+    Sha256 CHAR(64) NOT NULL PRIMARY KEY,
+    Extension VARCHAR(10) NOT NULL,
+    Size BIGINT NOT NULL,
+    RefCount INT NOT NULL DEFAULT 0,
+    CreatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UpdatedAt TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    
+    INDEX idx_unreferenced (RefCount, UpdatedAt)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- ============================================================================
 -- SAMPLE DATA INSERTION (Optional - for testing)
 -- Note: Use seed_db.py script to populate comprehensive test data
@@ -1,5 +1,9 @@
 """
-Database migration script to add ImagePath column to Doubts table
+Database migration script to add ImagePath column to Doubts table,
+the composite indexes behind keyset-paged list endpoints, the
+Questions content hash used by the bulk question importer, the
+Blobs table behind content-addressed uploads, the TeacherClassStats
+store, the student metric rollups and the achievement progress counters
 """
 
 import mysql.connector
@@ -7,6 +11,12 @@ from mysql.connector import Error
 from dotenv import load_dotenv
 import os
 
+from question_import import ensure_hash_column
+from blob_store import ensure_blob_schema
+from class_stats import CLASS_STATS_DDL
+from rollups import backfill as backfill_rollups
+from achievements import backfill as backfill_achievements
+
 load_dotenv()
 
 try:
@@ -35,6 +45,72 @@ try:
     else:
         print("✓ ImagePath column already exists")
     
+    # Composite indexes serving the keyset-paged list endpoints
+    list_indexes = [
+        ('Assignments', 'idx_student_due', '(StudentID, DueDate)'),
+        ('Doubts', 'idx_student_time', '(StudentID, Timestamp)'),
+        ('Doubts', 'idx_status_time', '(Status, Timestamp)'),
+        ('AssignmentSubmissions', 'idx_student_submitted', '(StudentID, SubmittedAt)'),
+        ('AssignmentSubmissions', 'idx_assignment_submitted', '(AssignmentID, SubmittedAt)'),
+    ]
+    for table, index, columns in list_indexes:
+        cursor.execute("""
+            SELECT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (table, index))
+        if not cursor.fetchone():
+            print(f"Adding index {index} to {table}...")
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {index} {columns}")
+            print(f"✓ {index} added")
+        else:
+            print(f"✓ {index} already exists")
+    
+    # Content hash + UNIQUE (ExamID, ContentHash) for question-import deduplication
+    if ensure_hash_column(cursor):
+        print("✓ Questions.ContentHash added (run: python question_import.py --backfill-hashes)")
+    else:
+        print("✓ Questions.ContentHash already exists")
+    
+    # Blobs table + BlobHash/ImageBlobHash reference columns for the upload store
+    added = ensure_blob_schema(cursor)
+    for column in added:
+        print(f"✓ {column} added")
+    if added:
+        print("  (run: python blob_store.py --adopt-legacy to move existing uploads into the store)")
+    print("✓ Blobs table ready")
+    
+    # Per-teacher class statistics; rows are computed on the first dashboard read
+    cursor.execute(CLASS_STATS_DDL)
+    print("✓ TeacherClassStats table ready")
+    
+    # Metric rollups are written alongside every activity and result insert; seed them once
+    cursor.execute("""
+        SELECT COUNT(*) FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME IN ('DailyActivityRollup', 'TopicScoreRollup', 'DailyScoreRollup')
+    """)
+    if cursor.fetchone()[0] < 3:
+        print("Creating and backfilling metric rollup tables...")
+        counts = backfill_rollups(cursor)
+        conn.commit()
+        print(f"✓ Rollups built ({counts['dailyActivity']} daily activity, "
+              f"{counts['topicScores']} topic score, {counts['dailyScores']} daily score rows)")
+    else:
+        print("✓ Rollup tables already exist")
+    
+    # Counters read by the achievement worker on every event
+    cursor.execute("""
+        SELECT TABLE_NAME FROM INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'AchievementProgress'
+    """)
+    if not cursor.fetchone():
+        print("Creating and seeding AchievementProgress...")
+        awarded = backfill_achievements(cursor)
+        conn.commit()
+        print(f"✓ AchievementProgress ready ({awarded} trophies awarded from existing data)")
+    else:
+        print("✓ AchievementProgress already exists")
+    
     cursor.close()
     conn.close()
     print("\nDatabase migration completed!")
@@ -0,0 +1,183 @@
+"""
+LearnMatrix: Keyset Pagination Helpers
+Opaque cursor tokens, bounded page sizes and SQL keyset queries for list
+endpoints
+"""
+
+import base64
+import json
+from bisect import bisect_left, bisect_right
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor token that cannot be decoded."""
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque URL-safe token."""
+    raw = json.dumps(list(values), separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor(); returns a tuple or None for an empty token."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list):
+        raise InvalidCursor('Invalid cursor')
+    return tuple(values)
+
+
+def clamp_page_size(raw, default, maximum):
+    """Parse a client-supplied page size and clamp it into [1, maximum]."""
+    try:
+        size = int(raw) if raw not in (None, '') else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def keyset_page(items, key, limit, after=None, descending=False):
+    """
+    Return (page, next_cursor) for an in-memory list using keyset semantics.
+
+    `key` maps an item to a tuple that is unique per item (append the primary
+    key as a tie-breaker). `after` is the decoded cursor of the previous page.
+    Pages stay stable when rows are inserted or removed between requests,
+    unlike OFFSET-based paging.
+    """
+    ordered = sorted(items, key=key)
+    keys = [key(item) for item in ordered]
+
+    try:
+        if descending:
+            end = bisect_left(keys, after) if after is not None else len(ordered)
+            start = max(0, end - limit)
+            page = ordered[start:end][::-1]
+            has_more = start > 0
+        else:
+            start = bisect_right(keys, after) if after is not None else 0
+            page = ordered[start:start + limit]
+            has_more = start + limit < len(ordered)
+    except TypeError:
+        # Cursor values do not compare with this sort key (tampered or from another sort)
+        raise InvalidCursor('Invalid cursor')
+
+    next_cursor = encode_cursor(key(page[-1])) if page and has_more else None
+    return page, next_cursor
+
+
+# ============================================================================
+# SQL KEYSET PAGINATION
+# ============================================================================
+class KeysetSort:
+    """
+    A named ordering for a SQL list endpoint: `columns` is a list of
+    (sql_expression, descending) pairs that must end in a unique column
+    (normally the primary key) so every row has a distinct position, and
+    `key(row)` returns a fetched row's values for those columns, in order.
+    """
+
+    def __init__(self, columns, key):
+        self.columns = list(columns)
+        self.key = key
+
+    def reversed(self):
+        return KeysetSort([(expr, not descending) for expr, descending in self.columns], self.key)
+
+    def natural_order(self):
+        return 'desc' if self.columns[0][1] else 'asc'
+
+    def order_by(self):
+        return ', '.join(f"{expr} {'DESC' if descending else 'ASC'}" for expr, descending in self.columns)
+
+
+def _after_clause(expr, descending, value):
+    # MySQL sorts NULL before every value, so NULLs come last in DESC order
+    if value is None:
+        return ('FALSE', []) if descending else (f"{expr} IS NOT NULL", [])
+    if descending:
+        return f"({expr} < %s OR {expr} IS NULL)", [value]
+    return f"{expr} > %s", [value]
+
+
+def _equal_clause(expr, value):
+    if value is None:
+        return f"{expr} IS NULL", []
+    return f"{expr} = %s", [value]
+
+
+def keyset_predicate(sort, after):
+    """
+    SQL condition (and params) selecting the rows that come after the cursor
+    values `after` in `sort` order, expanded as
+    (c1 > v1) OR (c1 = v1 AND c2 > v2) OR ... so mixed directions work.
+    """
+    if len(after) != len(sort.columns):
+        raise InvalidCursor('Invalid cursor')
+    branches = []
+    params = []
+    for i, (expr, descending) in enumerate(sort.columns):
+        parts = []
+        for j, (prev_expr, _) in enumerate(sort.columns[:i]):
+            clause, clause_params = _equal_clause(prev_expr, after[j])
+            parts.append(clause)
+            params.extend(clause_params)
+        clause, clause_params = _after_clause(expr, descending, after[i])
+        parts.append(clause)
+        params.extend(clause_params)
+        branches.append('(' + ' AND '.join(parts) + ')')
+    return '(' + ' OR '.join(branches) + ')', params
+
+
+def fetch_keyset_page(cursor, sql, params, sort, limit, after=None):
+    """
+    Run one page of a list query and return (rows, next_cursor).
+
+    `sql` is a SELECT ending in its WHERE clause (no ORDER BY / LIMIT);
+    the cursor condition, ORDER BY and LIMIT are appended. One extra row is
+    fetched to tell whether another page exists, so the cost of a page only
+    depends on its size when a matching index serves the ordering.
+    """
+    params = list(params)
+    if after is not None:
+        predicate, predicate_params = keyset_predicate(sort, after)
+        sql += f" AND {predicate}"
+        params.extend(predicate_params)
+    sql += f" ORDER BY {sort.order_by()} LIMIT %s"
+    params.append(limit + 1)
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(sort.key(rows[-1]))
+    return rows, None
+
+
+def parse_page_request(args, sorts, default_sort, default_size, max_size):
+    """
+    Read sort, order, limit and cursor query parameters against a dict of
+    named KeysetSorts. Returns (sort, limit, after); raises ValueError
+    (InvalidCursor for a bad cursor) on invalid input.
+    """
+    name = args.get('sort', default_sort)
+    if name not in sorts:
+        raise ValueError(f'Invalid sort field: {name}')
+    sort = sorts[name]
+    order = args.get('order', sort.natural_order()).lower()
+    if order not in ('asc', 'desc'):
+        raise ValueError(f'Invalid order: {order}')
+    if order != sort.natural_order():
+        sort = sort.reversed()
+    limit = clamp_page_size(args.get('limit'), default_size, max_size)
+    after = decode_cursor(args.get('cursor'))
+    # Tokens from another sort or edited by hand decode fine; reject them here, not mid-query
+    if after is not None and (len(after) != len(sort.columns) or
+                              not all(v is None or isinstance(v, (str, int, float)) for v in after)):
+        raise InvalidCursor('Invalid cursor')
+    return sort, limit, after
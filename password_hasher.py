@@ -0,0 +1,154 @@
+"""
+LearnMatrix: Password Hashing Service
+Runs bcrypt in a small process pool so a login storm costs worker processes'
+CPU rather than the web workers' request threads, and bounds how much hashing
+can be in flight:
+
+- at most `max_pending` hash/verify jobs are queued or running; beyond that
+  calls fail fast with HasherBusy and the route answers 503 + Retry-After
+- verify() also reports a replacement hash when the stored one was made with
+  a different cost than BCRYPT_LOG_ROUNDS, so old hashes are upgraded on the
+  next successful login without a separate migration
+- workers=0 hashes on the calling thread (development, tests, CLI scripts)
+"""
+
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """The hashing queue is full (or a job timed out); the client should retry shortly."""
+
+
+def hash_cost(password_hash):
+    """The bcrypt cost (log rounds) a hash was made with, or None when it is not a bcrypt hash."""
+    parts = password_hash.split('$')
+    try:
+        return int(parts[2]) if len(parts) > 3 else None
+    except ValueError:
+        return None
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _verify(password, password_hash, rounds):
+    """Check a password; when it matches a hash of another cost, also return its replacement."""
+    try:
+        ok = bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        # Malformed stored hash: treat as a failed login rather than a server error
+        return False, None
+    if ok and hash_cost(password_hash) != rounds:
+        return True, _hash(password, rounds)
+    return ok, None
+
+
+class PasswordHasher:
+    """Bounded bcrypt service; see the module docstring."""
+
+    def __init__(self, rounds=12, workers=2, max_pending=64, timeout=10.0):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._pool = None
+        self._start_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._stats_lock = threading.Lock()
+        self._pending = 0
+        self._stats = {'hashed': 0, 'verified': 0, 'rehashed': 0, 'rejected': 0, 'timeouts': 0,
+                       'highWatermark': 0}
+
+    def _executor(self):
+        if self._pool is None:
+            with self._start_lock:
+                if self._pool is None:
+                    # spawn: forking a threaded web worker can deadlock the child on inherited locks
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise HasherBusy('Too many logins in progress, please retry shortly')
+        with self._stats_lock:
+            self._pending += 1
+            self._stats['highWatermark'] = max(self._stats['highWatermark'], self._pending)
+        if not self.workers:
+            try:
+                return fn(*args)
+            finally:
+                self._release()
+
+        try:
+            future = self._executor().submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._reset_pool()
+            raise HasherBusy('Password service restarting, please retry shortly')
+        except Exception:
+            self._release()
+            raise
+        # The slot is freed when the job finishes, even if this caller has given up on it
+        future.add_done_callback(lambda _: self._release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            with self._stats_lock:
+                self._stats['timeouts'] += 1
+            raise HasherBusy('Password check timed out, please retry shortly')
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool on the next call
+            self._reset_pool()
+            raise HasherBusy('Password service restarting, please retry shortly')
+
+    def _reset_pool(self):
+        with self._start_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self):
+        with self._stats_lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def hash(self, password):
+        """Hash a new password at the configured cost. Raises HasherBusy when saturated."""
+        result = self._run(_hash, password, self.rounds)
+        with self._stats_lock:
+            self._stats['hashed'] += 1
+        return result
+
+    def verify(self, password, password_hash):
+        """
+        Return (matches, new_hash). new_hash is set when the password matched
+        a hash of another cost and should be stored in its place.
+        Raises HasherBusy when saturated.
+        """
+        ok, new_hash = self._run(_verify, password, password_hash, self.rounds)
+        with self._stats_lock:
+            self._stats['verified'] += 1
+            if new_hash:
+                self._stats['rehashed'] += 1
+        return ok, new_hash
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+            snapshot['pending'] = self._pending
+        snapshot.update(workers=self.workers, maxPending=self.max_pending, rounds=self.rounds)
+        return snapshot
+
+    def shutdown(self):
+        self._reset_pool()
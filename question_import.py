@@ -0,0 +1,357 @@
+"""
+LearnMatrix: Bulk Question-Bank Import
+Streams past-paper question files (CSV, JSON Lines or JSON arrays) into the
+Questions table:
+
+- every record is validated (exam, text, Options as a list of strings,
+  CorrectOption a letter naming one of them) and bad rows are reported by
+  line number instead of aborting the load
+- duplicates are skipped by a SHA-256 content hash of the normalised text,
+  options and answer, enforced by UNIQUE (ExamID, ContentHash), so re-running
+  an import or loading overlapping papers is safe
+- rows are written with executemany in batches, one transaction per batch,
+  so memory stays flat and an interrupted load keeps every committed batch
+- --relax-indexes drops the secondary lookup indexes for the duration of a
+  huge load and rebuilds them once at the end
+
+Usage:
+    python question_import.py papers.csv [--exam ID] [--batch-size 2000] [--relax-indexes]
+    python question_import.py papers.jsonl --teacher 12
+
+CSV columns: exam_id, topic, subtopic, year, question, options (JSON array)
+or option_a..option_f, correct_option, explanation, difficulty. JSON records
+use the same keys (or the Questions column names).
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import ijson  # type: ignore
+    _HAS_IJSON = True
+except Exception:
+    # Without ijson a .json array is parsed in one go; CSV and .jsonl always stream
+    ijson = None
+    _HAS_IJSON = False
+
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+OPTION_LETTERS = 'ABCDEF'
+MAX_REPORTED_ERRORS = 100
+
+# Secondary indexes that only serve reads; ExamID stays covered by uq_exam_content for the foreign key
+RELAXABLE_INDEXES = [
+    ('idx_exam_topic', '(ExamID, Topic)'),
+    ('idx_topic', '(Topic)'),
+    ('idx_subtopic', '(SubTopic)'),
+    ('idx_year', '(Year)'),
+]
+
+INSERT_SQL = """
+    INSERT INTO Questions (ExamID, Topic, SubTopic, Year, QuestionText, Options, CorrectOption,
+                           Explanation, TeacherID, DifficultyLevel, ContentHash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE QuestionID = QuestionID
+"""
+
+
+# ============================================================================
+# CONTENT HASH
+# ============================================================================
+def _normalise(text):
+    return re.sub(r'\s+', ' ', str(text)).strip().lower()
+
+
+def content_hash(question_text, options, correct_option):
+    """SHA-256 over the whitespace- and case-normalised question, options and answer."""
+    payload = json.dumps([_normalise(question_text), [_normalise(o) for o in options], correct_option.upper()])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def ensure_hash_column(cursor):
+    """Add Questions.ContentHash and its unique key to databases created before the importer."""
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Questions' AND COLUMN_NAME = 'ContentHash'
+    """)
+    if cursor.fetchone():
+        return False
+    cursor.execute("""
+        ALTER TABLE Questions
+        ADD COLUMN ContentHash CHAR(64) NULL COMMENT 'sha256 of normalised text, options and answer' AFTER DifficultyLevel,
+        ADD UNIQUE KEY uq_exam_content (ExamID, ContentHash)
+    """)
+    return True
+
+
+def backfill_hashes(cursor_factory, batch_size=2000):
+    """
+    Hash existing questions so imports dedupe against them too. Rows that
+    duplicate an already hashed question keep a NULL hash. Returns rows hashed.
+    """
+    hashed = 0
+    last_id = 0
+    while True:
+        with cursor_factory(transaction=True) as cursor:
+            cursor.execute("""
+                SELECT QuestionID, QuestionText, Options, CorrectOption FROM Questions
+                WHERE ContentHash IS NULL AND QuestionID > %s ORDER BY QuestionID LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                return hashed
+            updates = []
+            for question_id, text, options, correct in rows:
+                try:
+                    parsed = json.loads(options) if isinstance(options, (str, bytes, bytearray)) else options
+                except ValueError:
+                    continue
+                updates.append((content_hash(text, parsed or [], correct or ''), question_id))
+            # IGNORE: a legacy duplicate would violate uq_exam_content; it simply stays unhashed
+            cursor.executemany("UPDATE IGNORE Questions SET ContentHash = %s WHERE QuestionID = %s", updates)
+            hashed += max(cursor.rowcount, 0)
+            last_id = rows[-1][0]
+
+
+# ============================================================================
+# READING AND VALIDATION
+# ============================================================================
+def _key(name):
+    return re.sub(r'[^a-z]', '', name.lower())
+
+
+# Normalised field name -> canonical name; accepts snake_case and the Questions column names
+FIELD_NAMES = {
+    'examid': 'exam_id', 'topic': 'topic', 'subtopic': 'subtopic', 'year': 'year',
+    'question': 'question', 'questiontext': 'question', 'options': 'options',
+    'correctoption': 'correct_option', 'answer': 'correct_option', 'explanation': 'explanation',
+    'difficulty': 'difficulty', 'difficultylevel': 'difficulty',
+}
+
+
+def read_records(stream, fmt):
+    """Yield (line_or_index, record dict) from a text stream of the given format ('csv', 'jsonl', 'json')."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError as err:
+                    yield line_no, err
+    elif fmt == 'json':
+        items = ijson.items(stream, 'item') if _HAS_IJSON else json.load(stream)
+        for index, record in enumerate(items, start=1):
+            yield index, record
+    else:
+        raise ValueError(f'Unsupported question file format: {fmt}')
+
+
+def detect_format(filename):
+    lowered = filename.lower()
+    if lowered.endswith('.csv'):
+        return 'csv'
+    if lowered.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if lowered.endswith('.json'):
+        return 'json'
+    raise ValueError('Question files must be .csv, .jsonl/.ndjson or .json')
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_question(record, exam_ids, default_exam_id=None, teacher_id=None):
+    """
+    Validate one record and return its row for INSERT_SQL (ContentHash
+    last). Raises ValueError naming the first problem found.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('record is not an object')
+    fields = {}
+    letter_options = {}
+    for name, value in record.items():
+        key = _key(name or '')
+        if key.startswith('option') and len(key) == 7 and key[6].upper() in OPTION_LETTERS:
+            letter_options[key[6].upper()] = value
+        elif key in FIELD_NAMES:
+            fields[FIELD_NAMES[key]] = value
+
+    try:
+        exam_id = int(fields['exam_id']) if not _blank(fields.get('exam_id')) else default_exam_id
+    except (TypeError, ValueError):
+        raise ValueError('exam_id must be an integer')
+    if exam_id is None:
+        raise ValueError('exam_id is missing (pass --exam for files without it)')
+    if exam_id not in exam_ids:
+        raise ValueError(f'exam {exam_id} does not exist')
+
+    question = fields.get('question')
+    if _blank(question):
+        raise ValueError('question text is missing')
+    topic = fields.get('topic')
+    if _blank(topic):
+        raise ValueError('topic is missing')
+
+    options = fields.get('options')
+    if _blank(options):
+        options = [letter_options[l] for l in OPTION_LETTERS if not _blank(letter_options.get(l))]
+    elif isinstance(options, str):
+        try:
+            options = json.loads(options)
+        except ValueError:
+            raise ValueError('options is not valid JSON')
+    if not isinstance(options, list) or len(options) < 2 or len(options) > len(OPTION_LETTERS):
+        raise ValueError(f'options must be a list of 2-{len(OPTION_LETTERS)} choices')
+    if any(not isinstance(o, (str, int, float)) or _blank(o) for o in options):
+        raise ValueError('every option must be a non-empty string')
+    options = [str(o).strip() for o in options]
+
+    correct = str(fields.get('correct_option') or '').strip().upper()
+    if len(correct) != 1 or correct not in OPTION_LETTERS[:len(options)]:
+        raise ValueError(f'correct_option must be one of {", ".join(OPTION_LETTERS[:len(options)])}')
+
+    difficulty = str(fields.get('difficulty') or 'Medium').strip().capitalize()
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f'difficulty must be one of {", ".join(DIFFICULTIES)}')
+    year = fields.get('year')
+    try:
+        year = int(year) if not _blank(year) else None
+    except (TypeError, ValueError):
+        raise ValueError('year must be an integer')
+
+    subtopic = fields.get('subtopic')
+    explanation = fields.get('explanation')
+    return (exam_id, str(topic).strip()[:100], None if _blank(subtopic) else str(subtopic).strip()[:100],
+            year, str(question).strip(), json.dumps(options), correct,
+            None if _blank(explanation) else str(explanation).strip(), teacher_id, difficulty,
+            content_hash(question, options, correct))
+
+
+# ============================================================================
+# LOADING
+# ============================================================================
+@contextmanager
+def relaxed_indexes(cursor_factory):
+    """Drop the read-only secondary indexes while the block runs and rebuild them in one ALTER afterwards."""
+    with cursor_factory() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT INDEX_NAME FROM INFORMATION_SCHEMA.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Questions'
+        """)
+        present = {row[0] for row in cursor.fetchall()}
+        dropped = [(name, columns) for name, columns in RELAXABLE_INDEXES if name in present]
+        if dropped:
+            cursor.execute("ALTER TABLE Questions " + ", ".join(f"DROP INDEX {name}" for name, _ in dropped))
+    try:
+        yield [name for name, _ in dropped]
+    finally:
+        if dropped:
+            with cursor_factory() as cursor:
+                cursor.execute("ALTER TABLE Questions "
+                               + ", ".join(f"ADD INDEX {name} {columns}" for name, columns in dropped))
+
+
+def import_questions(cursor_factory, records, default_exam_id=None, teacher_id=None,
+                     batch_size=2000, relax_indexes=False, progress=None):
+    """
+    Validate and insert (line, record) pairs from read_records().
+
+    Each batch of up to `batch_size` valid rows is one executemany in its
+    own transaction. Returns a summary with read/inserted/duplicate/invalid
+    counts, the first MAX_REPORTED_ERRORS errors, the ExamIDs that received
+    questions, and the elapsed seconds and rows per second.
+    """
+    with cursor_factory() as cursor:
+        ensure_hash_column(cursor)
+        cursor.execute("SELECT ExamID FROM Exams")
+        exam_ids = {row[0] for row in cursor.fetchall()}
+
+    summary = {'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0, 'errors': [], 'exams': set()}
+    started = time.perf_counter()
+
+    def flush(batch):
+        with cursor_factory(transaction=True) as cursor:
+            # Exams were checked up front, so the per-row foreign key lookups can be skipped
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            try:
+                cursor.executemany(INSERT_SQL, batch)
+                # ON DUPLICATE KEY UPDATE QuestionID = QuestionID reports 0 affected rows for a duplicate
+                inserted = max(cursor.rowcount, 0)
+            finally:
+                cursor.execute("SET SESSION foreign_key_checks = 1")
+        summary['inserted'] += inserted
+        summary['duplicates'] += len(batch) - inserted
+        summary['exams'].update(row[0] for row in batch)
+        if progress:
+            elapsed = time.perf_counter() - started
+            progress(dict(summary, rowsPerSecond=round(summary['read'] / elapsed) if elapsed else 0))
+
+    with (relaxed_indexes(cursor_factory) if relax_indexes else nullcontext([])):
+        batch = []
+        for line, record in records:
+            summary['read'] += 1
+            try:
+                if isinstance(record, Exception):
+                    raise ValueError(f'unreadable record: {record}')
+                batch.append(parse_question(record, exam_ids, default_exam_id, teacher_id))
+            except ValueError as err:
+                summary['invalid'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'line': line, 'error': str(err)})
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+    elapsed = time.perf_counter() - started
+    summary['exams'] = sorted(summary['exams'])
+    summary['seconds'] = round(elapsed, 3)
+    summary['rowsPerSecond'] = round(summary['read'] / elapsed) if elapsed else 0
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk-import questions from CSV / JSON Lines / JSON files')
+    parser.add_argument('path', nargs='?', help='question file (.csv, .jsonl/.ndjson or .json)')
+    parser.add_argument('--exam', type=int, help='ExamID for records that do not name one')
+    parser.add_argument('--teacher', type=int, help='TeacherID to record as the author')
+    parser.add_argument('--batch-size', type=int, default=None, help='rows per transaction (default: QUESTION_IMPORT_BATCH_SIZE)')
+    parser.add_argument('--relax-indexes', action='store_true', help='drop secondary indexes during the load and rebuild them after')
+    parser.add_argument('--backfill-hashes', action='store_true', help='hash existing questions so imports dedupe against them')
+    args = parser.parse_args()
+    if not (args.path or args.backfill_hashes):
+        parser.print_help()
+    else:
+        from app import db_cursor
+        from config import config
+        batch_size = args.batch_size or config.QUESTION_IMPORT_BATCH_SIZE
+        if args.backfill_hashes:
+            with db_cursor() as cursor:
+                ensure_hash_column(cursor)
+            print(f"✓ Hashed {backfill_hashes(db_cursor, batch_size)} existing questions")
+        if args.path:
+            with open(args.path, encoding='utf-8-sig', newline='') as stream:
+                result = import_questions(
+                    db_cursor, read_records(stream, detect_format(args.path)),
+                    default_exam_id=args.exam, teacher_id=args.teacher, batch_size=batch_size,
+                    relax_indexes=args.relax_indexes,
+                    progress=lambda s: print(f"  {s['read']} read, {s['inserted']} inserted, "
+                                             f"{s['duplicates']} duplicates, {s['invalid']} invalid "
+                                             f"({s['rowsPerSecond']} rows/s)")
+                )
+            for error in result['errors']:
+                print(f"  ✗ line {error['line']}: {error['error']}")
+            print(f"✓ Imported {result['inserted']} questions ({result['duplicates']} duplicates skipped, "
+                  f"{result['invalid']} invalid) in {result['seconds']}s, {result['rowsPerSecond']} rows/s")
+            print("  Running app workers pick up the new questions within ANSWER_KEY_TTL / QUESTION_INDEX_TTL")
@@ -0,0 +1,107 @@
+"""
+LearnMatrix: Random Question Sampler
+Replaces ORDER BY RAND() drills: QuestionIDs are indexed in memory by
+(ExamID, Topic), a uniform sample is drawn from the index and only the chosen
+rows are fetched by primary key
+"""
+
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+
+class QuestionSampler:
+    """
+    In-memory (ExamID, Topic) -> sorted QuestionID array index.
+
+    An exam's index is built on first use with one covering scan of
+    idx_exam_topic; `exam_id=None` indexes the whole bank (fallback pool).
+    Call invalidate(exam_id) when an exam's questions change; entries also
+    expire after `ttl` seconds so other workers' edits are picked up.
+    """
+
+    def __init__(self, ttl=300, max_exams=256):
+        self.ttl = ttl
+        self.max_exams = max_exams
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _topic_pools(self, cursor, exam_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._pools.get(exam_id)
+            if entry and (not self.ttl or now - entry[0] < self.ttl):
+                return entry[1]
+
+        if exam_id is None:
+            cursor.execute("SELECT Topic, QuestionID FROM Questions")
+        else:
+            cursor.execute("SELECT Topic, QuestionID FROM Questions WHERE ExamID = %s", (exam_id,))
+        grouped = {}
+        for topic, question_id in cursor.fetchall():
+            grouped.setdefault(topic, []).append(question_id)
+        # Sorted so that a seeded draw picks the same questions every time
+        pools = {topic: array('i', sorted(ids)) for topic, ids in grouped.items()}
+
+        with self._lock:
+            if exam_id not in self._pools and len(self._pools) >= self.max_exams:
+                oldest = min(self._pools, key=lambda k: self._pools[k][0])
+                del self._pools[oldest]
+            self._pools[exam_id] = (now, pools)
+        return pools
+
+    def invalidate(self, exam_id=None):
+        """Drop one exam's index (and the whole-bank pool), or everything when exam_id is None."""
+        with self._lock:
+            if exam_id is None:
+                self._pools.clear()
+            else:
+                self._pools.pop(exam_id, None)
+                self._pools.pop(None, None)
+
+    def sample_ids(self, cursor, exam_id, topics=None, k=10, seed=None):
+        """
+        Draw up to k distinct QuestionIDs uniformly from the exam's questions,
+        restricted to `topics` when given. Pass `seed` for a reproducible draw.
+        """
+        pools = self._topic_pools(cursor, exam_id)
+        if topics is None:
+            chosen = [pools[t] for t in sorted(pools, key=lambda t: (t is None, t))]
+        else:
+            chosen = [pools[t] for t in sorted(set(topics), key=lambda t: (t is None, t)) if t in pools]
+
+        # Treat the chosen pools as one virtual array and sample positions in it
+        offsets = []
+        total = 0
+        for ids in chosen:
+            offsets.append(total)
+            total += len(ids)
+        if not total:
+            return []
+
+        rng = random.Random(seed) if seed is not None else random
+        picked = []
+        for position in rng.sample(range(total), min(k, total)):
+            pool = bisect_right(offsets, position) - 1
+            picked.append(chosen[pool][position - offsets[pool]])
+        return picked
+
+    def sample(self, cursor, exam_id, columns, topics=None, k=10, seed=None):
+        """
+        Sample questions and fetch `columns` (SQL select list, QuestionID
+        first) for them by primary key. Rows come back in draw order.
+        """
+        ids = self.sample_ids(cursor, exam_id, topics=topics, k=k, seed=seed)
+        if not ids:
+            return []
+        placeholders = ','.join(['%s'] * len(ids))
+        cursor.execute(f"""
+            SELECT {columns}
+            FROM Questions
+            WHERE QuestionID IN ({placeholders})
+        """, ids)
+        rows = {row[0]: row for row in cursor.fetchall()}
+        # Questions deleted since the index was built are simply skipped
+        return [rows[qid] for qid in ids if qid in rows]
@@ -0,0 +1,136 @@
+"""
+LearnMatrix: Resource Versions and Conditional GET
+Writers bump a small per-resource version counter in the same transaction as
+their change ("exams", "doubts:student:S", ...). Read endpoints derive a
+strong ETag from the counters they depend on with one primary-key lookup and
+answer If-None-Match hits with 304 before running their main query.
+
+Usage: python resource_versions.py --create   (add the table to an existing database)
+"""
+
+import argparse
+import hashlib
+from functools import wraps
+
+from flask import make_response, request, session
+from mysql.connector import errorcode
+from mysql.connector.errors import ProgrammingError
+
+VERSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS ResourceVersions (
+    Resource VARCHAR(100) PRIMARY KEY,
+    Version BIGINT NOT NULL DEFAULT 1,
+    UpdatedAt TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+BUMP_SQL = """
+    INSERT INTO ResourceVersions (Resource, Version) VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE Version = Version + 1
+"""
+
+
+def exams_resource():
+    return 'exams'
+
+
+def doubts_resource(student_id):
+    return f"doubts:student:{student_id}"
+
+
+def achievements_resource(student_id=None):
+    """Per-student trophies; without a student, the bulk-award counter every student's ETag includes."""
+    return f"achievements:student:{student_id}" if student_id is not None else 'achievements'
+
+
+def assignments_resource(teacher_id):
+    return f"assignments:teacher:{teacher_id}"
+
+
+def _missing_table(err):
+    return err.errno == errorcode.ER_NO_SUCH_TABLE
+
+
+def bump(cursor, *resources):
+    """Mark resources as changed; call inside the writing transaction."""
+    if not resources:
+        return
+    try:
+        cursor.executemany(BUMP_SQL, [(resource,) for resource in sorted(set(resources))])
+    except ProgrammingError as err:
+        # Not migrated yet: ETags are simply not served (see current_etag)
+        if not _missing_table(err):
+            raise
+
+
+def bump_assignment_teacher(cursor, assignment_id):
+    """Bump the assignment list of the teacher who owns `assignment_id`."""
+    try:
+        cursor.execute("""
+            INSERT INTO ResourceVersions (Resource, Version)
+            SELECT CONCAT('assignments:teacher:', TeacherID), 1 FROM Assignments WHERE AssignmentID = %s
+            ON DUPLICATE KEY UPDATE Version = Version + 1
+        """, (assignment_id,))
+    except ProgrammingError as err:
+        if not _missing_table(err):
+            raise
+
+
+def current_etag(cursor, resources):
+    """
+    Strong ETag over the resources' versions, or None when the table is
+    missing. UpdatedAt is folded in so a counter re-created after a reset
+    never repeats an earlier tag.
+    """
+    resources = sorted(set(resources))
+    placeholders = ','.join(['%s'] * len(resources))
+    try:
+        cursor.execute(f"""
+            SELECT Resource, Version, UpdatedAt FROM ResourceVersions WHERE Resource IN ({placeholders})
+        """, resources)
+    except ProgrammingError as err:
+        if _missing_table(err):
+            return None
+        raise
+    versions = {row[0]: f"{row[1]}@{row[2]}" for row in cursor.fetchall()}
+    state = '|'.join(f"{resource}={versions.get(resource, 0)}" for resource in resources)
+    return hashlib.sha1(state.encode('utf-8')).hexdigest()
+
+
+def conditional_get(cursor_factory, resources, cache_control='private, no-cache'):
+    """
+    Decorator for read-only JSON views. `resources(user_id)` names the
+    counters the payload depends on. The ETag is read before the view runs,
+    so a write racing the main query can only make the tag older than the
+    body (a later revalidation then misses), never serve a stale 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            with cursor_factory() as cursor:
+                etag = current_etag(cursor, resources(session.get('user_id')))
+
+            if etag is not None and request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or etag is None:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the ResourceVersions table')
+    parser.add_argument('--create', action='store_true', help='create the ResourceVersions table')
+    args = parser.parse_args()
+    if not args.create:
+        parser.print_help()
+    else:
+        from app import db_cursor
+        with db_cursor() as cursor:
+            cursor.execute(VERSIONS_DDL)
+        print("✓ ResourceVersions table ready")
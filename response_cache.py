@@ -0,0 +1,263 @@
+"""
+LearnMatrix: Dashboard Response Cache
+Caches rendered JSON responses keyed by (endpoint, user, query string) with a
+TTL, LRU eviction under an entry and memory cap, and tag-based invalidation so
+writes can drop exactly the dashboards they affect (e.g. a new Results row for
+student S invalidates "student:S" and "teacher:T" for each of S's teachers).
+
+The store is in-process by default; a shared Redis backend can be selected
+with CACHE_TYPE=redis so that every worker sees the same entries and
+invalidations.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import request, session
+
+try:
+    import redis  # type: ignore
+    _HAS_REDIS = True
+except Exception:
+    redis = None
+    _HAS_REDIS = False
+
+
+def student_tag(student_id):
+    return f"student:{student_id}"
+
+
+def teacher_tag(teacher_id):
+    return f"teacher:{teacher_id}"
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+class LocalCacheBackend:
+    """
+    In-process LRU store. Values are strings; the memory cap counts their
+    length, which is close to the response body size.
+    """
+
+    def __init__(self, max_entries=5000, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}  # tag -> set of keys
+        self._bytes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl, tags=()):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tuple(tags))
+            self._bytes += len(value)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def _remove(self, key):
+        _, value, tags = self._entries.pop(key)
+        self._bytes -= len(value)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tags(self, tags):
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def info(self):
+        with self._lock:
+            return {'backend': 'local', 'entries': len(self._entries), 'bytes': self._bytes,
+                    'maxBytes': self.max_bytes, 'evictions': self._evictions}
+
+
+class RedisCacheBackend:
+    """
+    Shared store in Redis. Each tag is a Redis set of the keys carrying it;
+    Redis' own maxmemory/LRU policy enforces the memory cap.
+    """
+
+    def __init__(self, url, prefix='learnmatrix:cache:'):
+        if not _HAS_REDIS:
+            raise RuntimeError('CACHE_TYPE=redis requires the redis package (pip install redis)')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, ttl, tags=()):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, value, ex=ttl)
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            pipe.sadd(tag_key, key)
+            pipe.expire(tag_key, ttl)
+        pipe.execute()
+
+    def invalidate_tags(self, tags, batch_size=1000):
+        """
+        Two pipelined round trips per batch of tags (read and drop the tag
+        sets atomically, then delete their keys), so invalidating a whole
+        cohort after a bulk assign stays cheap.
+        """
+        tags = list(tags)
+        removed = 0
+        for start in range(0, len(tags), batch_size):
+            tag_keys = [self.prefix + 'tag:' + tag for tag in tags[start:start + batch_size]]
+            pipe = self.client.pipeline()
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            pipe.delete(*tag_keys)
+            members = pipe.execute()[:-1]
+            keys = {self.prefix + k.decode('utf-8') for tag_members in members for k in tag_members}
+            if keys:
+                removed += self.client.delete(*keys)
+        return removed
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def info(self):
+        return {'backend': 'redis'}
+
+
+# ============================================================================
+# RESPONSE CACHE
+# ============================================================================
+class ResponseCache:
+    """
+    Decorator-based cache for JSON endpoints.
+
+    @response_cache.cached(tags=lambda user_id: [student_tag(user_id)])
+    caches successful (200) responses per endpoint, logged-in user and query
+    string. Apply it below login_required/role_required so access checks
+    still run on every request.
+    """
+
+    def __init__(self, backend, default_ttl=60, enabled=True):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'errors': 0}
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self._stats[name] += amount
+
+    @staticmethod
+    def make_key(endpoint, user_id, args):
+        query = urlencode(sorted(args.items(multi=True)))
+        return f"{endpoint}:{user_id}:{query}"
+
+    def cached(self, ttl=None, tags=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                user_id = session.get('user_id')
+                key = self.make_key(request.endpoint, user_id, request.args)
+                try:
+                    stored = self.backend.get(key)
+                except Exception as err:
+                    # A broken shared cache must never take the dashboard down
+                    self._count('errors')
+                    print(f"[response_cache] get failed: {err}")
+                    stored = None
+                if stored is not None:
+                    self._count('hits')
+                    entry = json.loads(stored)
+                    return entry['body'], entry['status'], {'Content-Type': entry['mimetype'], 'X-Cache': 'HIT'}
+
+                self._count('misses')
+                response = view(*args, **kwargs)
+                body, status = (response if isinstance(response, tuple) else (response, 200))[:2]
+                if status == 200 and hasattr(body, 'get_data'):
+                    stored = json.dumps({'status': status, 'mimetype': body.mimetype,
+                                         'body': body.get_data(as_text=True)})
+                    try:
+                        self.backend.set(key, stored, ttl or self.default_ttl,
+                                         tags(user_id) if tags else ())
+                    except Exception as err:
+                        self._count('errors')
+                        print(f"[response_cache] set failed: {err}")
+                    body.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """Drop every cached response carrying any of the tags."""
+        if not tags:
+            return 0
+        try:
+            removed = self.backend.invalidate_tags(tags)
+        except Exception as err:
+            self._count('errors')
+            print(f"[response_cache] invalidation failed: {err}")
+            return 0
+        self._count('invalidations')
+        return removed
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hitRate'] = round(snapshot['hits'] / lookups, 4) if lookups else 0.0
+        snapshot['enabled'] = self.enabled
+        try:
+            snapshot.update(self.backend.info())
+        except Exception as err:
+            snapshot['backendError'] = str(err)
+        return snapshot
+
+
+def create_response_cache(config):
+    """Build the cache selected by CACHE_TYPE ('simple' in-process, 'redis' shared, 'null' disabled)."""
+    if config.CACHE_TYPE == 'redis':
+        backend = RedisCacheBackend(config.CACHE_REDIS_URL)
+    else:
+        backend = LocalCacheBackend(max_entries=config.CACHE_MAX_ENTRIES, max_bytes=config.CACHE_MAX_BYTES)
+    return ResponseCache(backend, default_ttl=config.RESPONSE_CACHE_TTL, enabled=config.CACHE_TYPE != 'null')
@@ -0,0 +1,207 @@
+"""
+LearnMatrix: Student Metric Rollups
+Maintained summary tables for the per-student time and score metrics that the
+dashboards used to recompute from the full ActivityLog / Results history:
+
+- DailyActivityRollup: activity count and seconds per user, day and activity type
+- TopicScoreRollup:    result count, score sum, best and lowest score per student
+                       and topic, plus an indexed average for topic-mastery lookups
+- DailyScoreRollup:    result count and score sum per student and day
+
+The write paths update them in the same transaction as the raw insert, so
+dashboard reads scan O(days) or O(topics) rows instead of O(history).
+
+Usage: python rollups.py --backfill   (create the tables and rebuild them from raw data)
+"""
+
+import argparse
+
+from activity_partitions import raw_since
+
+# Results.Topic is nullable but a primary-key column cannot be; untagged
+# results are stored under this key and mapped back to None on read.
+UNTAGGED_TOPIC = ''
+
+ROLLUP_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS DailyActivityRollup (
+        UserID INT NOT NULL,
+        ActivityDate DATE NOT NULL,
+        ActivityType VARCHAR(32) NOT NULL,
+        ActivityCount INT NOT NULL DEFAULT 0,
+        TotalSeconds BIGINT NOT NULL DEFAULT 0,
+
+        PRIMARY KEY (UserID, ActivityDate, ActivityType),
+        FOREIGN KEY (UserID) REFERENCES Users(UserID) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS TopicScoreRollup (
+        StudentID INT NOT NULL,
+        Topic VARCHAR(100) NOT NULL DEFAULT '' COMMENT 'Empty string for results without a topic',
+        AttemptCount INT NOT NULL DEFAULT 0,
+        ScoreSum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        BestScore DECIMAL(5, 2),
+        LowestScore DECIMAL(5, 2),
+        AvgScore DECIMAL(9, 4) AS (ScoreSum / AttemptCount) STORED,
+
+        PRIMARY KEY (StudentID, Topic),
+        INDEX idx_student_mastery (StudentID, AvgScore),
+        FOREIGN KEY (StudentID) REFERENCES Users(UserID) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS DailyScoreRollup (
+        StudentID INT NOT NULL,
+        ResultDate DATE NOT NULL,
+        AttemptCount INT NOT NULL DEFAULT 0,
+        ScoreSum DECIMAL(14, 2) NOT NULL DEFAULT 0,
+
+        PRIMARY KEY (StudentID, ResultDate),
+        FOREIGN KEY (StudentID) REFERENCES Users(UserID) ON DELETE CASCADE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+    """,
+]
+
+
+def topic_key(topic):
+    return topic if topic else UNTAGGED_TOPIC
+
+
+def topic_label(key):
+    return key if key else None
+
+
+# ============================================================================
+# TOPIC MASTERY
+# ============================================================================
+def weakest_topics(cursor, student_id, limit=2):
+    """
+    Return [(topic, avg_percentage, attempt_count)] for the student's weakest
+    tagged topics, lowest average first. Served from idx_student_mastery.
+    """
+    cursor.execute("""
+        SELECT Topic, AvgScore, AttemptCount
+        FROM TopicScoreRollup
+        WHERE StudentID = %s AND Topic <> ''
+        ORDER BY AvgScore ASC, Topic ASC
+        LIMIT %s
+    """, (student_id, limit))
+    return cursor.fetchall()
+
+
+# ============================================================================
+# WRITE HOOKS (call on the same cursor as the raw insert)
+# ============================================================================
+def record_activity_batch(cursor, rows):
+    """
+    Fold a batch of buffered ActivityLog rows into the daily rollup with one
+    multi-row upsert. rows: [(user_id, age_seconds, activity_type, duration)],
+    where age_seconds is how long ago the activity happened.
+    """
+    cursor.executemany("""
+        INSERT INTO DailyActivityRollup (UserID, ActivityDate, ActivityType, ActivityCount, TotalSeconds)
+        VALUES (%s, DATE(DATE_SUB(NOW(), INTERVAL %s SECOND)), %s, 1, %s)
+        ON DUPLICATE KEY UPDATE
+            ActivityCount = ActivityCount + 1,
+            TotalSeconds = TotalSeconds + VALUES(TotalSeconds)
+    """, [(user_id, int(age), activity_type, int(duration or 0)) for user_id, age, activity_type, duration in rows])
+
+
+def record_result(cursor, student_id, topic, percentage):
+    """Fold one Results row stored now into the topic and daily score rollups."""
+    cursor.execute("""
+        INSERT INTO TopicScoreRollup (StudentID, Topic, AttemptCount, ScoreSum, BestScore, LowestScore)
+        VALUES (%s, %s, 1, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            AttemptCount = AttemptCount + 1,
+            ScoreSum = ScoreSum + VALUES(ScoreSum),
+            BestScore = GREATEST(COALESCE(BestScore, VALUES(BestScore)), VALUES(BestScore)),
+            LowestScore = LEAST(COALESCE(LowestScore, VALUES(LowestScore)), VALUES(LowestScore))
+    """, (student_id, topic_key(topic), percentage, percentage, percentage))
+    cursor.execute("""
+        INSERT INTO DailyScoreRollup (StudentID, ResultDate, AttemptCount, ScoreSum)
+        VALUES (%s, CURDATE(), 1, %s)
+        ON DUPLICATE KEY UPDATE
+            AttemptCount = AttemptCount + 1,
+            ScoreSum = ScoreSum + VALUES(ScoreSum)
+    """, (student_id, percentage))
+
+
+# ============================================================================
+# BACKFILL
+# ============================================================================
+def backfill(cursor):
+    """
+    Create the rollup tables and rebuild them from ActivityLog and Results.
+    Days before the ActivityRetention watermark are left alone: their raw
+    rows have been dropped and the rollup is the only record of them.
+    """
+    for ddl in ROLLUP_DDL:
+        cursor.execute(ddl)
+
+    # Tables created before topic mastery was added lack the indexed average
+    cursor.execute("""
+        SELECT COLUMN_NAME FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'TopicScoreRollup' AND COLUMN_NAME = 'AvgScore'
+    """)
+    if not cursor.fetchone():
+        cursor.execute("""
+            ALTER TABLE TopicScoreRollup
+                ADD COLUMN AvgScore DECIMAL(9, 4) AS (ScoreSum / AttemptCount) STORED,
+                ADD INDEX idx_student_mastery (StudentID, AvgScore)
+        """)
+
+    since = raw_since(cursor)
+    if since is None:
+        rollup_filter, raw_filter, params = '', '', ()
+    else:
+        rollup_filter, raw_filter, params = 'WHERE ActivityDate >= %s', 'WHERE Timestamp >= %s', (since,)
+    cursor.execute(f"DELETE FROM DailyActivityRollup {rollup_filter}", params)
+    cursor.execute(f"""
+        INSERT INTO DailyActivityRollup (UserID, ActivityDate, ActivityType, ActivityCount, TotalSeconds)
+        SELECT UserID, DATE(Timestamp), ActivityType, COUNT(*), COALESCE(SUM(Duration), 0)
+        FROM ActivityLog
+        {raw_filter}
+        GROUP BY UserID, DATE(Timestamp), ActivityType
+    """, params)
+    activity_rows = cursor.rowcount
+
+    cursor.execute("DELETE FROM TopicScoreRollup")
+    cursor.execute("""
+        INSERT INTO TopicScoreRollup (StudentID, Topic, AttemptCount, ScoreSum, BestScore, LowestScore)
+        SELECT StudentID, COALESCE(Topic, ''), COUNT(*), SUM(Percentage), MAX(Percentage), MIN(Percentage)
+        FROM Results
+        GROUP BY StudentID, COALESCE(Topic, '')
+    """)
+    topic_rows = cursor.rowcount
+
+    cursor.execute("DELETE FROM DailyScoreRollup")
+    cursor.execute("""
+        INSERT INTO DailyScoreRollup (StudentID, ResultDate, AttemptCount, ScoreSum)
+        SELECT StudentID, DATE(Timestamp), COUNT(*), SUM(Percentage)
+        FROM Results
+        GROUP BY StudentID, DATE(Timestamp)
+    """)
+    daily_score_rows = cursor.rowcount
+
+    return {
+        'dailyActivity': activity_rows,
+        'topicScores': topic_rows,
+        'dailyScores': daily_score_rows
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Maintain the student metric rollup tables')
+    parser.add_argument('--backfill', action='store_true', help='create the tables and rebuild them from raw data')
+    args = parser.parse_args()
+    if not args.backfill:
+        parser.print_help()
+    else:
+        from app import db_cursor
+        with db_cursor(transaction=True) as cursor:
+            counts = backfill(cursor)
+        print(f"✓ DailyActivityRollup: {counts['dailyActivity']} rows")
+        print(f"✓ TopicScoreRollup: {counts['topicScores']} rows")
+        print(f"✓ DailyScoreRollup: {counts['dailyScores']} rows")
@@ -475,6 +475,19 @@ try:
     
     print(f"[OK] Added {len(doubt_ids)} doubts ({resolved_count} resolved)")
     
+    # Derived tables are normally maintained by the app; rebuild them from the seeded rows
+    print("\n[ROLLUPS] Rebuilding metric rollups and class statistics...")
+    from rollups import backfill
+    from class_stats import rebuild_all
+    from achievements import backfill as backfill_achievements
+    from resource_versions import bump, exams_resource
+    backfill(cursor)
+    rebuild_all(cursor)
+    backfill_achievements(cursor)
+    # Fresh exam rows must not match ETags clients cached before the reseed
+    bump(cursor, exams_resource())
+    print("[OK] Rollups rebuilt")
+    
     conn.commit()
     
     print("\n" + "="*60)
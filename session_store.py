@@ -0,0 +1,316 @@
+"""
+LearnMatrix: SQLite Session Store
+Server-side sessions in a single SQLite file (WAL mode) instead of one
+pickle file per session under flask_session/:
+
+- one row per session keyed by the session id (a single primary-key
+  lookup per request); the fields every request reads (user_id, role,
+  username, first/last name) are typed columns and anything else goes into a
+  small JSON column
+- empty sessions (anonymous visitors) are never stored
+- unchanged sessions only rewrite their expiry once per refresh interval,
+  not on every request
+- expired rows are deleted in bulk by an indexed sweep that runs at most
+  every SESSION_SWEEP_INTERVAL seconds, or from the CLI
+- sessions still stored as flask_session files are moved into the store on
+  their next request, so nobody is logged out by the switch
+
+Usage:
+    python session_store.py --stats
+    python session_store.py --sweep          (delete expired sessions now)
+    python session_store.py --purge-legacy   (delete expired flask_session files)
+"""
+
+import argparse
+import json
+import os
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+try:
+    from cachelib.file import FileSystemCache  # type: ignore
+    _HAS_CACHELIB = True
+except Exception:
+    # Only needed to read sessions written by the old filesystem backend
+    FileSystemCache = None
+    _HAS_CACHELIB = False
+
+SESSION_FIELDS = ('user_id', 'role', 'username', 'first_name', 'last_name')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    user_id INTEGER,
+    role TEXT,
+    username TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    extra TEXT,
+    expires_at INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at);
+"""
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+class SessionStore:
+    """Session rows in one SQLite WAL file, shared by every worker process on the host."""
+
+    def __init__(self, path, sweep_interval=300, sweep_batch=5000):
+        self.path = path
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self._local = threading.local()
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Created on a throwaway connection so forked workers never inherit an open handle
+        conn = self._open()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    @staticmethod
+    def _pack(data):
+        extra = {k: v for k, v in data.items() if k not in SESSION_FIELDS}
+        return tuple(data.get(k) for k in SESSION_FIELDS) + (json.dumps(extra, default=str) if extra else None,)
+
+    @staticmethod
+    def _unpack(row):
+        data = {k: v for k, v in zip(SESSION_FIELDS, row) if v is not None}
+        if row[len(SESSION_FIELDS)]:
+            data.update(json.loads(row[len(SESSION_FIELDS)]))
+        return data
+
+    def load(self, sid, now=None):
+        """Return (data, expires_at) for a live session, or None."""
+        row = self._conn().execute(f"""
+            SELECT {', '.join(SESSION_FIELDS)}, extra, expires_at FROM sessions
+            WHERE sid = ? AND expires_at > ?
+        """, (sid, int(now or time.time()))).fetchone()
+        if row is None:
+            return None
+        return self._unpack(row), row[-1]
+
+    def save(self, sid, data, expires_at):
+        self._conn().execute(f"""
+            INSERT OR REPLACE INTO sessions (sid, {', '.join(SESSION_FIELDS)}, extra, expires_at)
+            VALUES (?, {', '.join('?' * len(SESSION_FIELDS))}, ?, ?)
+        """, (sid,) + self._pack(data) + (int(expires_at),))
+
+    def touch(self, sid, expires_at):
+        self._conn().execute("UPDATE sessions SET expires_at = ? WHERE sid = ?", (int(expires_at), sid))
+
+    def delete(self, sid):
+        self._conn().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self, now=None):
+        """Delete every expired session, `sweep_batch` rows per statement. Returns rows removed."""
+        conn = self._conn()
+        cutoff = int(now or time.time())
+        removed = 0
+        while True:
+            deleted = conn.execute("""
+                DELETE FROM sessions WHERE sid IN (
+                    SELECT sid FROM sessions WHERE expires_at <= ? LIMIT ?
+                )
+            """, (cutoff, self.sweep_batch)).rowcount
+            removed += deleted
+            if deleted < self.sweep_batch:
+                break
+        if removed:
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return removed
+
+    def maybe_sweep(self):
+        """Run sweep() if this process has not done so for sweep_interval seconds."""
+        now = time.monotonic()
+        if now - self._last_sweep < self.sweep_interval or not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_sweep = now
+            return self.sweep()
+        except sqlite3.OperationalError as err:
+            # Another process holds the write lock; the next interval retries
+            print(f"[session_store] sweep skipped: {err}")
+            return 0
+        finally:
+            self._sweep_lock.release()
+
+    def stats(self):
+        count, expired = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(expires_at <= ?), 0) FROM sessions", (int(time.time()),)
+        ).fetchone()
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + '-wal') if os.path.exists(p))
+        return {'backend': 'sqlite', 'sessions': count, 'expired': expired, 'bytes': size}
+
+
+# ============================================================================
+# FLASK SESSION INTERFACE
+# ============================================================================
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that records its id, whether it is new and its stored expiry."""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+
+
+class SQLiteSessionInterface(SessionInterface):
+    """
+    Flask session interface over SessionStore. Sessions are permanent
+    (PERMANENT_SESSION_LIFETIME, sliding) when `permanent` is set. The
+    session id cookie carries no data, so it is not signed: ids are 256-bit
+    random tokens.
+    """
+
+    session_class = ServerSession
+
+    def __init__(self, store, permanent=True, refresh_interval=3600, legacy_dir=None, legacy_prefix='session:'):
+        self.store = store
+        self.permanent = permanent
+        self.refresh_interval = refresh_interval
+        self.legacy_prefix = legacy_prefix
+        self.legacy = None
+        if legacy_dir and os.path.isdir(legacy_dir):
+            if _HAS_CACHELIB:
+                self.legacy = FileSystemCache(legacy_dir, threshold=0, mode=0o600)
+            else:
+                print(f"Warning: {legacy_dir} holds old session files but cachelib is missing; they cannot be migrated.")
+
+    @staticmethod
+    def _new_sid():
+        return secrets.token_urlsafe(32)
+
+    def _migrate_legacy(self, sid, lifetime):
+        """Move a session still stored as a flask_session file into the store."""
+        key = self.legacy_prefix + sid
+        try:
+            data = self.legacy.get(key)
+        except Exception as err:
+            print(f"[session_store] unreadable legacy session: {err}")
+            return None
+        if data is None:
+            return None
+        data = {k: v for k, v in dict(data).items() if k != '_permanent'}
+        expires_at = int(time.time()) + lifetime
+        self.store.save(sid, data, expires_at)
+        self.legacy.delete(key)
+        return data, expires_at
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            stored = self.store.load(sid)
+            if stored is None and self.legacy is not None:
+                stored = self._migrate_legacy(sid, int(app.permanent_session_lifetime.total_seconds()))
+            if stored is not None:
+                data, expires_at = stored
+                return self.session_class(data, sid=sid, expires_at=expires_at)
+        return self.session_class(sid=self._new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified and not session.new:
+                # Cleared (logout): drop the row and the cookie
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        lifetime = int(app.permanent_session_lifetime.total_seconds())
+        expires_at = int(time.time()) + lifetime
+        if session.modified or session.new:
+            self.store.save(session.sid, dict(session), expires_at)
+        elif session.expires_at is None or expires_at - session.expires_at >= self.refresh_interval:
+            self.store.touch(session.sid, expires_at)
+        else:
+            return
+
+        response.set_cookie(
+            name, session.sid,
+            expires=datetime.fromtimestamp(expires_at, timezone.utc) if self.permanent else None,
+            httponly=self.get_cookie_httponly(app), secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app), domain=domain, path=path
+        )
+        self.store.maybe_sweep()
+
+
+# ============================================================================
+# LEGACY FILES
+# ============================================================================
+def purge_legacy_files(legacy_dir, now=None):
+    """
+    Delete expired session files left by the filesystem backend. Each file
+    starts with its expiry as a 4-byte unsigned int (0 = never). Returns
+    (removed, remaining).
+    """
+    now = now or time.time()
+    removed = remaining = 0
+    for name in os.listdir(legacy_dir):
+        path = os.path.join(legacy_dir, name)
+        try:
+            with open(path, 'rb') as handle:
+                expires = struct.unpack('I', handle.read(4))[0]
+            if expires and expires <= now:
+                os.remove(path)
+                removed += 1
+            else:
+                remaining += 1
+        except (OSError, struct.error):
+            continue
+    return removed, remaining
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Maintain the SQLite session store')
+    parser.add_argument('--stats', action='store_true', help='show session counts and file size')
+    parser.add_argument('--sweep', action='store_true', help='delete expired sessions')
+    parser.add_argument('--purge-legacy', action='store_true', help='delete expired flask_session files')
+    args = parser.parse_args()
+    if not (args.stats or args.sweep or args.purge_legacy):
+        parser.print_help()
+    else:
+        from config import config
+        store = SessionStore(config.SESSION_DB_PATH)
+        if args.sweep:
+            print(f"✓ Removed {store.sweep()} expired sessions")
+        if args.purge_legacy:
+            if os.path.isdir(config.SESSION_LEGACY_DIR):
+                removed, remaining = purge_legacy_files(config.SESSION_LEGACY_DIR)
+                print(f"✓ Removed {removed} expired session files ({remaining} still awaiting migration)")
+            else:
+                print(f"✓ No legacy session directory at {config.SESSION_LEGACY_DIR}")
+        if args.stats:
+            print(json.dumps(store.stats(), indent=2))
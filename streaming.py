@@ -0,0 +1,49 @@
+"""
+LearnMatrix: Streamed JSON Responses
+Encodes rows as they are read from an unbuffered cursor instead of building
+the whole payload before jsonify(), for large teacher exports
+"""
+
+import json
+
+from flask import Response
+
+STREAM_FORMATS = ('ndjson', 'json')
+
+
+def stream_response(cursor_factory, produce, fmt, envelope_key):
+    """
+    Stream the items yielded by `produce(cursor)` as a chunked response.
+
+    fmt='ndjson' writes one JSON object per line (application/x-ndjson);
+    fmt='json' writes {"<envelope_key>": [...]} incrementally, matching the
+    buffered response shape. The pooled connection is held only while the
+    body is being sent. A failure after the first chunk cannot change the
+    status code any more: NDJSON streams end with an {"error": ...} line and
+    JSON streams are cut short (so they no longer parse).
+    """
+    def generate():
+        first = True
+        try:
+            with cursor_factory(buffered=False) as cursor:
+                if fmt == 'json':
+                    yield '{"%s": [' % envelope_key
+                for item in produce(cursor):
+                    encoded = json.dumps(item, default=str)
+                    if fmt == 'json':
+                        yield encoded if first else ',' + encoded
+                    else:
+                        yield encoded + '\n'
+                    first = False
+            if fmt == 'json':
+                yield ']}'
+        except Exception as err:
+            print(f"[streaming] {envelope_key} stream aborted: {err}")
+            if fmt == 'ndjson':
+                yield json.dumps({'error': 'Stream aborted'}) + '\n'
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    response = Response(generate(), mimetype=mimetype)
+    # Ask reverse proxies (nginx) not to buffer the body, or time-to-first-byte is lost
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,229 @@
+"""
+LearnMatrix: Streaming Upload Pipeline
+Multipart file parts are written straight to a temporary file next to their
+final destination while Werkzeug parses the request body (64 KB at a time),
+instead of being spooled first and then copied by FileStorage.save():
+
+- the extension is checked as soon as the part's filename is parsed, before
+  any of its bytes are read
+- the size is counted while streaming and the request is aborted with 413 as
+  soon as the per-type cap is passed
+- the leading bytes are checked against the type's magic signature as they
+  arrive, so a renamed executable is rejected after its first chunk
+- a SHA-256 of the content is computed on the fly
+- accepted files are moved into place with os.replace(), never re-read
+
+Routes opt in with @accepts_upload(policy) below @login_required (so
+anonymous requests never reach the body) and take the result from
+received_upload(). Rejections raise UploadRejected, which the app turns into
+a JSON error.
+"""
+
+import hashlib
+import os
+import secrets
+from functools import wraps
+
+from flask import Request, request
+
+# Leading bytes per extension (offset, signature); a file must match one of them
+SIGNATURES = {
+    'pdf': [(0, b'%PDF-')],
+    'png': [(0, b'\x89PNG\r\n\x1a\n')],
+    'jpg': [(0, b'\xff\xd8\xff')],
+    'jpeg': [(0, b'\xff\xd8\xff')],
+    'gif': [(0, b'GIF87a'), (0, b'GIF89a')],
+    'webp': [(8, b'WEBP')],
+    # Office Open XML documents are ZIP archives, the legacy formats OLE compound files
+    'docx': [(0, b'PK\x03\x04')],
+    'xlsx': [(0, b'PK\x03\x04')],
+    'pptx': [(0, b'PK\x03\x04')],
+    'doc': [(0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')],
+    'xls': [(0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')],
+    'ppt': [(0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')],
+}
+TEXT_EXTENSIONS = {'txt'}
+TEXT_SNIFF_BYTES = 512  # plain text is accepted when its first bytes contain no NUL
+
+
+class UploadRejected(Exception):
+    """An upload failed a policy check; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def format_size(num_bytes):
+    if num_bytes >= 1024 * 1024:
+        return f'{num_bytes / (1024 * 1024):g} MB'
+    return f'{num_bytes / 1024:g} KB'
+
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+class UploadPolicy:
+    """
+    What a route accepts: {extension: max_bytes}, the directory uploads are
+    streamed into and, optionally, a cap on the whole request body
+    (max_body_bytes, checked against Content-Length before anything is read).
+    """
+
+    def __init__(self, limits, incoming_dir, label=None, max_body_bytes=None):
+        self.limits = dict(limits)
+        self.incoming_dir = incoming_dir
+        self.max_body_bytes = max_body_bytes
+        self.label = label or ', '.join(sorted(ext.upper() for ext in self.limits))
+
+    def open_stream(self, filename):
+        extension = file_extension(filename)
+        if extension not in self.limits:
+            raise UploadRejected(f'File type not allowed. Allowed: {self.label}')
+        return StreamedUpload(self, filename, extension)
+
+
+class StreamedUpload:
+    """
+    Writable file-like object handed to the multipart parser for one file
+    part. Tracks size, hash and leading bytes as chunks are written; after
+    parsing it is also readable (it is the FileStorage's stream).
+    """
+
+    def __init__(self, policy, filename, extension):
+        self.filename = filename
+        self.extension = extension
+        self.max_bytes = policy.limits[extension]
+        self.size = 0
+        self.saved_path = None
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._checked = False
+        os.makedirs(policy.incoming_dir, exist_ok=True)
+        self.path = os.path.join(policy.incoming_dir, secrets.token_hex(16) + '.part')
+        self._file = open(self.path, 'w+b')
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise UploadRejected(f'File too large (max {format_size(self.max_bytes)} for .{self.extension})', 413)
+        if not self._checked:
+            self._head += chunk[:TEXT_SNIFF_BYTES]
+            if len(self._head) >= self._sniff_length():
+                self._check_content()
+        self._hash.update(chunk)
+        return self._file.write(chunk)
+
+    def _sniff_length(self):
+        if self.extension in TEXT_EXTENSIONS:
+            return TEXT_SNIFF_BYTES
+        return max(offset + len(signature) for offset, signature in SIGNATURES[self.extension])
+
+    def _check_content(self):
+        self._checked = True
+        if self.extension in TEXT_EXTENSIONS:
+            ok = b'\x00' not in self._head
+        else:
+            ok = any(self._head[offset:offset + len(signature)] == signature
+                     for offset, signature in SIGNATURES[self.extension])
+        self._head = b''
+        if not ok:
+            self.discard()
+            raise UploadRejected(f'File content does not match its .{self.extension} extension')
+
+    def finish(self):
+        """Run the content check on files shorter than their signature; called once parsing is done."""
+        if not self._checked:
+            if not self.size:
+                self.discard()
+                raise UploadRejected('Uploaded file is empty')
+            self._check_content()
+        self._file.flush()
+        return self
+
+    # File protocol used by the parser and FileStorage
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def save_as(self, destination):
+        """Move the upload to its final path (same filesystem, no copy)."""
+        self._file.close()
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(self.path, destination)
+        self.saved_path = destination
+        return destination
+
+    def discard(self):
+        self._file.close()
+        if self.saved_path is None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        self.discard()
+
+
+class UploadRequest(Request):
+    """Request class that streams file parts through the route's UploadPolicy, if it set one."""
+
+    upload_policy = None
+
+    @property
+    def max_content_length(self):
+        # Per-route body cap, so other routes (bulk imports) keep the app-wide setting
+        if self.upload_policy is not None and self.upload_policy.max_body_bytes:
+            return self.upload_policy.max_body_bytes
+        return super().max_content_length
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Parts without a filename are empty file inputs; let Werkzeug buffer those as usual
+        if self.upload_policy is None or not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        upload = self.upload_policy.open_stream(filename)
+        self.__dict__.setdefault('_streamed_uploads', []).append(upload)
+        return upload
+
+    def close(self):
+        # Flask closes the request when it ends: every unsaved upload is deleted, including
+        # parts of a body the parser gave up on (it drops malformed bodies silently)
+        super().close()
+        for upload in self.__dict__.get('_streamed_uploads', ()):
+            upload.discard()
+
+
+def accepts_upload(policy):
+    """Decorator: stream this route's file parts through `policy`. Must run before the form is read."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            request.upload_policy = policy
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def received_upload(field):
+    """The checked StreamedUpload for a form field, or None when no file was sent."""
+    file = request.files.get(field)
+    if not file or not file.filename:
+        return None
+    if not isinstance(file.stream, StreamedUpload):
+        raise RuntimeError('received_upload() needs the route to be decorated with @accepts_upload')
+    return file.stream.finish()